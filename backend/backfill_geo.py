@@ -0,0 +1,46 @@
+"""
+Backfill the indexed GeoJSON `geo` field of companies from
+location.coordinates ({"lat", "lng"})
+
+Safe to run repeatedly: companies whose point is already correct are skipped,
+and companies that lost their coordinates have the stale point removed.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from utils.conditional import bump_collection_version
+from utils.geo import backfill_geo
+from utils.indexes import GEO_INDEXES, apply_indexes
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+db_name = os.environ['DB_NAME']
+
+async def main():
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    try:
+        print("🗺️  Backfilling company geo points...")
+        report = await backfill_geo(db)
+        print(f"  Located: {report['located']}")
+        print(f"  Cleared: {report['cleared']}")
+        print(f"  Already up to date: {report['skipped']}")
+        if report['located'] or report['cleared']:
+            # Other API workers notice the change through the collection version
+            await bump_collection_version(db, "companies")
+        
+        # 2dsphere index for /api/companies/nearby
+        await apply_indexes(db, GEO_INDEXES)
+        print("✅ Done")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
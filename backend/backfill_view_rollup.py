@@ -0,0 +1,46 @@
+"""
+Rebuild the company view rollups (company_view_daily, company_view_totals,
+company_view_viewers, company_view_daily_viewers) from the raw company_views events
+
+Run it once after deploying the rollups or the per-day viewer markers (they
+replace the viewers arrays of older daily rows), or to repair drift. New views
+are folded into the rollups by the API while it runs, so stop the API first to
+avoid counting the same events twice.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from utils.indexes import VIEW_ROLLUP_INDEXES, apply_indexes
+from utils.view_rollup import backfill_view_rollup
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+db_name = os.environ['DB_NAME']
+
+async def main():
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    try:
+        print("📊 Rebuilding view rollups from company_views...")
+        raw_views = await db.company_views.estimated_document_count()
+        print(f"  Raw view events: ~{raw_views}")
+        
+        # $merge into company_view_daily needs its unique index
+        await apply_indexes(db, VIEW_ROLLUP_INDEXES)
+        await backfill_view_rollup(db)
+        
+        daily_rows = await db.company_view_daily.count_documents({})
+        companies = await db.company_view_totals.count_documents({})
+        print(f"✅ Done: {daily_rows} daily rows for {companies} companies")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Export benchmark
+
+Runs the WordPress exporter over synthetic companies served by an in-memory
+cursor, so no database is needed: each format alone (one scan per format),
+then all formats fanned out from a single scan. Reports throughput, time per
+format, collection scans and peak RSS. Peak RSS is sampled after the first 10% of the companies and at the
+end: with streaming writers the two stay close however many companies are
+exported.
+
+Usage:
+  python bench_export.py [--count 1000000] [--batch-size 1000] [--json-format array|ndjson]
+"""
+import argparse
+import asyncio
+import resource
+import tempfile
+import time
+from itertools import islice
+
+from bench_serialization import make_company
+from export_to_wordpress import WordPressExporter
+from utils.exports import EXPORT_BATCH_SIZE, EXPORT_FORMATS, JSON_FORMATS
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class SyntheticCursor:
+    """Async cursor generating `count` companies in batches"""
+
+    def __init__(self, count, on_progress):
+        self.count = count
+        self.size = EXPORT_BATCH_SIZE
+        self.on_progress = on_progress
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        self.size = size
+        return self
+
+    async def __aiter__(self):
+        companies = (make_company(i) for i in range(self.count))
+        produced = 0
+        while True:
+            batch = list(islice(companies, self.size))
+            if not batch:
+                break
+            for company in batch:
+                yield company
+            produced += len(batch)
+            self.on_progress(produced)
+            # A real cursor awaits the next batch from the server here
+            await asyncio.sleep(0)
+
+
+class SyntheticCollection:
+    def __init__(self, count):
+        self.count = count
+        self.checkpoints = {}
+        self.scans = 0
+
+    def _progress(self, produced):
+        if produced >= self.count // 10 and "10%" not in self.checkpoints:
+            self.checkpoints["10%"] = peak_rss_mb()
+
+    def find(self, query=None, projection=None):
+        self.scans += 1
+        return SyntheticCursor(self.count, self._progress)
+
+
+class SyntheticDatabase:
+    def __init__(self, count):
+        self.companies = SyntheticCollection(count)
+        self.blog_posts = SyntheticCollection(0)
+
+
+async def run(args):
+    db = SyntheticDatabase(args.count)
+    results = {}
+    with tempfile.TemporaryDirectory() as export_dir:
+        exporter = WordPressExporter(batch_size=args.batch_size, json_format=args.json_format,
+                                     db=db, export_dir=export_dir)
+        for formats in [("csv",), ("xml",), ("json",), EXPORT_FORMATS]:
+            db.companies.checkpoints.clear()
+            db.companies.scans = 0
+            started = time.perf_counter()
+            timings = await exporter.export(formats)
+            elapsed = time.perf_counter() - started
+            results[",".join(formats)] = (elapsed, timings, db.companies.scans,
+                                          db.companies.checkpoints.get("10%"), peak_rss_mb())
+
+    print("=" * 60)
+    print(f"Exporting {args.count} companies (batch {args.batch_size}, JSON {args.json_format})")
+    print("=" * 60)
+    for name, (elapsed, timings, scans, early_rss, final_rss) in results.items():
+        print(f"  {name:12} {elapsed:7.1f} s  {args.count / elapsed:8.0f} docs/s  {scans} scan(s)  "
+              f"peak RSS {early_rss:6.1f} MB at 10% -> {final_rss:6.1f} MB at 100%")
+        print("               " + "  ".join(f"{part} {seconds:.1f} s" for part, seconds in timings.items()))
+    separate = sum(results[name][0] for name in EXPORT_FORMATS)
+    print(f"  one pass per format: {separate:.1f} s, single fan-out pass: {results[','.join(EXPORT_FORMATS)][0]:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--json-format", choices=JSON_FORMATS, default="array")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
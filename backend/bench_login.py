@@ -0,0 +1,99 @@
+"""
+Login throughput benchmark
+
+Measures the latency of a cheap endpoint (GET /api/categories) while idle and
+during a burst of concurrent logins, plus the login throughput. With password
+hashing off the event loop the probe p99 should stay flat during the burst.
+
+Usage:
+  python bench_login.py [--url http://localhost:8001/api] [--logins 8] [--seconds 10]
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def probe(url, seconds):
+    """Hit the probe endpoint sequentially for `seconds`; returns latencies in ms"""
+    session = requests.Session()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        session.get(f"{url}/categories").raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def login_worker(url, credentials, stop, counter, lock):
+    session = requests.Session()
+    while not stop.is_set():
+        session.post(f"{url}/auth/login", json=credentials).raise_for_status()
+        with lock:
+            counter[0] += 1
+
+
+def report(name, latencies):
+    print(f"  {name:<14} n={len(latencies):<6} "
+          f"p50={percentile(latencies, 50):7.1f}ms  "
+          f"p99={percentile(latencies, 99):7.1f}ms  "
+          f"mean={statistics.mean(latencies) if latencies else 0:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001/api")
+    parser.add_argument("--logins", type=int, default=8, help="concurrent login clients")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    credentials = {"email": f"bench_{uuid.uuid4().hex[:8]}@example.com", "password": "BenchPassword123!"}
+    requests.post(f"{args.url}/auth/register", json={"name": "Bench", **credentials}).raise_for_status()
+
+    print("=" * 70)
+    print(f"Login burst benchmark against {args.url}")
+    print("=" * 70)
+
+    idle = probe(args.url, args.seconds)
+
+    stop = threading.Event()
+    counter, lock = [0], threading.Lock()
+    with ThreadPoolExecutor(max_workers=args.logins) as pool:
+        workers = [pool.submit(login_worker, args.url, credentials, stop, counter, lock) for _ in range(args.logins)]
+        started = time.perf_counter()
+        try:
+            burst = probe(args.url, args.seconds)
+        finally:
+            stop.set()
+    elapsed = time.perf_counter() - started
+
+    # A client that died early means the burst was smaller than asked for
+    failures = [worker.exception() for worker in workers if worker.exception() is not None]
+    if failures:
+        sys.exit(f"{len(failures)} of {args.logins} login clients failed: {failures[0]!r}")
+
+    print("\nGET /api/categories latency:")
+    report("idle", idle)
+    report("login burst", burst)
+    print(f"\nLogins: {counter[0]} in {elapsed:.1f}s ({counter[0] / elapsed:.1f}/s) "
+          f"with {args.logins} concurrent clients")
+    ratio = percentile(burst, 99) / percentile(idle, 99) if idle else 0
+    print(f"p99 during burst / idle p99: {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Serialization microbenchmark
+
+Compares the per-company cost of the previous response path (field-by-field
+helper copy + FastAPI's jsonable_encoder + json.dumps) with the current one
+(defaults merge + orjson) on a page of synthetic company documents.
+
+Usage:
+  python bench_serialization.py [--items 100] [--rounds 200]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from server import company_helper
+from utils.serialization import dumps
+
+
+def make_company(i):
+    now = datetime.utcnow()
+    return {
+        "_id": ObjectId(),
+        "name": f"Компанія {i}",
+        "nameRu": f"Компания {i}",
+        "description": "Опис компанії " * 20,
+        "descriptionRu": "Описание компании " * 20,
+        "category": "services",
+        "location": {"city": "Київ", "address": f"вул. Хрещатик, {i}"},
+        "contacts": {"phone": "+380441234567", "email": f"company{i}@example.com", "website": None},
+        "image": f"https://example.com/images/{i}.jpg",
+        "images": [f"https://example.com/images/{i}_{n}.jpg" for n in range(3)],
+        "rating": 4.5,
+        "reviewCount": 12,
+        "isNew": i % 2 == 0,
+        "isActive": True,
+        "userId": str(ObjectId()),
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+def legacy_helper(company):
+    """Field-by-field copy the API used before projections"""
+    return {
+        "_id": str(company["_id"]),
+        "name": company["name"],
+        "nameRu": company["nameRu"],
+        "description": company["description"],
+        "descriptionRu": company["descriptionRu"],
+        "category": company["category"],
+        "location": company["location"],
+        "contacts": company["contacts"],
+        "image": company["image"],
+        "images": company.get("images", []),
+        "rating": company.get("rating", 0.0),
+        "reviewCount": company.get("reviewCount", 0),
+        "isNew": company.get("isNew", False),
+        "isActive": company.get("isActive", True),
+        "userId": company.get("userId"),
+        "createdAt": company.get("createdAt", datetime.utcnow()),
+        "updatedAt": company.get("updatedAt", datetime.utcnow())
+    }
+
+
+def legacy_path(companies):
+    payload = {"companies": [legacy_helper(c) for c in companies], "total": len(companies)}
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(companies):
+    return dumps({"companies": [company_helper(c) for c in companies], "total": len(companies)})
+
+
+def measure(fn, companies, rounds):
+    fn(companies)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn(companies)
+    return (time.perf_counter() - started) / rounds / len(companies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    companies = [make_company(i) for i in range(args.items)]
+    assert json.loads(legacy_path(companies)) == json.loads(fast_path(companies))
+
+    legacy = measure(legacy_path, companies, args.rounds)
+    fast = measure(fast_path, companies, args.rounds)
+
+    print("=" * 60)
+    print(f"Serializing {args.items} companies x {args.rounds} rounds")
+    print("=" * 60)
+    print(f"  jsonable_encoder + json: {legacy:8.1f} µs/company")
+    print(f"  projection + orjson:     {fast:8.1f} µs/company")
+    print(f"  speedup:                 {legacy / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Create the MongoDB indexes used by the HAL API and check query plans
+
+Usage:
+  python ensure_indexes.py            # create indexes and verify plans
+  python ensure_indexes.py --verify   # only verify plans
+"""
+import asyncio
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import logging
+from dotenv import load_dotenv
+from pathlib import Path
+
+from utils.indexes import INDEXES, CANONICAL_QUERIES, IndexCreationError, apply_indexes, verify_queries
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+db_name = os.environ['DB_NAME']
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    index_failures = []
+    try:
+        if '--verify' not in sys.argv:
+            print(f"🔧 Ensuring {len(INDEXES)} indexes...")
+            try:
+                await apply_indexes(db)
+            except IndexCreationError as e:
+                index_failures = e.failures
+        
+        print(f"\n🔍 Explaining {len(CANONICAL_QUERIES)} canonical queries...")
+        failures = await verify_queries(db)
+    finally:
+        client.close()
+    
+    if index_failures:
+        print(f"\n❌ {len(index_failures)} indexes could not be created (fix the data and re-run):")
+        for failure in index_failures:
+            print(f"  - {failure}")
+    
+    if failures:
+        print(f"\n❌ {len(failures)} queries fall back to COLLSCAN:")
+        for name in failures:
+            print(f"  - {name}")
+    
+    if failures or index_failures:
+        sys.exit(1)
+    
+    print("\n✅ All canonical queries are index-backed")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,38 @@
 """
 Импорт компаний из CSV файла в MongoDB
 Используйте этот скрипт если вы экспортировали данные из WordPress в CSV формат
+
+Файл читается потоково: строки проверяются по модели CompanyCreate и
+вставляются пачками (insert_many, ordered=False) в несколько параллельных
+запросов. Отклонённые строки с причиной пишутся в отдельный CSV файл, в конце
+печатается сводка со скоростью импорта.
+
+Каждая компания получает естественный ключ (имя + телефон) с уникальным
+индексом, поэтому повторный импорт не создаёт дубликатов. С --upsert
+изменённые строки обновляют существующие компании, неизменённые пропускаются.
 """
+import argparse
 import asyncio
 import csv
+import re
+import time
+from functools import lru_cache
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from pathlib import Path
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from models.company import CompanyCreate
+from utils.category_counts import rebuild_category_counts
+from utils.conditional import bump_collection_version
+from utils.geo import geo_point
+from utils.imports import (
+    COMPANY_NATURAL_FIELDS, adopt_legacy_documents, company_key, insert_document, upsert_operation, upsert_report
+)
+from utils.indexes import IMPORT_KEY_INDEXES, apply_indexes
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -35,99 +59,271 @@ CATEGORY_MAPPING = {
     'інше': 'other'
 }
 
-async def import_from_csv(csv_file_path):
+DEFAULT_CATEGORY = 'other'
+DEFAULT_IMAGE = 'https://via.placeholder.com/400x300/E0E0E0/666666?text=Company'
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CONCURRENCY = 4
+
+
+def compile_category_matcher(mapping=CATEGORY_MAPPING, default=DEFAULT_CATEGORY):
+    """
+    Собрать функцию категория CSV -> id категории: одно регулярное выражение
+    по всем ключам маппинга и кэш по уже встреченным значениям, которых в
+    выгрузках обычно немного. Как и раньше, из найденных ключей побеждает
+    первый в порядке маппинга.
+    """
+    priority = {key: position for position, key in enumerate(mapping)}
+    pattern = re.compile("|".join(re.escape(key) for key in sorted(mapping, key=len, reverse=True)))
+    
+    @lru_cache(maxsize=4096)
+    def match(category):
+        found = pattern.findall(category.lower().strip())
+        return mapping[min(found, key=priority.__getitem__)] if found else default
+    
+    return match
+
+
+class RowRejected(ValueError):
+    pass
+
+
+def _cell(row, key, default=''):
+    # DictReader отдаёт None для колонок, которых нет в короткой строке
+    return (row.get(key) or default).strip()
+
+
+def _validation_reason(error):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+def company_defaults(now):
+    """Поля, которые задаются только при создании компании (дальше ими управляет API)"""
+    return {
+        "rating": 0.0,
+        "ratingSum": 0,
+        "reviewCount": 0,
+        "isNew": False,
+        "isActive": True,
+        "createdAt": now,
+        "updatedAt": now
+    }
+
+
+def row_to_company(row, match_category):
+    """Импортируемые поля компании из строки CSV; RowRejected если строку нельзя импортировать"""
+    location = {"city": _cell(row, 'city', 'Kyiv'), "address": _cell(row, 'address')}
+    
+    # Координаты (необязательные колонки lat/lng)
+    point = geo_point({"coordinates": {"lat": _cell(row, 'lat'), "lng": _cell(row, 'lng')}})
+    if point:
+        location["coordinates"] = {"lat": point["coordinates"][1], "lng": point["coordinates"][0]}
+    
+    try:
+        company = CompanyCreate(
+            name=_cell(row, 'name'),
+            nameRu=_cell(row, 'nameRu') or _cell(row, 'name'),
+            description=_cell(row, 'description'),
+            descriptionRu=_cell(row, 'descriptionRu') or _cell(row, 'description'),
+            category=match_category(row.get('category') or ''),
+            location=location,
+            contacts={
+                "phone": _cell(row, 'phone'),
+                "email": _cell(row, 'email'),
+                "website": _cell(row, 'website') or None
+            },
+            image=_cell(row, 'image') or DEFAULT_IMAGE,
+            images=[]
+        )
+    except ValidationError as e:
+        raise RowRejected(_validation_reason(e))
+    
+    # Валидация обязательных полей
+    if not company.name or not company.contacts.phone:
+        raise RowRejected("нет имени или телефона")
+    
+    document = company.model_dump(exclude={"isNew", "isActive"})
+    if point:
+        document["geo"] = point
+    return document
+
+
+def company_write(row, match_category, now, upsert):
+    """Документ для insert_many или UpdateOne для bulk_write"""
+    fields = row_to_company(row, match_category)
+    key = company_key(fields["name"], fields["contacts"]["phone"])
+    defaults = company_defaults(now)
+    if not upsert:
+        return insert_document(key, fields, defaults)
+    del defaults["updatedAt"]
+    return upsert_operation(key, fields, defaults, now, unset=() if "geo" in fields else ("geo",))
+
+
+def legacy_keys(batch):
+    """importKey -> (имя, телефон) пачки: по ним находятся компании, импортированные до importKey"""
+    natural = ((_cell(row, 'name'), _cell(row, 'phone')) for _, row, _ in batch)
+    return {company_key(*values): values for values in natural}
+
+
+class RejectWriter:
+    """CSV с отклонёнными строками: номер строки, причина и исходные колонки"""
+    
+    def __init__(self, path, fieldnames):
+        self.path = path
+        self.fieldnames = ['line', 'reason', *fieldnames]
+        self.file = None
+        self.writer = None
+        self.count = 0
+    
+    def write(self, line, reason, row):
+        if self.writer is None:
+            self.file = open(self.path, 'w', encoding='utf-8', newline='')
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow({**row, 'line': line, 'reason': reason})
+        self.count += 1
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def write_batches(collection, batches, rejects, concurrency, upsert=False):
+    """
+    Записать пачки [(номер строки, строка, документ или UpdateOne), ...] с не
+    более чем `concurrency` одновременными insert_many / bulk_write; возвращает
+    число вставленных, обновлённых и неизменённых компаний
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = set()
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    
+    def add(report):
+        for name, value in report.items():
+            counts[name] += value
+    
+    async def write(batch):
+        writes = [item for _, _, item in batch]
+        try:
+            # Компании из импорта до importKey обновляются (или отклоняются как дубликаты), а не копируются
+            await adopt_legacy_documents(collection, legacy_keys(batch), COMPANY_NATURAL_FIELDS)
+            if upsert:
+                add(upsert_report((await collection.bulk_write(writes, ordered=False)).bulk_api_result))
+            else:
+                counts["inserted"] += len((await collection.insert_many(writes, ordered=False)).inserted_ids)
+        except BulkWriteError as e:
+            add(upsert_report(e.details) if upsert else {"inserted": e.details.get("nInserted", 0)})
+            for error in e.details.get("writeErrors", []):
+                line, row, _ = batch[error["index"]]
+                reason = "дубликат (уже импортирована)" if error.get("code") == 11000 else error.get("errmsg", "write error")
+                rejects.write(line, reason, row)
+        finally:
+            semaphore.release()
+    
+    async for batch in batches:
+        await semaphore.acquire()
+        task = asyncio.create_task(write(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+    return counts
+
+
+async def import_from_csv(
+    csv_file_path,
+    batch_size=DEFAULT_BATCH_SIZE,
+    concurrency=DEFAULT_CONCURRENCY,
+    rejects_path=None,
+    upsert=False
+):
     """
     Импорт компаний из CSV файла
     
     Формат CSV файла:
-    name,nameRu,description,descriptionRu,category,city,address,phone,email,website,image
+    name,nameRu,description,descriptionRu,category,city,address,phone,email,website,image[,lat,lng]
     """
-    client = AsyncIOMotorClient(mongo_url)
-    db = client[db_name]
-    
     print("=" * 70)
     print("Импорт компаний из CSV в MongoDB")
     print("=" * 70)
     print(f"\nФайл: {csv_file_path}")
+    print(f"Режим: {'upsert (обновление существующих)' if upsert else 'вставка новых'}")
     
     if not Path(csv_file_path).exists():
         print(f"❌ Файл не найден: {csv_file_path}")
         return
     
-    imported = 0
-    errors = 0
+    rejects_path = rejects_path or f"{csv_file_path}.rejects.csv"
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    match_category = compile_category_matcher()
+    read = 0
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    rejected = 0
+    started = time.perf_counter()
     
     try:
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
+        # Уникальный индекс по естественному ключу
+        await apply_indexes(db, [IMPORT_KEY_INDEXES["companies"]])
+        
+        with open(csv_file_path, 'r', encoding='utf-8', newline='') as file:
             reader = csv.DictReader(file)
+            rejects = RejectWriter(rejects_path, reader.fieldnames or [])
             
-            for row in reader:
-                try:
-                    # Маппинг категории
-                    category = row.get('category', '').lower().strip()
-                    mapped_category = 'other'
-                    
-                    for key, value in CATEGORY_MAPPING.items():
-                        if key in category:
-                            mapped_category = value
-                            break
-                    
-                    # Создание документа компании
-                    company = {
-                        "name": row.get('name', '').strip(),
-                        "nameRu": row.get('nameRu', row.get('name', '')).strip(),
-                        "description": row.get('description', '').strip(),
-                        "descriptionRu": row.get('descriptionRu', row.get('description', '')).strip(),
-                        "category": mapped_category,
-                        "location": {
-                            "city": row.get('city', 'Kyiv').strip(),
-                            "address": row.get('address', '').strip()
-                        },
-                        "contacts": {
-                            "phone": row.get('phone', '').strip(),
-                            "email": row.get('email', '').strip(),
-                            "website": row.get('website', '').strip() or None
-                        },
-                        "image": row.get('image', 'https://via.placeholder.com/400x300/E0E0E0/666666?text=Company').strip(),
-                        "images": [],
-                        "rating": 0.0,
-                        "reviewCount": 0,
-                        "isNew": False,
-                        "isActive": True,
-                        "createdAt": datetime.utcnow(),
-                        "updatedAt": datetime.utcnow()
-                    }
-                    
-                    # Валидация обязательных полей
-                    if not company['name'] or not company['contacts']['phone']:
-                        print(f"⚠️  Пропущена компания (нет имени или телефона): {company.get('name', 'N/A')}")
-                        errors += 1
+            async def batches():
+                nonlocal read
+                now = datetime.utcnow()
+                batch = []
+                for line, row in enumerate(reader, start=2):
+                    read += 1
+                    try:
+                        batch.append((line, row, company_write(row, match_category, now, upsert)))
+                    except RowRejected as e:
+                        rejects.write(line, str(e), row)
                         continue
-                    
-                    # Вставка в базу данных
-                    await db.companies.insert_one(company)
-                    imported += 1
-                    print(f"  ✓ Импортировано: {company['name'][:60]}")
-                    
-                except Exception as e:
-                    errors += 1
-                    print(f"  ❌ Ошибка при импорте строки: {str(e)}")
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                        # Отдать управление вставкам, пока разбирается следующая пачка
+                        await asyncio.sleep(0)
+                if batch:
+                    yield batch
+            
+            try:
+                counts = await write_batches(db.companies, batches(), rejects, concurrency, upsert)
+            finally:
+                rejects.close()
+                rejected = rejects.count
+        
+        # Пересчитать счетчики категорий и сбросить ETag списков компаний в API
+        if counts["inserted"] or counts["updated"]:
+            await rebuild_category_counts(db)
+            await bump_collection_version(db, "companies")
         
+        elapsed = time.perf_counter() - started
         print("\n" + "=" * 70)
-        print(f"✅ Импорт завершен!")
-        print(f"  Успешно: {imported}")
-        print(f"  Ошибок: {errors}")
+        print(f"✅ Импорт завершен за {elapsed:.1f} с")
+        print(f"  Прочитано строк: {read}")
+        print(f"  Добавлено: {counts['inserted']}")
+        if upsert:
+            print(f"  Обновлено: {counts['updated']}")
+            print(f"  Без изменений: {counts['unchanged']}")
+        print(f"  Отклонено: {rejected}" + (f" (см. {rejects_path})" if rejected else ""))
+        print(f"  Скорость: {read / elapsed if elapsed else 0:.0f} строк/с")
         print("=" * 70)
         
         # Статистика базы данных
-        total_companies = await db.companies.count_documents({})
-        print(f"\n📊 Всего компаний в базе: {total_companies}")
-        
+        total_companies = await db.companies.estimated_document_count()
+        print(f"\n📊 Всего компаний в базе: ~{total_companies}")
+    
     except Exception as e:
         print(f"❌ Критическая ошибка: {str(e)}")
     
     finally:
         client.close()
+    
+    return {"read": read, **counts, "rejected": rejected}
 
 async def create_sample_csv():
     """Создать пример CSV файла"""
@@ -175,20 +371,21 @@ async def create_sample_csv():
     print("Отредактируйте его и запустите: python import_from_csv.py {csv_file}")
 
 async def main():
-    import sys
-    
-    if len(sys.argv) < 2:
-        print("Использование:")
-        print("  python import_from_csv.py <путь_к_csv_файлу>")
-        print("\nИли создать пример CSV:")
-        print("  python import_from_csv.py --create-sample")
-        return
+    parser = argparse.ArgumentParser(description="Импорт компаний из CSV файла в MongoDB")
+    parser.add_argument("csv_file", nargs="?", help="путь к CSV файлу")
+    parser.add_argument("--create-sample", action="store_true", help="создать пример CSV")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="строк в одном insert_many")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="параллельных insert_many")
+    parser.add_argument("--rejects", help="файл для отклонённых строк (по умолчанию <csv>.rejects.csv)")
+    parser.add_argument("--upsert", action="store_true", help="обновлять уже импортированные компании вместо пропуска")
+    args = parser.parse_args()
     
-    if sys.argv[1] == '--create-sample':
+    if args.create_sample:
         await create_sample_csv()
+    elif args.csv_file:
+        await import_from_csv(args.csv_file, args.batch_size, args.concurrency, args.rejects, args.upsert)
     else:
-        csv_file = sys.argv[1]
-        await import_from_csv(csv_file)
+        parser.print_help()
 
 if __name__ == "__main__":
     asyncio.run(main())
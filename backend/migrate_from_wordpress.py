@@ -1,8 +1,17 @@
 """
 Скрипт для миграции данных из WordPress сайта hal.in.ua в MongoDB
+
+Миграция идемпотентна: документы связаны с записями WordPress по id
+(importKey с уникальным индексом), поэтому повторный запуск обновляет
+изменившиеся записи и не создаёт дубликатов.
+
+Записи читаются через REST API всеми страницами (X-WP-TotalPages), страницы
+загружаются параллельно (--concurrency) с повторами при сбоях. Для офлайн
+проверки и замеров есть заглушка WordPress: python wordpress_stub.py
 """
+import argparse
 import asyncio
-import requests
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from datetime import datetime
@@ -11,6 +20,15 @@ from pathlib import Path
 from bs4 import BeautifulSoup
 import re
 
+from utils.category_counts import rebuild_category_counts
+from utils.conditional import bump_collection_version
+from utils.imports import (
+    BLOG_POST_NATURAL_FIELDS, COMPANY_NATURAL_FIELDS, UPSERT_BATCH_SIZE,
+    adopt_legacy_documents, natural_values, upsert_operation, upsert_report, wordpress_key
+)
+from utils.indexes import IMPORT_KEY_INDEXES, apply_indexes
+from utils.wordpress_api import WP_CONCURRENCY, WP_PER_PAGE, WordPressClient, WordPressError
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -20,13 +38,14 @@ db_name = os.environ['DB_NAME']
 
 # WordPress site URL
 WORDPRESS_URL = "https://hal.in.ua"
-WORDPRESS_API = f"{WORDPRESS_URL}/wp-json/wp/v2"
 
 class WordPressMigrator:
-    def __init__(self):
+    def __init__(self, wordpress_url=WORDPRESS_URL, concurrency=WP_CONCURRENCY, per_page=WP_PER_PAGE, transport=None):
         self.client = AsyncIOMotorClient(mongo_url)
         self.db = self.client[db_name]
-        self.session = requests.Session()
+        self.wordpress_url = wordpress_url
+        self.per_page = per_page
+        self.wp = WordPressClient(wordpress_url, concurrency=concurrency, transport=transport)
         
     def clean_html(self, html_text):
         """Remove HTML tags and clean text"""
@@ -35,6 +54,54 @@ class WordPressMigrator:
         soup = BeautifulSoup(html_text, 'html.parser')
         return soup.get_text().strip()
     
+    async def upsert_all(self, collection, operations):
+        """bulk_write upserts in batches; returns inserted/updated/unchanged counts"""
+        report = {"inserted": 0, "updated": 0, "unchanged": 0}
+        for start in range(0, len(operations), UPSERT_BATCH_SIZE):
+            result = await collection.bulk_write(operations[start:start + UPSERT_BATCH_SIZE], ordered=False)
+            for name, value in upsert_report(result.bulk_api_result).items():
+                report[name] += value
+        return report
+    
+    def print_report(self, report, what):
+        print(f"✅ {what}: {report['inserted']} new, {report['updated']} updated, {report['unchanged']} unchanged")
+    
+    def new_report(self):
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+    
+    async def migrate_pages(self, path, collection, to_document, natural_fields, report):
+        """
+        Upsert every item of a paginated WordPress collection as its pages arrive;
+        returns the number of items found. Written batches are added to `report`
+        as they go, so a failure mid-way still shows what was already written.
+        `to_document` returns (importKey, fields, on_insert) for an item; documents
+        migrated before importKey existed are matched on `natural_fields`.
+        """
+        now = datetime.utcnow()
+        found = 0
+        operations = []
+        natural_keys = {}
+        
+        async def flush():
+            if not operations:
+                return
+            await adopt_legacy_documents(collection, natural_keys, natural_fields)
+            for name, value in (await self.upsert_all(collection, operations)).items():
+                report[name] += value
+            operations.clear()
+            natural_keys.clear()
+        
+        async for items in self.wp.pages(path, {"_embed": "true"}, per_page=self.per_page):
+            found += len(items)
+            for item in items:
+                key, fields, on_insert = to_document(item, now)
+                operations.append(upsert_operation(key, fields, on_insert, now))
+                natural_keys[key] = natural_values(fields, natural_fields)
+            if len(operations) >= UPSERT_BATCH_SIZE:
+                await flush()
+        await flush()
+        return found
+    
     def extract_excerpt(self, content, max_length=200):
         """Extract excerpt from content"""
         text = self.clean_html(content)
@@ -46,61 +113,54 @@ class WordPressMigrator:
         """Migrate WordPress blog posts"""
         print("\n📝 Migrating blog posts...")
         
+        report = self.new_report()
         try:
-            # Get posts from WordPress REST API
-            response = self.session.get(f"{WORDPRESS_API}/posts", params={
-                "per_page": 100,
-                "_embed": True  # Include featured image
-            })
-            
-            if response.status_code != 200:
-                print(f"❌ Failed to fetch posts from WordPress: {response.status_code}")
-                return
-            
-            posts = response.json()
-            print(f"Found {len(posts)} posts in WordPress")
-            
-            migrated = 0
-            for post in posts:
-                # Extract data
-                title = post.get('title', {}).get('rendered', '')
-                content = post.get('content', {}).get('rendered', '')
-                excerpt = post.get('excerpt', {}).get('rendered', '')
-                
-                if not excerpt:
-                    excerpt = self.extract_excerpt(content)
-                
-                # Get featured image
-                image_url = "https://via.placeholder.com/800x400/E0E0E0/666666?text=Blog+Post"
-                if '_embedded' in post and 'wp:featuredmedia' in post['_embedded']:
-                    featured_media = post['_embedded']['wp:featuredmedia']
-                    if featured_media and len(featured_media) > 0:
-                        image_url = featured_media[0].get('source_url', image_url)
-                
-                # Create blog post document
-                blog_post = {
-                    "titleUk": self.clean_html(title),
-                    "titleRu": self.clean_html(title),  # Will need translation
-                    "contentUk": self.clean_html(content),
-                    "contentRu": self.clean_html(content),  # Will need translation
-                    "excerptUk": self.clean_html(excerpt),
-                    "excerptRu": self.clean_html(excerpt),  # Will need translation
-                    "image": image_url,
-                    "author": "HAL Team",
-                    "publishedAt": datetime.fromisoformat(post['date'].replace('Z', '+00:00')),
-                    "createdAt": datetime.utcnow(),
-                    "updatedAt": datetime.utcnow()
-                }
-                
-                # Insert into MongoDB
-                await self.db.blog_posts.insert_one(blog_post)
-                migrated += 1
-                print(f"  ✓ Migrated: {blog_post['titleUk'][:50]}...")
-            
-            print(f"✅ Successfully migrated {migrated} blog posts")
+            found = await self.migrate_pages(
+                "/posts", self.db.blog_posts, self.blog_post_document, BLOG_POST_NATURAL_FIELDS, report
+            )
+            print(f"Found {found} posts in WordPress")
+            self.print_report(report, "Blog posts")
             
+        except WordPressError as e:
+            print(f"❌ Failed to fetch posts from WordPress: {e.status_code}")
         except Exception as e:
             print(f"❌ Error migrating blog posts: {str(e)}")
+        finally:
+            # Batches written before a failure are live too
+            if report["inserted"] or report["updated"]:
+                await bump_collection_version(self.db, "blog_posts")
+    
+    def blog_post_document(self, post, now):
+        """(importKey, fields, on_insert) of one WordPress post, keyed by its id"""
+        # Extract data
+        title = post.get('title', {}).get('rendered', '')
+        content = post.get('content', {}).get('rendered', '')
+        excerpt = post.get('excerpt', {}).get('rendered', '')
+        
+        if not excerpt:
+            excerpt = self.extract_excerpt(content)
+        
+        # Get featured image
+        image_url = "https://via.placeholder.com/800x400/E0E0E0/666666?text=Blog+Post"
+        if '_embedded' in post and 'wp:featuredmedia' in post['_embedded']:
+            featured_media = post['_embedded']['wp:featuredmedia']
+            if featured_media and len(featured_media) > 0:
+                image_url = featured_media[0].get('source_url', image_url)
+        
+        # Create blog post document
+        blog_post = {
+            "titleUk": self.clean_html(title),
+            "titleRu": self.clean_html(title),  # Will need translation
+            "contentUk": self.clean_html(content),
+            "contentRu": self.clean_html(content),  # Will need translation
+            "excerptUk": self.clean_html(excerpt),
+            "excerptRu": self.clean_html(excerpt),  # Will need translation
+            "image": image_url,
+            "author": "HAL Team",
+            "publishedAt": datetime.fromisoformat(post['date'].replace('Z', '+00:00'))
+        }
+        
+        return wordpress_key("post", post['id']), blog_post, {"createdAt": now}
     
     async def migrate_listings(self):
         """
@@ -110,80 +170,75 @@ class WordPressMigrator:
         """
         print("\n🏢 Migrating business listings...")
         
+        report = self.new_report()
         try:
-            # Try to get custom post type 'listing'
             # Note: WordPress REST API for custom post types might be different
-            response = self.session.get(f"{WORDPRESS_URL}/wp-json/wp/v2/listing", params={
-                "per_page": 100,
-                "_embed": True
-            })
+            found = await self.migrate_pages(
+                "/listing", self.db.companies, self.listing_document, COMPANY_NATURAL_FIELDS, report
+            )
+            print(f"Found {found} listings in WordPress")
+            self.print_report(report, "Companies")
             
-            if response.status_code == 404:
+        except WordPressError as e:
+            if e.status_code == 404:
                 print("⚠️  Custom post type 'listing' not found in WordPress API")
                 print("You may need to:")
                 print("  1. Check the actual custom post type name")
                 print("  2. Export listings from WordPress admin panel")
                 print("  3. Manually import using CSV or JSON format")
-                return
-            
-            if response.status_code != 200:
-                print(f"❌ Failed to fetch listings: {response.status_code}")
-                return
-            
-            listings = response.json()
-            print(f"Found {len(listings)} listings in WordPress")
-            
-            migrated = 0
-            for listing in listings:
-                # Extract listing data
-                # This will depend on how listings are structured in WordPress
-                title = listing.get('title', {}).get('rendered', '')
-                content = listing.get('content', {}).get('rendered', '')
-                
-                # Extract custom fields (meta data)
-                # You'll need to adjust these based on actual meta field names
-                meta = listing.get('meta', {})
-                
-                # Create company document
-                company = {
-                    "name": self.clean_html(title),
-                    "nameRu": self.clean_html(title),
-                    "description": self.extract_excerpt(content, 500),
-                    "descriptionRu": self.extract_excerpt(content, 500),
-                    "category": "other",  # Default, should be mapped from WordPress
-                    "location": {
-                        "city": meta.get('city', 'Kyiv'),
-                        "address": meta.get('address', '')
-                    },
-                    "contacts": {
-                        "phone": meta.get('phone', ''),
-                        "email": meta.get('email', ''),
-                        "website": meta.get('website', '')
-                    },
-                    "image": "https://via.placeholder.com/400x300/E0E0E0/666666?text=Company",
-                    "images": [],
-                    "rating": 0.0,
-                    "reviewCount": 0,
-                    "isNew": False,
-                    "isActive": True,
-                    "createdAt": datetime.utcnow(),
-                    "updatedAt": datetime.utcnow()
-                }
-                
-                # Get featured image
-                if '_embedded' in listing and 'wp:featuredmedia' in listing['_embedded']:
-                    featured_media = listing['_embedded']['wp:featuredmedia']
-                    if featured_media and len(featured_media) > 0:
-                        company['image'] = featured_media[0].get('source_url', company['image'])
-                
-                await self.db.companies.insert_one(company)
-                migrated += 1
-                print(f"  ✓ Migrated: {company['name'][:50]}...")
-            
-            print(f"✅ Successfully migrated {migrated} companies")
-            
+            else:
+                print(f"❌ Failed to fetch listings: {e.status_code}")
         except Exception as e:
             print(f"❌ Error migrating listings: {str(e)}")
+        finally:
+            # Batches written before a failure are live too
+            if report["inserted"] or report["updated"]:
+                await rebuild_category_counts(self.db)
+                await bump_collection_version(self.db, "companies")
+    
+    def listing_document(self, listing, now):
+        """(importKey, fields, on_insert) of one WordPress listing, keyed by its id"""
+        # Extract listing data
+        # This will depend on how listings are structured in WordPress
+        title = listing.get('title', {}).get('rendered', '')
+        content = listing.get('content', {}).get('rendered', '')
+        
+        # Extract custom fields (meta data)
+        # You'll need to adjust these based on actual meta field names
+        meta = listing.get('meta', {})
+        
+        # Create company document
+        company = {
+            "name": self.clean_html(title),
+            "nameRu": self.clean_html(title),
+            "description": self.extract_excerpt(content, 500),
+            "descriptionRu": self.extract_excerpt(content, 500),
+            "category": "other",  # Default, should be mapped from WordPress
+            "location": {
+                "city": meta.get('city', 'Kyiv'),
+                "address": meta.get('address', '')
+            },
+            "contacts": {
+                "phone": meta.get('phone', ''),
+                "email": meta.get('email', ''),
+                "website": meta.get('website', '')
+            },
+            "image": "https://via.placeholder.com/400x300/E0E0E0/666666?text=Company",
+            "images": []
+        }
+        
+        # Get featured image
+        if '_embedded' in listing and 'wp:featuredmedia' in listing['_embedded']:
+            featured_media = listing['_embedded']['wp:featuredmedia']
+            if featured_media and len(featured_media) > 0:
+                company['image'] = featured_media[0].get('source_url', company['image'])
+        
+        # Upsert by WordPress listing id; ratings and flags belong to the API
+        return (
+            wordpress_key("listing", listing['id']),
+            company,
+            {"rating": 0.0, "ratingSum": 0, "reviewCount": 0, "isNew": False, "isActive": True, "createdAt": now}
+        )
     
     async def scrape_companies_from_site(self):
         """
@@ -194,7 +249,7 @@ class WordPressMigrator:
         
         try:
             # Scrape from main page or search page
-            response = self.session.get(f"{WORDPRESS_URL}/?s=")
+            response = await self.wp.get(f"{self.wordpress_url}/?s=")
             
             if response.status_code != 200:
                 print(f"❌ Failed to fetch website: {response.status_code}")
@@ -220,20 +275,25 @@ class WordPressMigrator:
         print("HAL WordPress to MongoDB Migration")
         print("=" * 70)
         
-        # Clear existing data (optional - comment out to keep existing data)
-        # print("\n🗑️  Clearing existing data...")
-        # await self.db.companies.delete_many({})
-        # await self.db.blog_posts.delete_many({})
-        # print("✓ Data cleared")
-        
-        # Migrate blog posts
-        await self.migrate_blog_posts()
+        # Unique importKey indexes make re-runs update instead of duplicate
+        await apply_indexes(self.db, IMPORT_KEY_INDEXES.values())
         
-        # Migrate listings
-        await self.migrate_listings()
-        
-        # Alternative: scrape from website
-        # await self.scrape_companies_from_site()
+        started = time.perf_counter()
+        try:
+            # Migrate blog posts
+            await self.migrate_blog_posts()
+            
+            # Migrate listings
+            await self.migrate_listings()
+            
+            # Alternative: scrape from website
+            # await self.scrape_companies_from_site()
+        finally:
+            await self.wp.close()
+        elapsed = time.perf_counter() - started
+        stats = self.wp.stats
+        print(f"\n🌐 WordPress: {stats['pages']} pages, {stats['requests']} requests "
+              f"({stats['retries']} retries) in {elapsed:.1f}s, {stats['pages'] / max(elapsed, 1e-9):.1f} pages/s")
         
         print("\n" + "=" * 70)
         print("Migration completed!")
@@ -247,7 +307,13 @@ class WordPressMigrator:
         self.client.close()
 
 async def main():
-    migrator = WordPressMigrator()
+    parser = argparse.ArgumentParser(description="Миграция данных из WordPress в MongoDB HAL")
+    parser.add_argument("--url", default=WORDPRESS_URL, help="адрес сайта WordPress")
+    parser.add_argument("--concurrency", type=int, default=WP_CONCURRENCY, help="одновременных запросов к WordPress")
+    parser.add_argument("--per-page", type=int, default=WP_PER_PAGE, help="записей на страницу (не больше 100)")
+    args = parser.parse_args()
+    
+    migrator = WordPressMigrator(args.url, args.concurrency, args.per_page)
     await migrator.run_migration()
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+"""
+Recompute company rating counters (ratingSum, reviewCount, rating) from the
+reviews collection
+
+Use it to repair drift, e.g. after reviews were imported or deleted directly
+in MongoDB.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+
+from utils.conditional import bump_collection_version
+from utils.ratings import reconcile_ratings
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+db_name = os.environ['DB_NAME']
+
+async def main():
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    try:
+        print("⭐ Reconciling company ratings with reviews...")
+        report = await reconcile_ratings(db)
+        print(f"  Companies with reviews: {report['reviewed']}")
+        print(f"  Fixed: {report['fixed']}")
+        print(f"  Reset to zero (no reviews): {report['reset']}")
+        if report['fixed'] or report['reset']:
+            # Cached lists and other API workers notice the change through the collection version
+            await bump_collection_version(db, "companies")
+        print("✅ Done")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,16 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, Header, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, List
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 # Import models
 from models.company import Company, CompanyCreate, CompanyUpdate
@@ -16,7 +18,37 @@ from models.user import User, UserCreate, UserLogin
 from models.review import Review, ReviewCreate
 from models.blog import BlogPost
 from models.contact import ContactMessage
-from utils.auth import get_password_hash, verify_password, create_access_token, decode_token
+from utils.auth import (
+    get_password_hash_async, verify_password_async, password_hash_stats,
+    create_access_token, decode_token
+)
+from utils.search import company_search_index
+from utils.suggest import company_suggest_index
+from utils.index_sync import CompanyIndexSync
+from utils.pagination import (
+    COMPANY_SORTS, REVIEW_SORT, BLOG_SORT, InvalidCursor,
+    apply_cursor, decode_ranked_cursor, encode_cursor, ranked_start, split_page
+)
+from utils.count_cache import count_cache
+from utils.indexes import apply_indexes, verify_queries, IndexCreationError, IndexVerificationError
+from utils.category_counts import (
+    CATEGORIES, apply_category_delta, get_category_counts, rebuild_category_counts
+)
+from utils.view_buffer import ViewBuffer
+from utils.view_rollup import apply_view_rollup, get_view_stats
+from utils.ttl_cache import TTLCache
+from utils.ratings import add_rating_update, rating_fields
+from utils.response_cache import create_response_cache
+from utils.conditional import (
+    document_etag, is_conditional, list_etag, not_modified, validator_headers,
+    get_collection_version, bump_collection_version
+)
+from utils.serialization import FastJSONResponse, dumps
+from utils.fieldsets import InvalidFieldset, fields_param, parse_fields, projection_for
+from utils.geo import geo_point, nearby_pipeline
+from utils.facets import InvalidFacet, facet_pipeline, parse_facets, read_facet_result
+from utils.delta import record_company_deletion
+from utils.downloads import DOWNLOAD_FILES, ExportArtifacts, data_version, export_in_subprocess
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -26,6 +58,39 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Buffered writes of company view events
+view_buffer = ViewBuffer(
+    db.company_views,
+    max_size=int(os.environ.get('VIEW_BUFFER_SIZE', 10000)),
+    batch_size=int(os.environ.get('VIEW_FLUSH_BATCH', 500)),
+    flush_interval=float(os.environ.get('VIEW_FLUSH_INTERVAL', 1.0)),
+    policy=os.environ.get('VIEW_BUFFER_POLICY', 'drop'),
+    on_flush=lambda events: apply_view_rollup(db, events)
+)
+
+# Short-lived per-owner dashboard cache
+dashboard_cache = TTLCache(
+    max_entries=int(os.environ.get('DASHBOARD_CACHE_SIZE', 1000)),
+    ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+)
+
+# Read-through cache of public GET responses
+response_cache = create_response_cache(
+    os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'),
+    max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 60))
+)
+
+# Search and suggest indexes, caught up with writes made outside this process
+company_index_sync = CompanyIndexSync(company_search_index, company_suggest_index)
+SEARCH_SYNC_INTERVAL = float(os.environ.get('SEARCH_SYNC_INTERVAL', 2.0))
+
+# Authenticated user projections by user id
+user_cache = TTLCache(
+    max_entries=int(os.environ.get('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 60))
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -35,27 +100,49 @@ api_router = APIRouter(prefix="/api")
 # Security
 security = HTTPBearer()
 
+# Public fields of each document type; reading with these projections means the
+# helpers below only fill defaults and stringify ids instead of copying every field
+COMPANY_PROJECTION = dict.fromkeys([
+    "name", "nameRu", "description", "descriptionRu", "category", "location", "contacts",
+    "image", "images", "rating", "reviewCount", "isNew", "isActive", "userId",
+    "createdAt", "updatedAt"
+], 1)
+COMPANY_DEFAULTS = {"images": [], "rating": 0.0, "reviewCount": 0, "isNew": False, "isActive": True, "userId": None}
+
+# Named company fieldsets for `fields=`; listing cards only need the first one
+COMPANY_FIELD_PRESETS = {
+    "card": ("name", "nameRu", "category", "image", "rating", "reviewCount", "isNew", "location"),
+    "detail": (
+        "name", "nameRu", "category", "image", "rating", "reviewCount", "isNew", "location",
+        "description", "descriptionRu", "contacts", "createdAt", "updatedAt"
+    ),
+    "full": tuple(COMPANY_PROJECTION),
+}
+
+REVIEW_PROJECTION = dict.fromkeys([
+    "companyId", "userId", "userName", "rating", "comment", "commentRu", "createdAt", "updatedAt"
+], 1)
+REVIEW_DEFAULTS = {"commentRu": None}
+
+BLOG_POST_PROJECTION = dict.fromkeys([
+    "titleUk", "titleRu", "contentUk", "contentRu", "excerptUk", "excerptRu", "image",
+    "author", "publishedAt", "createdAt", "updatedAt"
+], 1)
+BLOG_POST_DEFAULTS = {"author": "HAL Team"}
+
 # Helper function to convert ObjectId to string
-def company_helper(company) -> dict:
-    return {
-        "_id": str(company["_id"]),
-        "name": company["name"],
-        "nameRu": company["nameRu"],
-        "description": company["description"],
-        "descriptionRu": company["descriptionRu"],
-        "category": company["category"],
-        "location": company["location"],
-        "contacts": company["contacts"],
-        "image": company["image"],
-        "images": company.get("images", []),
-        "rating": company.get("rating", 0.0),
-        "reviewCount": company.get("reviewCount", 0),
-        "isNew": company.get("isNew", False),
-        "isActive": company.get("isActive", True),
-        "userId": company.get("userId"),
-        "createdAt": company.get("createdAt", datetime.utcnow()),
-        "updatedAt": company.get("updatedAt", datetime.utcnow())
-    }
+def company_helper(company, fields: Optional[tuple] = None) -> dict:
+    """
+    Public view of a company document read with COMPANY_PROJECTION, or with
+    the projection of `fields` (extra keys read for sorting are left out)
+    """
+    if fields is None:
+        doc = {**COMPANY_DEFAULTS, **company}
+    else:
+        doc = {field: company.get(field, COMPANY_DEFAULTS.get(field)) for field in fields}
+        doc["_id"] = company["_id"]
+    doc["_id"] = str(doc["_id"])
+    return doc
 
 def user_helper(user) -> dict:
     return {
@@ -69,33 +156,51 @@ def user_helper(user) -> dict:
     }
 
 def review_helper(review) -> dict:
-    return {
-        "_id": str(review["_id"]),
-        "companyId": str(review["companyId"]),
-        "userId": str(review["userId"]),
-        "userName": review["userName"],
-        "rating": review["rating"],
-        "comment": review["comment"],
-        "commentRu": review.get("commentRu"),
-        "createdAt": review.get("createdAt", datetime.utcnow()),
-        "updatedAt": review.get("updatedAt", datetime.utcnow())
-    }
+    """Public view of a review document read with REVIEW_PROJECTION"""
+    doc = {**REVIEW_DEFAULTS, **review}
+    doc["_id"] = str(doc["_id"])
+    doc["companyId"] = str(doc["companyId"])
+    doc["userId"] = str(doc["userId"])
+    return doc
 
 def blog_post_helper(post) -> dict:
-    return {
-        "_id": str(post["_id"]),
-        "titleUk": post["titleUk"],
-        "titleRu": post["titleRu"],
-        "contentUk": post["contentUk"],
-        "contentRu": post["contentRu"],
-        "excerptUk": post["excerptUk"],
-        "excerptRu": post["excerptRu"],
-        "image": post["image"],
-        "author": post.get("author", "HAL Team"),
-        "publishedAt": post.get("publishedAt", datetime.utcnow()),
-        "createdAt": post.get("createdAt", datetime.utcnow()),
-        "updatedAt": post.get("updatedAt", datetime.utcnow())
-    }
+    """Public view of a blog post document read with BLOG_POST_PROJECTION"""
+    doc = {**BLOG_POST_DEFAULTS, **post}
+    doc["_id"] = str(doc["_id"])
+    return doc
+
+def page_count(total: Optional[int], limit: int) -> Optional[int]:
+    return (total + limit - 1) // limit if total is not None else None
+
+def decode_search_cursor(cursor: str) -> tuple:
+    try:
+        return decode_ranked_cursor(cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def apply_page_cursor(query: dict, sort: list, cursor: str) -> dict:
+    try:
+        return apply_cursor(query, sort, cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def load_user(user_id: str) -> Optional[dict]:
+    """user_helper projection of a user, served from the user cache when possible"""
+    user = user_cache.get(user_id)
+    if user is None:
+        if not ObjectId.is_valid(user_id):
+            return None
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if user is None:
+            return None
+        user = user_helper(user)
+        user_cache.set(user_id, user)
+    return dict(user)
+
+def invalidate_user(user_id: str):
+    """Forget cached data derived from a user document (profile or role changes)"""
+    user_cache.delete(str(user_id))
+    dashboard_cache.delete(str(user_id))
 
 # Dependency to get current user
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -108,11 +213,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await load_user(user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return user_helper(user)
+    return user
 
 # Optional authentication
 async def get_current_user_optional(authorization: Optional[str] = Header(None)):
@@ -128,26 +233,70 @@ async def get_current_user_optional(authorization: Optional[str] = Header(None))
     if user_id is None:
         return None
     
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if user is None:
-        return None
-    
-    return user_helper(user)
+    return await load_user(user_id)
 
 
 # ============ COMPANIES ENDPOINTS ============
 
 @api_router.get("/companies")
 async def get_companies(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     category: Optional[str] = None,
     search: Optional[str] = None,
-    sort: str = Query("recent", regex="^(recent|popular|rating)$"),
-    isNew: Optional[bool] = None
+    sort: str = Query("recent", regex="^(recent|popular|rating|relevance)$"),
+    isNew: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    countMode: str = Query("exact", regex="^(exact|estimate|none)$"),
+    fields: Optional[str] = Query(None, description="Field names and/or presets: " + ", ".join(COMPANY_FIELD_PRESETS)),
+    facets: Optional[str] = Query(None, description="Value counts to include: category, city, isNew")
 ):
-    """Get list of companies with filtering and pagination"""
+    """Get list of companies with filtering and pagination (page or cursor)"""
+    try:
+        selected = parse_fields(fields, COMPANY_FIELD_PRESETS, COMPANY_PROJECTION)
+        facet_names = parse_facets(facets)
+    except (InvalidFieldset, InvalidFacet) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    params = {
+        "page": page, "limit": limit, "category": category, "search": search,
+        "sort": sort, "isNew": isNew, "cursor": cursor, "countMode": countMode,
+        "fields": fields_param(selected), "facets": ",".join(facet_names) or None
+    }
+    version = await get_collection_version(db, "companies")
+    etag = list_etag(version, params)
+    if not_modified(request.headers, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    # The cache keeps serialized bodies, so hits skip serialization too. The
+    # version is part of the key, so the body always matches the ETag even when
+    # another process bumped it
+    cache_key = response_cache.key("companies", "/companies", {**params, "version": version})
+    body = response_cache.get(cache_key)
+    if body is None:
+        if search:
+            # Searches are served by the in-process index, which may lag other writers
+            await company_index_sync.catch_up(db, version)
+        body = dumps(await list_companies(**{**params, "fields": selected, "facets": facet_names}))
+        response_cache.set(cache_key, body)
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
+async def list_companies(
+    page: int,
+    limit: int,
+    category: Optional[str],
+    search: Optional[str],
+    sort: str,
+    isNew: Optional[bool],
+    cursor: Optional[str],
+    countMode: str,
+    fields: tuple = COMPANY_FIELD_PRESETS["full"],
+    facets: tuple = ()
+) -> dict:
     skip = (page - 1) * limit
+    # Full documents keep the plain helper; narrower ones only return what was asked
+    helper_fields = None if set(fields) == set(COMPANY_PROJECTION) else fields
     
     # Build query
     query = {"isActive": True}
@@ -156,47 +305,160 @@ async def get_companies(
     if isNew is not None:
         query["isNew"] = isNew
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"nameRu": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"descriptionRu": {"$regex": search, "$options": "i"}}
-        ]
-    
-    # Build sort
-    sort_field = {
-        "recent": [("createdAt", -1)],
-        "popular": [("reviewCount", -1), ("rating", -1)],
-        "rating": [("rating", -1), ("reviewCount", -1)]
-    }.get(sort, [("createdAt", -1)])
-    
-    # Get companies
-    companies_cursor = db.companies.find(query).sort(sort_field).skip(skip).limit(limit)
-    companies = await companies_cursor.to_list(length=limit)
-    
-    # Get total count
-    total = await db.companies.count_documents(query)
+        # Full-text search is served by the in-process index, filters included
+        ranked = company_search_index.search(search, filters=query)
+        total = len(ranked) if countMode != "none" else None
+        
+        if sort == "relevance":
+            start = skip
+            if cursor:
+                last_score, last_id = decode_search_cursor(cursor)
+                start = ranked_start(ranked, last_score, last_id)
+            page_ids = [ObjectId(doc_id) for doc_id, _ in ranked[start:start + limit]]
+            found = await db.companies.find({"_id": {"$in": page_ids}}, projection_for(fields)).to_list(length=limit)
+            by_id = {company["_id"]: company for company in found}
+            companies = [by_id[doc_id] for doc_id in page_ids if doc_id in by_id]
+            
+            next_cursor = None
+            if start + limit < len(ranked):
+                last_id, last_score = ranked[start + limit - 1]
+                next_cursor = encode_cursor([last_score, last_id])
+            
+            result = {
+                "companies": [company_helper(company, helper_fields) for company in companies],
+                "total": total,
+                "page": page,
+                "pages": page_count(total, limit),
+                "nextCursor": next_cursor
+            }
+            if facets:
+                # The page comes from the index, so only the counts are aggregated
+                pipeline = facet_pipeline(
+                    {"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in ranked]}}, facets, {}, with_total=False
+                )
+                rows = await db.companies.aggregate(pipeline).to_list(length=1)
+                result["facets"] = read_facet_result(rows[0] if rows else {}, facets)[2]
+            return result
+        
+        query = {"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in ranked]}}
+    
+    # Build sort (relevance without a search falls back to recent)
+    sort_field = COMPANY_SORTS.get(sort, COMPANY_SORTS["recent"])
+    
+    # Sort keys are read too, the next cursor is built from them
+    projection = projection_for(fields, extra=[field for field, _ in sort_field if field != "_id"])
+    
+    facet_counts = None
+    if facets:
+        # Page, total and facet counts in one aggregation
+        pipeline = facet_pipeline(
+            query, facets, projection,
+            sort=sort_field,
+            seek=apply_page_cursor({}, sort_field, cursor) if cursor else None,
+            skip=0 if cursor else skip,
+            limit=limit,
+            with_total=not search and countMode != "none"
+        )
+        rows = await db.companies.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+        companies, facet_total, facet_counts = read_facet_result(rows[0] if rows else {}, facets)
+        if not search:
+            total = facet_total
+    else:
+        # Get companies: seek past the cursor if given, otherwise skip to the page
+        page_query = apply_page_cursor(query, sort_field, cursor) if cursor else query
+        companies_cursor = db.companies.find(page_query, projection).sort(sort_field)
+        if not cursor:
+            companies_cursor = companies_cursor.skip(skip)
+        companies = await companies_cursor.limit(limit + 1).to_list(length=limit + 1)
+        
+        # Get total count (the search index already knows it)
+        if not search:
+            total = await count_cache.count(db.companies, query, mode=countMode)
+    companies, next_cursor = split_page(companies, limit, sort_field)
     
-    return {
-        "companies": [company_helper(company) for company in companies],
+    result = {
+        "companies": [company_helper(company, helper_fields) for company in companies],
         "total": total,
         "page": page,
-        "pages": (total + limit - 1) // limit
+        "pages": page_count(total, limit),
+        "nextCursor": next_cursor
     }
+    if facet_counts is not None:
+        result["facets"] = facet_counts
+    return result
+
+
+@api_router.get("/companies/suggest")
+async def suggest_companies(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20)
+):
+    """Typeahead: most popular companies and categories matching a name prefix"""
+    return FastJSONResponse({
+        "companies": company_suggest_index.suggest_companies(q, limit),
+        "categories": company_suggest_index.suggest_categories(q)
+    })
+
+
+@api_router.get("/companies/nearby")
+async def get_nearby_companies(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5.0, gt=0, le=50, description="Radius in km"),
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = Query("card", description="Field names and/or presets: " + ", ".join(COMPANY_FIELD_PRESETS))
+):
+    """Active companies within `radius` km of a point, nearest first"""
+    try:
+        selected = parse_fields(fields, COMPANY_FIELD_PRESETS, COMPANY_PROJECTION)
+    except InvalidFieldset as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    query = {"isActive": True}
+    if category:
+        query["category"] = category
+    pipeline = nearby_pipeline(lat, lng, radius * 1000, query, limit, projection_for(selected))
+    
+    companies = []
+    async for company in db.companies.aggregate(pipeline):
+        doc = company_helper(company, selected)
+        doc["distance"] = round(company["distance"])
+        companies.append(doc)
+    return FastJSONResponse({"companies": companies, "total": len(companies)})
 
 
 @api_router.get("/companies/{company_id}")
 async def get_company(
     company_id: str,
+    request: Request,
     current_user: dict = Depends(get_current_user_optional)
 ):
     """Get company details and track view"""
     if not ObjectId.is_valid(company_id):
         raise HTTPException(status_code=400, detail="Invalid company ID")
     
-    company = await db.companies.find_one({"_id": ObjectId(company_id)})
-    if company is None:
-        raise HTTPException(status_code=404, detail="Company not found")
+    # Cached entries are (serialized body, ETag, updatedAt)
+    cache_key = response_cache.key(f"company:{company_id}", "/companies/{id}")
+    entry = response_cache.get(cache_key)
+    
+    # Validators come from the cache or a tiny projection, never a full read
+    validators = entry[1:] if entry is not None else None
+    if validators is None and is_conditional(request.headers):
+        stamp = await db.companies.find_one({"_id": ObjectId(company_id)}, {"updatedAt": 1})
+        if stamp is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        validators = (document_etag(stamp), stamp.get("updatedAt"))
+    unchanged = validators is not None and not_modified(request.headers, *validators)
+    
+    if entry is None and not unchanged:
+        company = await db.companies.find_one({"_id": ObjectId(company_id)}, COMPANY_PROJECTION)
+        if company is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        company = company_helper(company)
+        entry = (dumps(company), document_etag(company), company.get("updatedAt"))
+        response_cache.set(cache_key, entry)
+        validators = entry[1:]
     
     # Track view
     view_record = {
@@ -204,9 +466,11 @@ async def get_company(
         "userId": ObjectId(current_user["_id"]) if current_user else None,
         "viewedAt": datetime.utcnow()
     }
-    await db.company_views.insert_one(view_record)
+    await view_buffer.record(view_record)
     
-    return company_helper(company)
+    if unchanged:
+        return Response(status_code=304, headers=validator_headers(*validators))
+    return FastJSONResponse(entry[0], headers=validator_headers(*validators))
 
 
 @api_router.post("/companies", status_code=201)
@@ -218,12 +482,23 @@ async def create_company(
     company_dict = company.model_dump()
     company_dict["userId"] = current_user["_id"]
     company_dict["rating"] = 0.0
+    company_dict["ratingSum"] = 0
     company_dict["reviewCount"] = 0
     company_dict["createdAt"] = datetime.utcnow()
     company_dict["updatedAt"] = datetime.utcnow()
+    point = geo_point(company_dict["location"])
+    if point:
+        company_dict["geo"] = point
     
     result = await db.companies.insert_one(company_dict)
-    created_company = await db.companies.find_one({"_id": result.inserted_id})
+    created_company = await db.companies.find_one({"_id": result.inserted_id}, COMPANY_PROJECTION)
+    company_search_index.add(created_company)
+    company_suggest_index.add(created_company)
+    count_cache.invalidate("companies")
+    await apply_category_delta(db, None, created_company)
+    invalidate_dashboard(current_user["_id"])
+    response_cache.invalidate("companies")
+    company_index_sync.wrote(await bump_collection_version(db, "companies"))
     
     return company_helper(created_company)
 
@@ -249,13 +524,26 @@ async def update_company(
     # Update only provided fields
     update_data = {k: v for k, v in company_update.model_dump(exclude_unset=True).items() if v is not None}
     update_data["updatedAt"] = datetime.utcnow()
-    
-    await db.companies.update_one(
-        {"_id": ObjectId(company_id)},
-        {"$set": update_data}
-    )
-    
-    updated_company = await db.companies.find_one({"_id": ObjectId(company_id)})
+    update = {"$set": update_data}
+    
+    # Keep the indexed GeoJSON point in line with the location
+    if "location" in update_data:
+        point = geo_point(update_data["location"])
+        if point:
+            update_data["geo"] = point
+        else:
+            update["$unset"] = {"geo": ""}
+    
+    await db.companies.update_one({"_id": ObjectId(company_id)}, update)
+    
+    updated_company = await db.companies.find_one({"_id": ObjectId(company_id)}, COMPANY_PROJECTION)
+    company_search_index.add(updated_company)
+    company_suggest_index.add(updated_company)
+    count_cache.invalidate("companies")
+    await apply_category_delta(db, existing_company, updated_company)
+    invalidate_dashboard(existing_company.get("userId"))
+    response_cache.invalidate("companies", f"company:{company_id}")
+    company_index_sync.wrote(await bump_collection_version(db, "companies"))
     return company_helper(updated_company)
 
 
@@ -277,6 +565,14 @@ async def delete_company(
         raise HTTPException(status_code=403, detail="Not authorized to delete this company")
     
     await db.companies.delete_one({"_id": ObjectId(company_id)})
+    await record_company_deletion(db, existing_company, datetime.utcnow())
+    company_search_index.remove(company_id)
+    company_suggest_index.remove(company_id)
+    count_cache.invalidate("companies")
+    await apply_category_delta(db, existing_company, None)
+    invalidate_dashboard(existing_company.get("userId"))
+    response_cache.invalidate("companies", f"company:{company_id}")
+    company_index_sync.wrote(await bump_collection_version(db, "companies"))
     return {"message": "Company deleted successfully"}
 
 
@@ -285,23 +581,8 @@ async def delete_company(
 @api_router.get("/categories")
 async def get_categories():
     """Get all categories with company counts"""
-    categories = [
-        {"id": "cafe", "nameUk": "Кафе та ресторани", "nameRu": "Кафе и рестораны"},
-        {"id": "sport", "nameUk": "Спорт і фітнес", "nameRu": "Спорт и фитнес"},
-        {"id": "beauty", "nameUk": "Краса та здоров'я", "nameRu": "Красота и здоровье"},
-        {"id": "art", "nameUk": "Мистецтво та розваги", "nameRu": "Искусство и развлечения"},
-        {"id": "home", "nameUk": "Домашні та побутові послуги", "nameRu": "Домашние и бытовые услуги"},
-        {"id": "auto", "nameUk": "Авто послуги", "nameRu": "Авто услуги"},
-        {"id": "construction", "nameUk": "Будівництво та ремонт", "nameRu": "Строительство и ремонт"},
-        {"id": "other", "nameUk": "Інші послуги", "nameRu": "Другие услуги"}
-    ]
-    
-    # Count companies in each category
-    for category in categories:
-        count = await db.companies.count_documents({"category": category["id"], "isActive": True})
-        category["count"] = count
-    
-    return categories
+    counts = await get_category_counts(db)
+    return [{**category, "count": counts.get(category["id"], 0)} for category in CATEGORIES]
 
 
 # ============ AUTH ENDPOINTS ============
@@ -316,7 +597,7 @@ async def register(user: UserCreate):
     
     # Create user
     user_dict = user.model_dump()
-    user_dict["password"] = get_password_hash(user_dict["password"])
+    user_dict["password"] = await get_password_hash_async(user_dict["password"])
     user_dict["createdAt"] = datetime.utcnow()
     user_dict["updatedAt"] = datetime.utcnow()
     
@@ -336,7 +617,7 @@ async def register(user: UserCreate):
 async def login(user_login: UserLogin):
     """Login user"""
     user = await db.users.find_one({"email": user_login.email})
-    if not user or not verify_password(user_login.password, user["password"]):
+    if not user or not await verify_password_async(user_login.password, user["password"]):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
     # Create token
@@ -375,6 +656,7 @@ async def update_profile(
             {"_id": ObjectId(current_user["_id"])},
             {"$set": update_data}
         )
+        invalidate_user(current_user["_id"])
     
     updated_user = await db.users.find_one({"_id": ObjectId(current_user["_id"])})
     return user_helper(updated_user)
@@ -383,80 +665,45 @@ async def update_profile(
 @api_router.get("/users/me/companies")
 async def get_my_companies(current_user: dict = Depends(get_current_user)):
     """Get user's companies"""
-    companies = await db.companies.find({"userId": current_user["_id"]}).to_list(length=100)
-    return [company_helper(company) for company in companies]
+    companies = await db.companies.find({"userId": current_user["_id"]}, COMPANY_PROJECTION).to_list(length=100)
+    return FastJSONResponse([company_helper(company) for company in companies])
 
 
+def invalidate_dashboard(owner_id: Optional[str]):
+    if owner_id:
+        dashboard_cache.delete(str(owner_id))
+
 @api_router.get("/users/me/dashboard")
 async def get_dashboard(current_user: dict = Depends(get_current_user)):
     """Get user dashboard with statistics"""
+    cached = dashboard_cache.get(current_user["_id"])
+    if cached is not None:
+        return cached
+    
     # Get user's companies
     companies = await db.companies.find({"userId": current_user["_id"]}).to_list(length=100)
     company_ids = [company["_id"] for company in companies]
     
-    # Calculate statistics for each company
-    stats = []
-    for company_id in company_ids:
-        # Total views
-        total_views = await db.company_views.count_documents({"companyId": company_id})
-        
-        # Unique views (by userId)
-        unique_views_pipeline = [
-            {"$match": {"companyId": company_id}},
-            {"$group": {"_id": "$userId"}},
-            {"$count": "count"}
-        ]
-        unique_result = await db.company_views.aggregate(unique_views_pipeline).to_list(length=1)
-        unique_views = unique_result[0]["count"] if unique_result else 0
-        
-        # Views this week
-        from datetime import timedelta
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        views_this_week = await db.company_views.count_documents({
-            "companyId": company_id,
-            "viewedAt": {"$gte": week_ago}
-        })
-        
-        # Views this month
-        month_ago = datetime.utcnow() - timedelta(days=30)
-        views_this_month = await db.company_views.count_documents({
-            "companyId": company_id,
-            "viewedAt": {"$gte": month_ago}
-        })
-        
-        # Reviews count and average rating
-        reviews = await db.reviews.find({"companyId": company_id}).to_list(length=None)
-        total_reviews = len(reviews)
-        avg_rating = sum(r["rating"] for r in reviews) / total_reviews if total_reviews > 0 else 0
-        
-        # Last viewed
-        last_view = await db.company_views.find_one(
-            {"companyId": company_id},
-            sort=[("viewedAt", -1)]
-        )
-        
-        # Find company details
-        company = next((c for c in companies if c["_id"] == company_id), None)
-        
-        stats.append({
-            "companyId": str(company_id),
-            "companyName": company.get("name", "") if company else "",
-            "totalViews": total_views,
-            "uniqueViews": unique_views,
-            "viewsThisWeek": views_this_week,
-            "viewsThisMonth": views_this_month,
-            "totalReviews": total_reviews,
-            "averageRating": round(avg_rating, 1),
-            "lastViewedAt": last_view["viewedAt"] if last_view else None
-        })
+    # Views for all companies at once from the rollups; reviews from the rating counters
+    view_stats = await get_view_stats(db, company_ids)
+    
+    stats = [
+        {
+            "companyId": str(company["_id"]),
+            "companyName": company.get("name", ""),
+            **view_stats[company["_id"]],
+            **rating_fields(company)
+        }
+        for company in companies
+    ]
     
     # Overall statistics
     total_companies = len(companies)
     total_views_all = sum(s["totalViews"] for s in stats)
     total_reviews_all = sum(s["totalReviews"] for s in stats)
     
-    return {
-        "user": user_helper(await db.users.find_one({"_id": ObjectId(current_user["_id"])})),
+    dashboard = {
+        "user": current_user,
         "overview": {
             "totalCompanies": total_companies,
             "totalViews": total_views_all,
@@ -465,6 +712,8 @@ async def get_dashboard(current_user: dict = Depends(get_current_user)):
         },
         "companies": stats
     }
+    dashboard_cache.set(current_user["_id"], dashboard)
+    return dashboard
 
 
 @api_router.get("/users/me/reviews")
@@ -475,14 +724,16 @@ async def get_my_reviews(current_user: dict = Depends(get_current_user)):
     company_ids = [company["_id"] for company in companies]
     
     # Get reviews for these companies
-    reviews = await db.reviews.find({"companyId": {"$in": company_ids}}).sort("createdAt", -1).to_list(length=100)
+    reviews = await db.reviews.find(
+        {"companyId": {"$in": company_ids}}, REVIEW_PROJECTION
+    ).sort("createdAt", -1).to_list(length=100)
     
     # Add company names to reviews
+    company_names = {company["_id"]: company.get("name", "") for company in companies}
     result = []
     for review in reviews:
-        company = next((c for c in companies if c["_id"] == review["companyId"]), None)
         review_data = review_helper(review)
-        review_data["companyName"] = company.get("name", "") if company else ""
+        review_data["companyName"] = company_names.get(review["companyId"], "")
         result.append(review_data)
     
     return result
@@ -494,23 +745,31 @@ async def get_my_reviews(current_user: dict = Depends(get_current_user)):
 async def get_company_reviews(
     company_id: str,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    countMode: str = Query("exact", regex="^(exact|estimate|none)$")
 ):
-    """Get reviews for a company"""
+    """Get reviews for a company (page or cursor)"""
     if not ObjectId.is_valid(company_id):
         raise HTTPException(status_code=400, detail="Invalid company ID")
     
     skip = (page - 1) * limit
+    query = {"companyId": ObjectId(company_id)}
     
-    reviews_cursor = db.reviews.find({"companyId": ObjectId(company_id)}).sort("createdAt", -1).skip(skip).limit(limit)
-    reviews = await reviews_cursor.to_list(length=limit)
+    page_query = apply_page_cursor(query, REVIEW_SORT, cursor) if cursor else query
+    reviews_cursor = db.reviews.find(page_query, REVIEW_PROJECTION).sort(REVIEW_SORT)
+    if not cursor:
+        reviews_cursor = reviews_cursor.skip(skip)
+    reviews = await reviews_cursor.limit(limit + 1).to_list(length=limit + 1)
+    reviews, next_cursor = split_page(reviews, limit, REVIEW_SORT)
     
-    total = await db.reviews.count_documents({"companyId": ObjectId(company_id)})
+    total = await count_cache.count(db.reviews, query, mode=countMode)
     
-    return {
+    return FastJSONResponse({
         "reviews": [review_helper(review) for review in reviews],
-        "total": total
-    }
+        "total": total,
+        "nextCursor": next_cursor
+    })
 
 
 @api_router.post("/companies/{company_id}/reviews", status_code=201)
@@ -544,17 +803,23 @@ async def create_review(
     review_dict["updatedAt"] = datetime.utcnow()
     
     result = await db.reviews.insert_one(review_dict)
+    count_cache.invalidate("reviews")
     
-    # Update company rating
-    reviews = await db.reviews.find({"companyId": ObjectId(company_id)}).to_list(length=None)
-    avg_rating = sum(r["rating"] for r in reviews) / len(reviews)
-    
-    await db.companies.update_one(
+    # Update company rating counters atomically
+    counters = await db.companies.find_one_and_update(
         {"_id": ObjectId(company_id)},
-        {"$set": {"rating": round(avg_rating, 1), "reviewCount": len(reviews)}}
+        add_rating_update(review_dict["rating"], review_dict["createdAt"]),
+        projection={"reviewCount": 1, "rating": 1},
+        return_document=ReturnDocument.AFTER
     )
-    
-    created_review = await db.reviews.find_one({"_id": result.inserted_id})
+    # Caches and versions move only once the new rating is stored
+    invalidate_dashboard(company.get("userId"))
+    response_cache.invalidate("companies", f"company:{company_id}")
+    company_index_sync.wrote(await bump_collection_version(db, "companies"))
+    if counters:
+        company_suggest_index.set_popularity(company_id, counters["reviewCount"], counters["rating"])
+    
+    created_review = await db.reviews.find_one({"_id": result.inserted_id}, REVIEW_PROJECTION)
     return review_helper(created_review)
 
 
@@ -562,34 +827,74 @@ async def create_review(
 
 @api_router.get("/blog")
 async def get_blog_posts(
+    request: Request,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    countMode: str = Query("exact", regex="^(exact|estimate|none)$")
 ):
-    """Get blog posts"""
+    """Get blog posts (page or cursor)"""
+    params = {"page": page, "limit": limit, "cursor": cursor, "countMode": countMode}
+    version = await get_collection_version(db, "blog_posts")
+    etag = list_etag(version, params)
+    if not_modified(request.headers, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    cache_key = response_cache.key("blog", "/blog", {**params, "version": version})
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = dumps(await list_blog_posts(**params))
+        response_cache.set(cache_key, body)
+    return FastJSONResponse(body, headers={"ETag": etag})
+
+
+async def list_blog_posts(page: int, limit: int, cursor: Optional[str], countMode: str) -> dict:
     skip = (page - 1) * limit
     
-    posts_cursor = db.blog_posts.find().sort("publishedAt", -1).skip(skip).limit(limit)
-    posts = await posts_cursor.to_list(length=limit)
+    page_query = apply_page_cursor({}, BLOG_SORT, cursor) if cursor else {}
+    posts_cursor = db.blog_posts.find(page_query, BLOG_POST_PROJECTION).sort(BLOG_SORT)
+    if not cursor:
+        posts_cursor = posts_cursor.skip(skip)
+    posts = await posts_cursor.limit(limit + 1).to_list(length=limit + 1)
+    posts, next_cursor = split_page(posts, limit, BLOG_SORT)
     
-    total = await db.blog_posts.count_documents({})
+    total = await count_cache.count(db.blog_posts, {}, mode=countMode)
     
     return {
         "posts": [blog_post_helper(post) for post in posts],
-        "total": total
+        "total": total,
+        "nextCursor": next_cursor
     }
 
 
 @api_router.get("/blog/{post_id}")
-async def get_blog_post(post_id: str):
+async def get_blog_post(post_id: str, request: Request):
     """Get a blog post"""
     if not ObjectId.is_valid(post_id):
         raise HTTPException(status_code=400, detail="Invalid post ID")
     
-    post = await db.blog_posts.find_one({"_id": ObjectId(post_id)})
-    if post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
+    # Cached entries are (serialized body, ETag, updatedAt)
+    cache_key = response_cache.key(f"blog:{post_id}", "/blog/{id}")
+    entry = response_cache.get(cache_key)
     
-    return blog_post_helper(post)
+    validators = entry[1:] if entry is not None else None
+    if validators is None and is_conditional(request.headers):
+        stamp = await db.blog_posts.find_one({"_id": ObjectId(post_id)}, {"updatedAt": 1})
+        if stamp is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        validators = (document_etag(stamp), stamp.get("updatedAt"))
+    if validators is not None and not_modified(request.headers, *validators):
+        return Response(status_code=304, headers=validator_headers(*validators))
+    
+    if entry is None:
+        post = await db.blog_posts.find_one({"_id": ObjectId(post_id)}, BLOG_POST_PROJECTION)
+        if post is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        post = blog_post_helper(post)
+        entry = (dumps(post), document_etag(post), post.get("updatedAt"))
+        response_cache.set(cache_key, entry)
+    
+    return FastJSONResponse(entry[0], headers=validator_headers(*entry[1:]))
 
 
 # ============ CONTACT ENDPOINT ============
@@ -611,34 +916,49 @@ async def root():
     return {"message": "HAL API v1.0"}
 
 
-# Download WordPress export files
-from fastapi.responses import FileResponse
-from pathlib import Path as FilePath
-
-@api_router.get("/download/{filename}")
-async def download_file(filename: str):
-    """Download WordPress export files"""
-    allowed_files = [
-        "companies_for_wordpress.csv",
-        "blog_posts_for_wordpress.csv",
-        "hal_wordpress_export.xml",
-        "companies.json",
-        "blog_posts.json"
-    ]
+@api_router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(get_current_user)):
+    """In-process cache and buffer metrics (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
     
-    if filename not in allowed_files:
+    return {
+        "responseCache": response_cache.stats(),
+        "dashboardCache": dashboard_cache.stats(),
+        "userCache": user_cache.stats(),
+        "viewBuffer": view_buffer.stats(),
+        "passwordHashing": password_hash_stats()
+    }
+
+
+# Download WordPress export files, generated from the current data on demand
+export_artifacts = ExportArtifacts(ROOT_DIR / "wordpress_export" / "cache", export_in_subprocess)
+
+# How long a download waits for a running export before answering 202
+DOWNLOAD_WAIT_SECONDS = 10
+
+@api_router.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download_file(filename: str, request: Request):
+    """Download WordPress export files (gzip/brotli, resumable with Range)"""
+    if filename not in DOWNLOAD_FILES:
         raise HTTPException(status_code=404, detail="File not found")
     
-    file_path = FilePath(__file__).parent / "wordpress_export" / filename
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found. Run export_to_wordpress.py first")
+    version = await data_version(db)
+    build = export_artifacts.ensure(version)
+    if build is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(build), DOWNLOAD_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return FastJSONResponse(
+                {"status": "generating", "version": version},
+                status_code=202,
+                headers={"Retry-After": str(DOWNLOAD_WAIT_SECONDS)}
+            )
+        except Exception:
+            logger.exception("Export %s failed", version)
+            raise HTTPException(status_code=503, detail="Export failed, try again later")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type='application/octet-stream'
-    )
+    return export_artifacts.response(version, filename, request.method, request.headers)
 
 
 # Include the router in the main app
@@ -659,6 +979,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def build_search_index():
+    await company_index_sync.rebuild(db)
+    logger.info("Search index built: %d companies (%d suggestible)", len(company_search_index), len(company_suggest_index))
+    company_index_sync.start(db, SEARCH_SYNC_INTERVAL)
+
+@app.on_event("startup")
+async def refresh_category_counts():
+    # Reconcile counters with writes made outside the API (imports, migrations)
+    await rebuild_category_counts(db)
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # An index that cannot be built is reported here; the queries it backs fail verification below
+    try:
+        await apply_indexes(db)
+    except IndexCreationError as e:
+        logger.error("%s (fix the data, then run ensure_indexes.py)", e)
+    failures = await verify_queries(db)
+    if failures:
+        message = f"Queries without index: {', '.join(failures)}"
+        if os.environ.get('STRICT_INDEXES', '1') != '0':
+            raise IndexVerificationError(message + " (set STRICT_INDEXES=0 to start anyway)")
+        logger.warning(message)
+
+@app.on_event("startup")
+async def start_view_buffer():
+    view_buffer.start()
+
+@app.on_event("shutdown")
+async def stop_search_sync():
+    await company_index_sync.stop()
+
+@app.on_event("shutdown")
+async def flush_view_buffer():
+    await view_buffer.stop()
+    logger.info("View buffer flushed: %s", view_buffer.stats())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 import jwt
 from passlib.context import CryptContext
 import os
@@ -10,12 +13,67 @@ SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production'
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 
+# bcrypt runs in a dedicated pool so it never blocks the event loop;
+# the pool size caps how many hashes run at once
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 2))
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_CONCURRENCY,
+    thread_name_prefix="password-hash"
+)
+
+password_hash_metrics = {
+    "completed": 0,
+    "inFlight": 0,
+    "queueTimeTotal": 0.0,
+    "queueTimeMax": 0.0,
+    "runTimeTotal": 0.0,
+}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+async def _run_password_work(func, *args):
+    submitted_at = time.perf_counter()
+    started_at = None
+
+    def timed():
+        nonlocal started_at
+        started_at = time.perf_counter()
+        return func(*args)
+
+    password_hash_metrics["inFlight"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, timed)
+    finally:
+        finished_at = time.perf_counter()
+        password_hash_metrics["inFlight"] -= 1
+        if started_at is not None:
+            queue_time = started_at - submitted_at
+            password_hash_metrics["completed"] += 1
+            password_hash_metrics["queueTimeTotal"] += queue_time
+            password_hash_metrics["queueTimeMax"] = max(password_hash_metrics["queueTimeMax"], queue_time)
+            password_hash_metrics["runTimeTotal"] += finished_at - started_at
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_work(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_work(get_password_hash, password)
+
+def password_hash_stats() -> dict:
+    completed = password_hash_metrics["completed"]
+    return {
+        "concurrency": PASSWORD_HASH_CONCURRENCY,
+        "completed": completed,
+        "inFlight": password_hash_metrics["inFlight"],
+        "avgQueueTime": password_hash_metrics["queueTimeTotal"] / completed if completed else 0.0,
+        "maxQueueTime": password_hash_metrics["queueTimeMax"],
+        "avgRunTime": password_hash_metrics["runTimeTotal"] / completed if completed else 0.0,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -31,4 +89,4 @@ def decode_token(token: str) -> Optional[dict]:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except jwt.PyJWTError:
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,82 @@
+"""
+Materialized per-category counts of active companies.
+
+The counts live in a single document of the `counters` collection. They are
+rebuilt with one $group aggregation and then maintained with $inc on every
+company write, so reading them is one find_one.
+"""
+from typing import Dict, Optional
+
+CATEGORIES = [
+    {"id": "cafe", "nameUk": "Кафе та ресторани", "nameRu": "Кафе и рестораны"},
+    {"id": "sport", "nameUk": "Спорт і фітнес", "nameRu": "Спорт и фитнес"},
+    {"id": "beauty", "nameUk": "Краса та здоров'я", "nameRu": "Красота и здоровье"},
+    {"id": "art", "nameUk": "Мистецтво та розваги", "nameRu": "Искусство и развлечения"},
+    {"id": "home", "nameUk": "Домашні та побутові послуги", "nameRu": "Домашние и бытовые услуги"},
+    {"id": "auto", "nameUk": "Авто послуги", "nameRu": "Авто услуги"},
+    {"id": "construction", "nameUk": "Будівництво та ремонт", "nameRu": "Строительство и ремонт"},
+    {"id": "other", "nameUk": "Інші послуги", "nameRu": "Другие услуги"}
+]
+
+CATEGORY_IDS = {category["id"] for category in CATEGORIES}
+
+COUNTERS_DOC_ID = "category_counts"
+
+# Counted companies are the listed ones: isActive must be exactly True, as in GET /companies
+ACTIVE_FILTER = {"isActive": True}
+
+
+def _counted_category(company: Optional[dict]) -> Optional[str]:
+    """Category a company contributes to, or None if it is not counted"""
+    if not company or company.get("isActive") is not True:
+        return None
+    category = company.get("category")
+    return category if category in CATEGORY_IDS else None
+
+
+def category_delta(before: Optional[dict], after: Optional[dict]) -> Dict[str, int]:
+    """Counter increments for a company going from `before` to `after` (None = absent)"""
+    delta: Dict[str, int] = {}
+    old = _counted_category(before)
+    new = _counted_category(after)
+    if old != new:
+        if old:
+            delta[old] = -1
+        if new:
+            delta[new] = 1
+    return delta
+
+
+async def rebuild_category_counts(db) -> Dict[str, int]:
+    """Recompute all counts with a single aggregation and store them"""
+    pipeline = [
+        {"$match": {**ACTIVE_FILTER, "category": {"$in": sorted(CATEGORY_IDS)}}},
+        {"$group": {"_id": "$category", "count": {"$sum": 1}}}
+    ]
+    counts = {category_id: 0 for category_id in CATEGORY_IDS}
+    async for row in db.companies.aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+
+    await db.counters.replace_one({"_id": COUNTERS_DOC_ID}, {"counts": counts}, upsert=True)
+    return counts
+
+
+async def apply_category_delta(db, before: Optional[dict], after: Optional[dict]):
+    """
+    Incrementally update the stored counts after a company write.
+    A missing counters document is left alone: the next read rebuilds it.
+    """
+    delta = category_delta(before, after)
+    if delta:
+        await db.counters.update_one(
+            {"_id": COUNTERS_DOC_ID},
+            {"$inc": {f"counts.{category_id}": value for category_id, value in delta.items()}}
+        )
+
+
+async def get_category_counts(db) -> Dict[str, int]:
+    """Read the stored counts, building them on first use"""
+    doc = await db.counters.find_one({"_id": COUNTERS_DOC_ID})
+    if doc is None:
+        return await rebuild_category_counts(db)
+    return doc.get("counts", {})
@@ -0,0 +1,95 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Single documents are validated by a strong ETag computed from `_id` and
+`updatedAt`; lists by an ETag computed from a persistent per-collection
+version number and the request parameters. Both can be checked before the
+document is serialized, so unchanged resources are answered with 304.
+
+The version never expires, so every writer of a listed collection (the API and
+the bulk scripts alike) has to call `bump_collection_version` after writing.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Mapping, Optional
+
+from pymongo import ReturnDocument
+
+
+def _etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _as_utc(moment: datetime) -> datetime:
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment.astimezone(timezone.utc)
+
+
+def document_etag(doc: dict) -> str:
+    updated_at = doc.get("updatedAt")
+    return _etag(doc["_id"], updated_at.isoformat() if isinstance(updated_at, datetime) else "")
+
+
+def list_etag(version: int, params: Optional[dict] = None) -> str:
+    return _etag(version, *sorted(f"{k}={v}" for k, v in (params or {}).items() if v is not None))
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(_as_utc(moment), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag}
+    if isinstance(last_modified, datetime):
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def document_headers(doc: dict) -> dict:
+    return validator_headers(document_etag(doc), doc.get("updatedAt"))
+
+
+def is_conditional(request_headers: Mapping) -> bool:
+    return "if-none-match" in request_headers or "if-modified-since" in request_headers
+
+
+def not_modified(request_headers: Mapping, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since (RFC 9110): If-None-Match wins
+    when present, and is compared weakly as the spec requires for GET.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in candidates
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and isinstance(last_modified, datetime):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have a one second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+async def get_collection_version(db, collection: str) -> int:
+    doc = await db.collection_versions.find_one({"_id": collection})
+    return doc["version"] if doc else 0
+
+
+async def bump_collection_version(db, collection: str) -> int:
+    """Record that `collection` changed; returns the new version"""
+    doc = await db.collection_versions.find_one_and_update(
+        {"_id": collection},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
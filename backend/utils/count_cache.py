@@ -0,0 +1,80 @@
+"""
+Cache of total counts for the listing endpoints.
+
+Counts are keyed by collection and normalized filter. Writes bump a per-collection
+generation instead of deleting entries: `exact` reads only trust entries from the
+current generation, while `estimate` reads accept any recent entry and fall back
+to collection metadata, so infinite-scroll clients never wait for a full count.
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+COUNT_CACHE_TTL = 60           # seconds an exact count is trusted
+COUNT_ESTIMATE_MAX_AGE = 600   # seconds a stale count is still a good estimate
+COUNT_CACHE_MAX_ENTRIES = 10000
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+def filter_key(query: dict) -> Tuple:
+    """Stable, hashable representation of a filter"""
+    return tuple(sorted((field, repr(value)) for field, value in query.items()))
+
+
+class CountCache:
+    def __init__(self, ttl: float = COUNT_CACHE_TTL, estimate_max_age: float = COUNT_ESTIMATE_MAX_AGE,
+                 max_entries: int = COUNT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.estimate_max_age = estimate_max_age
+        self.max_entries = max_entries
+        self.entries: Dict[Tuple, Tuple[int, float, int]] = {}
+        self.generations: Dict[str, int] = {}
+
+    def invalidate(self, collection: str):
+        """Mark every cached count of `collection` as outdated"""
+        self.generations[collection] = self.generations.get(collection, 0) + 1
+
+    def get(self, collection: str, query: dict, exact: bool = True) -> Optional[int]:
+        entry = self.entries.get((collection, filter_key(query)))
+        if entry is None:
+            return None
+        value, stored_at, generation = entry
+        age = time.monotonic() - stored_at
+        if exact:
+            if generation != self.generations.get(collection, 0) or age > self.ttl:
+                return None
+        elif age > self.estimate_max_age:
+            return None
+        return value
+
+    def set(self, collection: str, query: dict, value: int):
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[(collection, filter_key(query))] = (
+            value, time.monotonic(), self.generations.get(collection, 0)
+        )
+
+    async def count(self, collection, query: dict, mode: str = "exact") -> Optional[int]:
+        """
+        Count documents of a Motor collection matching `query`.
+        Returns None for mode "none".
+        """
+        if mode == "none":
+            return None
+
+        name = collection.name
+        cached = self.get(name, query, exact=(mode == "exact"))
+        if cached is not None:
+            return cached
+
+        if mode == "estimate" and not query:
+            # Unfiltered count straight from collection metadata
+            return await collection.estimated_document_count()
+
+        value = await collection.count_documents(query)
+        self.set(name, query, value)
+        return value
+
+
+# Shared cache used by the API
+count_cache = CountCache()
@@ -0,0 +1,77 @@
+"""
+Delta exports.
+
+Every export target (e.g. "wordpress") keeps a high-water mark of `updatedAt`
+in `export_watermarks`. A delta export only reads documents changed after the
+mark, using the `updatedAt` indexes. The upper bound of a run trails the clock
+by WATERMARK_LAG, so a write that is still in flight when the export starts is
+picked up by the next run instead of being skipped.
+
+Deleted companies leave a tombstone in `company_tombstones`: a company-shaped
+document with `deleted: True`, exported like any other change and expired by a
+TTL index once every target has long synced it. Deactivated companies need no
+tombstone: deactivation moves `updatedAt`, so they are exported as drafts.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import ReplaceOne
+
+WATERMARK_LAG = timedelta(seconds=30)
+
+# Tombstones are kept for this long
+TOMBSTONE_TTL = timedelta(days=90)
+
+# Oldest changes first; backed by the updatedAt indexes
+DELTA_SORT = [("updatedAt", 1)]
+
+# Fields kept on a tombstone so exports can still name the company
+TOMBSTONE_FIELDS = ("name", "nameRu", "category", "importKey")
+
+
+async def get_watermark(db, target: str) -> Optional[datetime]:
+    doc = await db.export_watermarks.find_one({"_id": target})
+    return doc["updatedAt"] if doc else None
+
+
+async def set_watermark(db, target: str, updated_at: datetime):
+    await db.export_watermarks.update_one(
+        {"_id": target},
+        {"$set": {"updatedAt": updated_at, "exportedAt": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def changed_query(since: Optional[datetime], until: datetime) -> dict:
+    """Documents changed in (since, until]; everything when there is no mark yet"""
+    if since is None:
+        return {}
+    return {"updatedAt": {"$gt": since, "$lte": until}}
+
+
+def company_tombstone(company: dict, deleted_at: datetime) -> dict:
+    return {
+        "_id": company["_id"],
+        **{field: company[field] for field in TOMBSTONE_FIELDS if field in company},
+        "isActive": False,
+        "deleted": True,
+        "deletedAt": deleted_at,
+        "updatedAt": deleted_at,
+    }
+
+
+async def record_company_deletion(db, company: dict, deleted_at: datetime):
+    """Leave a tombstone for a deleted company so delta exports can propagate it"""
+    tombstone = company_tombstone(company, deleted_at)
+    await db.company_tombstones.replace_one({"_id": tombstone["_id"]}, tombstone, upsert=True)
+
+
+async def record_company_deletions(db, companies: Iterable[dict], deleted_at: datetime) -> int:
+    """Tombstones for companies deleted in bulk (e.g. by a reseed); returns how many were recorded"""
+    operations = [
+        ReplaceOne({"_id": tombstone["_id"]}, tombstone, upsert=True)
+        for tombstone in (company_tombstone(company, deleted_at) for company in companies)
+    ]
+    if operations:
+        await db.company_tombstones.bulk_write(operations, ordered=False)
+    return len(operations)
@@ -0,0 +1,269 @@
+"""
+Export downloads.
+
+Export files are generated on demand and cached on disk per data version (a
+digest of the versions of the exported collections), with gzip and brotli
+variants compressed once when the version is built. Downloads are served from the cache with Accept-Encoding negotiation and
+single byte ranges, so an interrupted download resumes from where it stopped
+and repeated downloads never regenerate anything. The export itself runs in a
+separate process (`export_to_wordpress.py`), so building a large catalog never
+blocks the API event loop.
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import re
+import shutil
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+import anyio
+import brotli
+from starlette.responses import Response, StreamingResponse
+
+from utils.conditional import http_date, not_modified, validator_headers
+from utils.exports import export_file_names
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_FILES = export_file_names()
+
+# Precompressed variants, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# Cached versions kept on disk
+KEEP_VERSIONS = 2
+
+CHUNK_SIZE = 256 * 1024
+
+# Collections whose version identifies the export content (tombstones come with `companies`)
+EXPORTED_COLLECTIONS = ("companies", "blog_posts")
+
+EXPORT_SCRIPT = Path(__file__).resolve().parent.parent / "export_to_wordpress.py"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+async def data_version(db) -> str:
+    """
+    Digest that changes whenever the exported data may have changed: every
+    writer bumps the version of the collections it touches (deleting a company
+    bumps `companies` too), so one read of the versions is enough.
+    """
+    versions = dict.fromkeys(EXPORTED_COLLECTIONS, 0)
+    async for doc in db.collection_versions.find({"_id": {"$in": list(EXPORTED_COLLECTIONS)}}):
+        versions[doc["_id"]] = doc["version"]
+    parts = [f"{collection}={version}" for collection, version in versions.items()]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+async def export_in_subprocess(directory: Path):
+    """Write the export files into `directory` with export_to_wordpress.py"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(EXPORT_SCRIPT), "--output-dir", str(directory), "--no-watermark",
+        cwd=EXPORT_SCRIPT.parent,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        output, _ = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    if process.returncode != 0:
+        tail = output.decode("utf-8", errors="replace")[-2000:]
+        raise RuntimeError(f"Export process exited with {process.returncode}:\n{tail}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred available content coding for an Accept-Encoding header (None: identity)"""
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = None, 0.0
+    for coding in ENCODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single `bytes=` range. Headers this cache does
+    not handle (other units, several ranges, bad syntax) return None and the
+    whole file is served, as RFC 9110 allows.
+    """
+    match = _RANGE.match((header or "").strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def if_range_matches(if_range: Optional[str], etag: str, last_modified: datetime) -> bool:
+    """A Range is honoured only while the representation is still the one named by If-Range"""
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return if_range == http_date(last_modified)
+
+
+def compress_file(path: Path):
+    """Write the gzip and brotli variants of `path` next to it"""
+    with open(path, "rb") as source, gzip.open(f"{path}{ENCODINGS['gzip']}", "wb", compresslevel=9) as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    compressor = brotli.Compressor(quality=9)
+    with open(path, "rb") as source, open(f"{path}{ENCODINGS['br']}", "wb") as target:
+        while chunk := source.read(CHUNK_SIZE):
+            target.write(compressor.process(chunk))
+        target.write(compressor.finish())
+
+
+async def read_chunks(path: Path, start: int, end: int):
+    """Bytes start..end (inclusive) of a file"""
+    async with await anyio.open_file(path, "rb") as file:
+        await file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class ExportArtifacts:
+    """
+    On-disk cache of export files per data version. `build(directory)` writes
+    the export files of one version; builds run as background tasks, one per
+    version, and are published with an atomic rename once compressed.
+    """
+
+    def __init__(self, root: Path, build: Callable[[Path], Awaitable], keep: int = KEEP_VERSIONS):
+        self.root = Path(root)
+        self.build = build
+        self.keep = keep
+        self._builds: Dict[str, asyncio.Task] = {}
+
+    def path(self, version: str) -> Path:
+        return self.root / version
+
+    def ready(self, version: str) -> bool:
+        return self.path(version).is_dir()
+
+    def ensure(self, version: str) -> Optional[asyncio.Task]:
+        """None when `version` is cached, else its (possibly already running) build"""
+        if self.ready(version):
+            return None
+        task = self._builds.get(version)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self._builds[version] = asyncio.create_task(self._build(version))
+            task.add_done_callback(lambda done: self._forget(version, done))
+        return task
+
+    def _forget(self, version: str, task: asyncio.Task):
+        # Failed builds are kept until the next request retries them
+        if not task.cancelled() and task.exception() is None:
+            self._builds.pop(version, None)
+
+    async def _build(self, version: str):
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".{version}.{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            await self.build(staging)
+            for path in sorted(staging.iterdir()):
+                await asyncio.to_thread(compress_file, path)
+            try:
+                staging.rename(self.path(version))
+            except OSError:
+                # Another process published this version first
+                if not self.ready(version):
+                    raise
+        finally:
+            if staging.exists():
+                await asyncio.to_thread(shutil.rmtree, staging, True)
+        logger.info("Export %s built in %s", version, self.path(version))
+        self.prune()
+
+    def prune(self):
+        """Delete all but the `keep` most recent versions"""
+        versions = sorted(
+            (path for path in self.root.iterdir() if path.is_dir() and not path.name.startswith(".")),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True
+        )
+        for path in versions[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def response(self, version: str, filename: str, method: str, headers: Mapping) -> Response:
+        """Serve a cached file: content negotiation, conditional GET and byte ranges"""
+        encoding = negotiate_encoding(headers.get("accept-encoding"))
+        path = self.path(version) / (filename + ENCODINGS[encoding] if encoding else filename)
+        stat = path.stat()
+        size = stat.st_size
+        etag = f'"{version}-{encoding or "identity"}"'
+        last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
+
+        response_headers = {
+            **validator_headers(etag, last_modified),
+            "Accept-Ranges": "bytes",
+            "Vary": "Accept-Encoding",
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        }
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        if not_modified(headers, etag, last_modified):
+            return Response(status_code=304, headers=response_headers)
+
+        status_code, start, end = 200, 0, size - 1
+        if "range" in headers and if_range_matches(headers.get("if-range"), etag, last_modified):
+            try:
+                byte_range = parse_range(headers["range"], size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**response_headers, "Content-Range": f"bytes */{size}"})
+            if byte_range is not None:
+                status_code, (start, end) = 206, byte_range
+                response_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response_headers["Content-Length"] = str(end - start + 1)
+
+        if method == "HEAD":
+            return Response(status_code=status_code, headers=response_headers, media_type="application/octet-stream")
+        return StreamingResponse(
+            read_chunks(path, start, end),
+            status_code=status_code,
+            headers=response_headers,
+            media_type="application/octet-stream"
+        )
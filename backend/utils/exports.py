@@ -0,0 +1,369 @@
+"""
+Streaming export writers (WordPress CSV, WXR, JSON / NDJSON).
+
+Documents are read with a batched cursor and handed to the writers one at a
+time, so an export holds one cursor batch in memory however large the
+catalog is. Each writer formats a document and writes it straight to its file.
+
+`fan_out` scans a collection once and feeds every batch to all the writers of
+an export, fetching the next batch while the writers format the current one.
+"""
+import asyncio
+import csv
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.delta import DELTA_SORT, changed_query
+from utils.serialization import dumps
+
+EXPORT_BATCH_SIZE = 1000
+
+JSON_FORMATS = ("array", "ndjson")
+
+EXPORT_FORMATS = ("csv", "xml", "json")
+
+# Write buffer of export files
+WRITE_BUFFER = 1024 * 1024
+
+COMPANIES_CSV = 'companies_for_wordpress.csv'
+BLOG_POSTS_CSV = 'blog_posts_for_wordpress.csv'
+WXR_FILE = 'hal_wordpress_export.xml'
+
+COMPANY_CSV_FIELDS = [
+    'post_title',           # Название компании (UA)
+    'post_title_ru',        # Название компании (RU)
+    'post_content',         # Описание (UA)
+    'post_content_ru',      # Описание (RU)
+    'post_status',          # published / draft
+    'post_type',            # custom post type (listing)
+    'category',             # Категория
+    'phone',                # Телефон
+    'email',                # Email
+    'website',              # Веб-сайт
+    'city',                 # Город
+    'address',              # Адрес
+    'image_url',            # URL изображения
+    'rating',               # Рейтинг
+    'review_count'          # Количество отзывов
+]
+
+BLOG_POST_CSV_FIELDS = [
+    'post_title',           # Заголовок (UA)
+    'post_title_ru',        # Заголовок (RU)
+    'post_content',         # Содержание (UA)
+    'post_content_ru',      # Содержание (RU)
+    'post_excerpt',         # Отрывок (UA)
+    'post_excerpt_ru',      # Отрывок (RU)
+    'post_status',          # published
+    'post_type',            # post
+    'post_date',            # Дата публикации
+    'post_author',          # Автор
+    'featured_image'        # URL изображения
+]
+
+
+async def iter_documents(collection, query: Optional[dict] = None, projection: Optional[dict] = None,
+                         batch_size: int = EXPORT_BATCH_SIZE, sort: Optional[list] = None):
+    """Stream a collection (in _id order by default), `batch_size` documents per round trip"""
+    cursor = collection.find(query or {}, projection).sort(sort or [("_id", 1)]).batch_size(batch_size)
+    async for document in cursor:
+        yield document
+
+
+async def iter_batches(collection, query: Optional[dict] = None, projection: Optional[dict] = None,
+                       batch_size: int = EXPORT_BATCH_SIZE, sort: Optional[list] = None):
+    """Lists of up to `batch_size` documents, aligned with the cursor batches"""
+    batch = []
+    async for document in iter_documents(collection, query, projection, batch_size, sort):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def fan_out(collection, sinks: Dict[str, object], timings: Dict[str, float],
+                  query: Optional[dict] = None, projection: Optional[dict] = None,
+                  batch_size: int = EXPORT_BATCH_SIZE, sort: Optional[list] = None) -> int:
+    """
+    Feed every document of one scan of `collection` to all `sinks` (format ->
+    writer); returns the number of documents. Seconds spent in each writer are
+    added to timings[format] and the wait for the cursor to timings["scan"].
+    """
+    batches = iter_batches(collection, query, projection, batch_size, sort).__aiter__()
+    pending = asyncio.ensure_future(batches.__anext__())
+    count = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = await pending
+            except StopAsyncIteration:
+                break
+            timings["scan"] = timings.get("scan", 0.0) + time.perf_counter() - started
+
+            # Start fetching the next batch before formatting this one
+            pending = asyncio.ensure_future(batches.__anext__())
+            await asyncio.sleep(0)
+
+            for name, writer in sinks.items():
+                started = time.perf_counter()
+                for document in batch:
+                    writer.write(document)
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+            count += len(batch)
+    finally:
+        pending.cancel()
+    return count
+
+
+def company_status(company: dict) -> str:
+    """WordPress status of a company; tombstones of deleted companies go to the trash"""
+    if company.get('deleted'):
+        return 'trash'
+    return 'publish' if company.get('isActive') else 'draft'
+
+
+def company_csv_row(company: dict) -> dict:
+    contacts = company.get('contacts') or {}
+    location = company.get('location') or {}
+    return {
+        'post_title': company.get('name', ''),
+        'post_title_ru': company.get('nameRu', ''),
+        'post_content': company.get('description', ''),
+        'post_content_ru': company.get('descriptionRu', ''),
+        'post_status': company_status(company),
+        'post_type': 'listing',  # Ваш custom post type в WordPress
+        'category': company.get('category', ''),
+        'phone': contacts.get('phone', ''),
+        'email': contacts.get('email', ''),
+        'website': contacts.get('website', ''),
+        'city': location.get('city', ''),
+        'address': location.get('address', ''),
+        'image_url': company.get('image', ''),
+        'rating': company.get('rating', 0),
+        'review_count': company.get('reviewCount', 0)
+    }
+
+
+def blog_post_csv_row(post: dict) -> dict:
+    return {
+        'post_title': post.get('titleUk', ''),
+        'post_title_ru': post.get('titleRu', ''),
+        'post_content': post.get('contentUk', ''),
+        'post_content_ru': post.get('contentRu', ''),
+        'post_excerpt': post.get('excerptUk', ''),
+        'post_excerpt_ru': post.get('excerptRu', ''),
+        'post_status': 'publish',
+        'post_type': 'post',
+        'post_date': post.get('publishedAt', datetime.utcnow()).strftime('%Y-%m-%d %H:%M:%S'),
+        'post_author': post.get('author', 'HAL Team'),
+        'featured_image': post.get('image', '')
+    }
+
+
+class CsvWriter:
+    """CSV file with one row per document"""
+
+    def __init__(self, file, fieldnames: list, to_row: Callable[[dict], dict]):
+        self.writer = csv.DictWriter(file, fieldnames=fieldnames)
+        self.writer.writeheader()
+        self.to_row = to_row
+        self.count = 0
+
+    def write(self, document: dict):
+        self.writer.writerow(self.to_row(document))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class JsonArrayWriter:
+    """JSON array written element by element (binary file)"""
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+        self.file.write(b"[")
+
+    def write(self, document: dict):
+        self.file.write(b"\n" if not self.count else b",\n")
+        self.file.write(dumps(document))
+        self.count += 1
+
+    def close(self):
+        self.file.write(b"\n]\n" if self.count else b"]\n")
+
+
+class NdjsonWriter:
+    """One JSON document per line (binary file)"""
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, document: dict):
+        self.file.write(dumps(document))
+        self.file.write(b"\n")
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+def json_writer(file, json_format: str = "array"):
+    if json_format == "array":
+        return JsonArrayWriter(file)
+    if json_format == "ndjson":
+        return NdjsonWriter(file)
+    raise ValueError(f"Unknown JSON format: {json_format}")
+
+
+WXR_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" ?>\n'
+    '<rss version="2.0"\n'
+    '    xmlns:excerpt="http://wordpress.org/export/1.2/excerpt/"\n'
+    '    xmlns:content="http://purl.org/rss/1.0/modules/content/"\n'
+    '    xmlns:wfw="http://wellformedweb.org/CommentAPI/"\n'
+    '    xmlns:dc="http://purl.org/dc/elements/1.1/"\n'
+    '    xmlns:wp="http://wordpress.org/export/1.2/">\n\n'
+    '<channel>\n'
+    '    <title>HAL Platform Export</title>\n'
+    '    <link>https://hal.in.ua</link>\n'
+    '    <description>Export from HAL MongoDB</description>\n'
+    '    <language>uk</language>\n'
+    '    <wp:wxr_version>1.2</wp:wxr_version>\n\n'
+)
+
+WXR_FOOTER = '</channel>\n</rss>\n'
+
+
+def _postmeta(key: str, value) -> str:
+    return (
+        '        <wp:postmeta>\n'
+        f'            <wp:meta_key><![CDATA[{key}]]></wp:meta_key>\n'
+        f'            <wp:meta_value><![CDATA[{value}]]></wp:meta_value>\n'
+        '        </wp:postmeta>\n'
+    )
+
+
+def wxr_post_item(post: dict) -> str:
+    published_at = post.get("publishedAt", datetime.utcnow())
+    return (
+        '    <item>\n'
+        f'        <title><![CDATA[{post.get("titleUk", "")}]]></title>\n'
+        f'        <link>https://hal.in.ua/blog/{post.get("_id")}</link>\n'
+        f'        <pubDate>{published_at.strftime("%a, %d %b %Y %H:%M:%S +0000")}</pubDate>\n'
+        f'        <dc:creator><![CDATA[{post.get("author", "admin")}]]></dc:creator>\n'
+        f'        <content:encoded><![CDATA[{post.get("contentUk", "")}]]></content:encoded>\n'
+        f'        <excerpt:encoded><![CDATA[{post.get("excerptUk", "")}]]></excerpt:encoded>\n'
+        '        <wp:post_type><![CDATA[post]]></wp:post_type>\n'
+        '        <wp:status><![CDATA[publish]]></wp:status>\n'
+        '    </item>\n\n'
+    )
+
+
+def wxr_company_item(company: dict) -> str:
+    contacts = company.get('contacts') or {}
+    return (
+        '    <item>\n'
+        f'        <title><![CDATA[{company.get("name", "")}]]></title>\n'
+        f'        <link>https://hal.in.ua/company/{company.get("_id")}</link>\n'
+        f'        <content:encoded><![CDATA[{company.get("description", "")}]]></content:encoded>\n'
+        '        <wp:post_type><![CDATA[listing]]></wp:post_type>\n'
+        f'        <wp:status><![CDATA[{company_status(company)}]]></wp:status>\n'
+        + _postmeta('_listing_phone', contacts.get('phone', ''))
+        + _postmeta('_listing_email', contacts.get('email', ''))
+        + _postmeta('_listing_category', company.get('category', ''))
+        + '    </item>\n\n'
+    )
+
+
+class WxrWriter:
+    """WordPress eXtended RSS file; items are written as they arrive"""
+
+    def __init__(self, file, to_item: Callable[[dict], str] = wxr_company_item):
+        self.file = file
+        self.to_item = to_item
+        self.count = 0
+        self.file.write(WXR_HEADER)
+
+    def write(self, document: dict):
+        self.file.write(self.to_item(document))
+        self.count += 1
+
+    def close(self):
+        self.file.write(WXR_FOOTER)
+
+
+def export_file_names(formats=EXPORT_FORMATS, json_format: str = "array") -> List[str]:
+    """Files written by an export of `formats`"""
+    extension = "json" if json_format == "array" else "ndjson"
+    names = []
+    if "csv" in formats:
+        names += [COMPANIES_CSV, BLOG_POSTS_CSV]
+    if "xml" in formats:
+        names.append(WXR_FILE)
+    if "json" in formats:
+        names += [f"companies.{extension}", f"blog_posts.{extension}"]
+    return names
+
+
+async def write_export(db, export_dir: Path, formats=EXPORT_FORMATS, json_format: str = "array",
+                       batch_size: int = EXPORT_BATCH_SIZE, since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Tuple[Dict[str, int], Dict[str, float]]:
+    """
+    Write `formats` to `export_dir` with a single scan per collection. With
+    `since`, only changes in (since, until] are written, plus the tombstones of
+    deleted companies. Returns (documents per collection, seconds per format).
+    """
+    extension = "json" if json_format == "array" else "ndjson"
+    counts: Dict[str, int] = {}
+    timings = dict.fromkeys(formats, 0.0)
+    delta = since is not None
+    query = changed_query(since, until) if delta else {}
+    sort = DELTA_SORT if delta else None
+
+    with ExitStack() as stack:
+        def open_file(name: str, binary: bool = False):
+            path = Path(export_dir) / name
+            if binary:
+                return stack.enter_context(open(path, "wb", buffering=WRITE_BUFFER))
+            return stack.enter_context(open(path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER))
+
+        # WXR: blog posts first, then companies, in one channel
+        wxr = WxrWriter(open_file(WXR_FILE), wxr_post_item) if "xml" in formats else None
+
+        sinks = {}
+        if "csv" in formats:
+            sinks["csv"] = CsvWriter(open_file(BLOG_POSTS_CSV), BLOG_POST_CSV_FIELDS, blog_post_csv_row)
+        if wxr is not None:
+            sinks["xml"] = wxr
+        if "json" in formats:
+            sinks["json"] = json_writer(open_file(f"blog_posts.{extension}", binary=True), json_format)
+        counts["blog_posts"] = await fan_out(db.blog_posts, sinks, timings, query=query, batch_size=batch_size, sort=sort)
+        for writer in sinks.values():
+            if writer is not wxr:
+                writer.close()
+
+        sinks = {}
+        if "csv" in formats:
+            sinks["csv"] = CsvWriter(open_file(COMPANIES_CSV), COMPANY_CSV_FIELDS, company_csv_row)
+        if wxr is not None:
+            wxr.to_item = wxr_company_item
+            sinks["xml"] = wxr
+        if "json" in formats:
+            sinks["json"] = json_writer(open_file(f"companies.{extension}", binary=True), json_format)
+        counts["companies"] = await fan_out(db.companies, sinks, timings, query=query, batch_size=batch_size, sort=sort)
+        if delta:
+            counts["company_tombstones"] = await fan_out(db.company_tombstones, sinks, timings, query=query,
+                                                         batch_size=batch_size, sort=sort)
+        for writer in sinks.values():
+            writer.close()
+
+    return counts, timings
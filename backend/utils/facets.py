@@ -0,0 +1,93 @@
+"""
+Faceted company listings.
+
+A listing with `facets=` runs as a single aggregation: the filter and the sort
+come first so they use the listing indexes, then one $facet stage returns the
+page, the total and the value counts of every requested facet.
+"""
+from typing import Dict, List, Optional, Tuple
+
+# Facet name -> grouped expression
+FACETS = {
+    "category": "$category",
+    "city": "$location.city",
+    "isNew": {"$ifNull": ["$isNew", False]},
+}
+
+# Fields the facet expressions read
+_FACET_FIELDS = ("category", "location.city", "isNew")
+
+# Most frequent values returned per facet
+FACET_LIMIT = 50
+
+
+class InvalidFacet(ValueError):
+    pass
+
+
+def parse_facets(facets: Optional[str]) -> Tuple[str, ...]:
+    """Normalize a `facets=` value into a sorted tuple of facet names"""
+    names = {name.strip() for name in (facets or "").split(",") if name.strip()}
+    unknown = names - set(FACETS)
+    if unknown:
+        raise InvalidFacet(f"Unknown facet: {', '.join(sorted(unknown))}")
+    return tuple(sorted(names))
+
+
+def _carried_fields(projection: dict) -> dict:
+    """Projection of the documents entering $facet: the page fields plus the facet inputs"""
+    carried = dict(projection)
+    for field in _FACET_FIELDS:
+        # A parent path already carries its children (and both cannot be projected)
+        if field.split(".")[0] not in carried:
+            carried[field] = 1
+    return carried
+
+
+def facet_pipeline(
+    query: dict,
+    facets: Tuple[str, ...],
+    projection: dict,
+    sort: Optional[list] = None,
+    seek: Optional[dict] = None,
+    skip: int = 0,
+    limit: int = 0,
+    with_total: bool = True
+) -> list:
+    """
+    Aggregation returning one document with `page` (when `sort` is given),
+    `total` (when `with_total`) and one array of {_id, count} per facet.
+    """
+    branches: Dict[str, list] = {}
+    if sort is not None:
+        page = [{"$match": seek}] if seek else []
+        if skip:
+            page.append({"$skip": skip})
+        page += [{"$limit": limit + 1}, {"$project": projection}]
+        branches["page"] = page
+    if with_total:
+        branches["total"] = [{"$count": "count"}]
+    for name in facets:
+        branches[name] = [
+            {"$group": {"_id": FACETS[name], "count": {"$sum": 1}}},
+            {"$match": {"_id": {"$ne": None}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": FACET_LIMIT},
+        ]
+
+    pipeline = [{"$match": query}]
+    if sort is not None:
+        pipeline.append({"$sort": dict(sort)})
+    pipeline += [{"$project": _carried_fields(projection)}, {"$facet": branches}]
+    return pipeline
+
+
+def read_facet_result(result: dict, facets: Tuple[str, ...]) -> Tuple[List[dict], Optional[int], Dict[str, list]]:
+    """Split the $facet document into (page documents, total, facet counts)"""
+    total_rows = result.get("total")
+    total = (total_rows[0]["count"] if total_rows else 0) if total_rows is not None else None
+    counts = {
+        name: [{"value": row["_id"], "count": row["count"]} for row in result.get(name, [])]
+        for name in facets
+    }
+    return result.get("page", []), total, counts
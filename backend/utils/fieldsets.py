@@ -0,0 +1,45 @@
+"""
+Sparse fieldsets.
+
+Clients pick the fields they need with `fields=`: a comma separated list of
+field names and/or preset names (e.g. `card` or `card,description`). The
+selection is turned into a Mongo projection, so unused fields are never read,
+sent over the network or serialized. `_id` is always included.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class InvalidFieldset(ValueError):
+    pass
+
+
+def parse_fields(
+    fields: Optional[str],
+    presets: Dict[str, Tuple[str, ...]],
+    allowed: Iterable[str],
+    default: str = "full"
+) -> Tuple[str, ...]:
+    """Normalize a `fields=` value into a sorted tuple of allowed field names"""
+    tokens = [token.strip() for token in (fields or default).split(",") if token.strip()]
+    if not tokens:
+        tokens = [default]
+    allowed = set(allowed)
+    selected = set()
+    for token in tokens:
+        if token in presets:
+            selected.update(presets[token])
+        elif token in allowed:
+            selected.add(token)
+        elif token != "_id":
+            raise InvalidFieldset(f"Unknown field: {token}")
+    return tuple(sorted(selected))
+
+
+def projection_for(fields: Iterable[str], extra: Iterable[str] = ()) -> dict:
+    """Mongo projection reading `fields` plus `extra` (e.g. sort keys)"""
+    return dict.fromkeys([*fields, *extra], 1)
+
+
+def fields_param(fields: Tuple[str, ...]) -> str:
+    """Canonical string form of a parsed selection, for cache keys and ETags"""
+    return ",".join(fields)
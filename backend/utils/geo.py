@@ -0,0 +1,82 @@
+"""
+Company geolocation.
+
+`location.coordinates` ({"lat", "lng"}) is what clients send and see; the
+indexed copy lives in the top-level `geo` field as a GeoJSON point (GeoJSON
+puts longitude first), covered by a 2dsphere index. Companies without valid
+coordinates have no `geo` field and are skipped by the index.
+"""
+from typing import Optional
+
+from pymongo import UpdateOne
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def geo_point(location: Optional[dict]) -> Optional[dict]:
+    """GeoJSON point of a company location, None if it has no valid coordinates"""
+    coordinates = (location or {}).get("coordinates") or {}
+    try:
+        lat = float(coordinates["lat"])
+        lng = float(coordinates["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def geo_update(location: Optional[dict]) -> dict:
+    """Update document keeping `geo` in line with a new `location`"""
+    point = geo_point(location)
+    return {"$set": {"geo": point}} if point else {"$unset": {"geo": ""}}
+
+
+def nearby_pipeline(
+    lat: float,
+    lng: float,
+    radius_m: float,
+    query: dict,
+    limit: int,
+    projection: dict
+) -> list:
+    """Distance-sorted $geoNear over `query`; each result gets `distance` in meters"""
+    return [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "key": "geo",
+            "distanceField": "distance",
+            "maxDistance": radius_m,
+            "query": query,
+            "spherical": True
+        }},
+        {"$limit": limit},
+        {"$project": {**projection, "distance": 1}}
+    ]
+
+
+async def backfill_geo(db, batch_size: int = BACKFILL_BATCH_SIZE) -> dict:
+    """
+    Set `geo` on every company from its location coordinates (and drop stale
+    points). Returns how many companies got a point, lost one, or were skipped.
+    """
+    report = {"located": 0, "cleared": 0, "skipped": 0}
+    ops = []
+
+    async def flush():
+        if ops:
+            await db.companies.bulk_write(ops, ordered=False)
+            ops.clear()
+
+    async for company in db.companies.find({}, {"location": 1, "geo": 1}):
+        point = geo_point(company.get("location"))
+        if point == company.get("geo"):
+            report["skipped"] += 1
+            continue
+        report["located" if point else "cleared"] += 1
+        ops.append(UpdateOne({"_id": company["_id"]}, geo_update(company.get("location"))))
+        if len(ops) >= batch_size:
+            await flush()
+    await flush()
+
+    return report
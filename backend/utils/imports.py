@@ -0,0 +1,127 @@
+"""
+Idempotent imports.
+
+Imported documents carry a natural key (`importKey`, unique index) and a hash
+of their imported content (`importHash`). Upserting by key inserts new
+documents, rewrites changed ones and leaves unchanged ones alone (the update
+pipeline returns the document as is, so nothing is written), which makes
+re-running an import cheap and never duplicates data. Fields the API owns
+(ratings, isActive, createdAt...) are only set when a document is inserted.
+
+Documents imported before importKey existed have no key; before a batch is
+upserted, `adopt_legacy_documents` gives them the key of the item with the same
+natural fields (name + phone, title + date), so they are updated in place.
+"""
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.search import words
+
+UPSERT_BATCH_SIZE = 1000
+
+# Fields identifying an imported document that has no importKey
+COMPANY_NATURAL_FIELDS = ("name", "contacts.phone")
+BLOG_POST_NATURAL_FIELDS = ("titleUk", "publishedAt")
+
+# Unkeyed documents that may come from an import (companies created through the API have an owner)
+_LEGACY = {"importKey": {"$exists": False}, "userId": {"$exists": False}}
+
+
+def company_key(name: Optional[str], phone: Optional[str]) -> str:
+    """Natural key of a company without a source id: normalized name + phone digits"""
+    return f"company:{' '.join(words(name))}|{re.sub(r'[^0-9]', '', phone or '')}"
+
+
+def wordpress_key(kind: str, wordpress_id) -> str:
+    """Natural key of a document migrated from a WordPress post of type `kind`"""
+    return f"wp:{kind}:{wordpress_id}"
+
+
+def content_hash(fields: dict) -> str:
+    return hashlib.sha1(json_util.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def upsert_operation(key: str, fields: dict, on_insert: dict, updated_at, unset: Iterable[str] = ()) -> UpdateOne:
+    """
+    Upsert of one imported document: `fields` are the imported content,
+    `on_insert` the initial values of everything else, `unset` fields to drop
+    when the content changes (e.g. a point derived from removed coordinates).
+    A document whose importHash already matches is left exactly as it is.
+    """
+    digest = content_hash(fields)
+    unchanged = {"$eq": ["$importHash", digest]}
+    # One $set stage: every expression sees the document as it was before the update
+    stage = {field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in on_insert.items()}
+    stage.update({field: {"$cond": [unchanged, f"${field}", {"$literal": value}]} for field, value in fields.items()})
+    stage.update({field: {"$cond": [unchanged, f"${field}", "$$REMOVE"]} for field in unset})
+    stage.update({
+        "importHash": digest,
+        "updatedAt": {"$cond": [unchanged, "$updatedAt", {"$literal": updated_at}]},
+    })
+    pipeline = [{"$set": stage}]
+    return UpdateOne({"importKey": key}, pipeline, upsert=True)
+
+
+def insert_document(key: str, fields: dict, on_insert: dict) -> dict:
+    """Plain insert of an imported document, recognizable by later upserts"""
+    return {**on_insert, **fields, "importKey": key, "importHash": content_hash(fields)}
+
+
+def upsert_report(result: dict) -> dict:
+    """inserted/updated/unchanged counts of a bulk_write result (or BulkWriteError.details)"""
+    matched = result.get("nMatched", 0)
+    modified = result.get("nModified", 0)
+    return {"inserted": result.get("nUpserted", 0), "updated": modified, "unchanged": matched - modified}
+
+
+def _natural_value(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # MongoDB returns naive UTC datetimes
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def natural_values(document: dict, natural_fields: Tuple[str, ...]) -> tuple:
+    """Values of the (dotted) natural fields of a document or of imported fields"""
+    return tuple(_natural_value(document, path) for path in natural_fields)
+
+
+async def adopt_legacy_documents(collection, natural_keys: Dict[str, tuple], natural_fields: Tuple[str, ...]) -> int:
+    """
+    Give unkeyed documents the importKey of the batch item with the same
+    natural fields, so the following upsert updates them instead of inserting
+    a duplicate. `natural_keys` maps each importKey of the batch to its
+    natural_values; returns the number of documents adopted. Only batches with
+    keys that are not in the collection yet cost a lookup beyond the key index.
+    """
+    known = set(await collection.distinct("importKey", {"importKey": {"$in": list(natural_keys)}}))
+    wanted = {}
+    for key, values in natural_keys.items():
+        if key not in known and all(value not in (None, "") for value in values):
+            wanted.setdefault(values, key)
+    if not wanted:
+        return 0
+
+    legacy = {**_LEGACY, "$or": [dict(zip(natural_fields, values)) for values in wanted]}
+    operations = []
+    async for document in collection.find(legacy, dict.fromkeys(natural_fields, 1)):
+        key = wanted.pop(natural_values(document, natural_fields), None)
+        if key is not None:
+            operations.append(UpdateOne({"_id": document["_id"], **_LEGACY}, {"$set": {"importKey": key}}))
+    if not operations:
+        return 0
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # A concurrent batch already gave the same key to another duplicate
+        return e.details.get("nModified", 0)
+    return result.modified_count
@@ -0,0 +1,103 @@
+"""
+Keeps the in-process company indexes (search, suggest) in step with MongoDB.
+
+The indexes remember the `companies` collection version they were built at.
+Writes made through this process update the indexes directly and only move the
+remembered version forward when nothing else happened in between. Any other
+version (an import, a migration, another worker) is picked up by a background
+poller, which catches up by re-reading the companies and tombstones whose
+`updatedAt` is newer than the last sync; lookups themselves never touch MongoDB.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Optional
+
+from utils.conditional import get_collection_version
+from utils.search import INDEX_PROJECTION
+from utils.suggest import SUGGEST_PROJECTION
+
+SYNC_PROJECTION = {**INDEX_PROJECTION, **SUGGEST_PROJECTION}
+
+# Re-read window before the last sync, covering clock skew between writers
+SYNC_OVERLAP = timedelta(seconds=30)
+
+# Seconds between two reads of the collection version by the poller
+SYNC_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyIndexSync:
+    def __init__(self, *indexes):
+        self.indexes = indexes
+        self.version: Optional[int] = None
+        self.synced_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def rebuild(self, db):
+        """Build every index from the whole collection"""
+        version = await get_collection_version(db, "companies")
+        started = datetime.utcnow()
+        companies = await db.companies.find({}, SYNC_PROJECTION).to_list(length=None)
+        for index in self.indexes:
+            index.rebuild(companies)
+        self.version, self.synced_at = version, started
+
+    def _current(self, version: int) -> bool:
+        return self.version is not None and version <= self.version
+
+    def wrote(self, version: int):
+        """A write of this process, already applied to the indexes, bumped the version"""
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+
+    async def catch_up(self, db, version: Optional[int] = None) -> int:
+        """Apply changes made outside this process; returns the number of documents re-read"""
+        if version is None:
+            version = await get_collection_version(db, "companies")
+        if self._current(version):
+            return 0
+        async with self._lock:
+            if self._current(version):
+                return 0
+            if self.synced_at is None:
+                await self.rebuild(db)
+                return len(self.indexes[0])
+            # The version is read before the documents, so later writes show up as a new version
+            started = datetime.utcnow()
+            changed = {"updatedAt": {"$gte": self.synced_at - SYNC_OVERLAP}}
+            deleted = await db.company_tombstones.find(changed, {"_id": 1}).to_list(length=None)
+            companies = await db.companies.find(changed, SYNC_PROJECTION).to_list(length=None)
+            for index in self.indexes:
+                for tombstone in deleted:
+                    index.remove(tombstone["_id"])
+                for company in companies:
+                    index.add(company)
+            self.version, self.synced_at = version, started
+            return len(deleted) + len(companies)
+
+    def start(self, db, interval: float = SYNC_INTERVAL):
+        """Start polling the collection version (must be called inside the event loop)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db, interval))
+
+    async def _run(self, db, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = await self.catch_up(db)
+            except Exception as e:
+                logger.error("Company index sync failed: %s", e)
+                continue
+            if changed:
+                logger.info("Company indexes caught up: %d documents re-read", changed)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -0,0 +1,176 @@
+"""
+Declarative index registry.
+
+INDEXES lists every index the API relies on. `apply_indexes` creates them
+(create_index is a no-op for indexes that already exist) and `verify_queries`
+explains the canonical query of each endpoint and reports any plan that falls
+back to a collection scan.
+
+An index that cannot be built (e.g. a unique index over duplicate data) does
+not stop the others: `apply_indexes` tries every index and then raises
+IndexCreationError naming each one that failed. Scripts pass only the group
+they depend on (e.g. IMPORT_KEY_INDEXES), so an unrelated broken index does
+not abort them.
+"""
+import logging
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from utils.delta import DELTA_SORT, TOMBSTONE_TTL
+from utils.pagination import COMPANY_SORTS, REVIEW_SORT, BLOG_SORT
+from utils.view_rollup import DAILY_VIEWER_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: list
+    options: dict = {}
+
+
+class CanonicalQuery(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+
+
+class IndexVerificationError(RuntimeError):
+    pass
+
+
+class IndexCreationError(RuntimeError):
+    def __init__(self, failures: List[str]):
+        super().__init__(f"Indexes not created: {'; '.join(failures)}")
+        self.failures = failures
+
+
+# /api/companies/nearby
+GEO_INDEXES: List[IndexSpec] = [
+    IndexSpec("companies", [("geo", "2dsphere"), ("isActive", 1), ("category", 1)]),
+]
+
+# Daily view rollup: the $merge target needs its unique key; daily viewer markers expire
+VIEW_ROLLUP_INDEXES: List[IndexSpec] = [
+    IndexSpec("company_view_daily", [("companyId", 1), ("day", 1)], {"unique": True}),
+    IndexSpec("company_view_daily_viewers", [("dayStart", 1)],
+              {"expireAfterSeconds": int(DAILY_VIEWER_TTL.total_seconds())}),
+]
+
+# Delta exports: changes since the last watermark (the tombstone index also expires them)
+DELTA_INDEXES: List[IndexSpec] = [
+    IndexSpec("companies", DELTA_SORT),
+    IndexSpec("blog_posts", DELTA_SORT),
+    IndexSpec("company_tombstones", DELTA_SORT, {"expireAfterSeconds": int(TOMBSTONE_TTL.total_seconds())}),
+]
+
+# Natural keys of imported documents (API-created ones have none), by collection
+IMPORT_KEY_INDEXES = {
+    collection: IndexSpec(collection, [("importKey", 1)],
+                          {"unique": True, "partialFilterExpression": {"importKey": {"$exists": True}}})
+    for collection in ("companies", "blog_posts")
+}
+
+INDEXES: List[IndexSpec] = [
+    # Listings: isActive filter plus each keyset sort order
+    *[IndexSpec("companies", [("isActive", 1)] + sort) for sort in COMPANY_SORTS.values()],
+    IndexSpec("companies", [("isActive", 1), ("category", 1)] + COMPANY_SORTS["recent"]),
+    IndexSpec("companies", [("userId", 1)]),
+    *GEO_INDEXES,
+    IndexSpec("reviews", [("companyId", 1)] + REVIEW_SORT),
+    IndexSpec("reviews", [("companyId", 1), ("userId", 1)]),
+    IndexSpec("company_views", [("companyId", 1), ("viewedAt", -1)]),
+    *VIEW_ROLLUP_INDEXES,
+    IndexSpec("users", [("email", 1)], {"unique": True}),
+    IndexSpec("blog_posts", BLOG_SORT),
+    *DELTA_INDEXES,
+    *IMPORT_KEY_INDEXES.values(),
+]
+
+_SAMPLE_ID = ObjectId("000000000000000000000000")
+
+CANONICAL_QUERIES: List[CanonicalQuery] = [
+    CanonicalQuery("GET /companies (recent)", "companies", {"isActive": True}, COMPANY_SORTS["recent"]),
+    CanonicalQuery("GET /companies (popular)", "companies", {"isActive": True}, COMPANY_SORTS["popular"]),
+    CanonicalQuery("GET /companies (rating)", "companies", {"isActive": True}, COMPANY_SORTS["rating"]),
+    CanonicalQuery("GET /companies?category", "companies", {"isActive": True, "category": "cafe"}, COMPANY_SORTS["recent"]),
+    CanonicalQuery("GET /companies/nearby", "companies", {
+        "geo": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [30.52, 50.45]}, "$maxDistance": 5000}},
+        "isActive": True
+    }),
+    CanonicalQuery("GET /users/me/companies", "companies", {"userId": str(_SAMPLE_ID)}),
+    CanonicalQuery("GET /companies/{id}/reviews", "reviews", {"companyId": _SAMPLE_ID}, REVIEW_SORT),
+    CanonicalQuery("POST /companies/{id}/reviews (duplicate check)", "reviews", {"companyId": _SAMPLE_ID, "userId": _SAMPLE_ID}),
+    CanonicalQuery("GET /users/me/dashboard (views)", "company_views", {"companyId": _SAMPLE_ID}, [("viewedAt", -1)]),
+    CanonicalQuery("GET /users/me/dashboard (daily views)", "company_view_daily",
+                   {"companyId": {"$in": [_SAMPLE_ID]}, "day": {"$gte": "2025-01-01"}}),
+    CanonicalQuery("POST /auth/login", "users", {"email": "user@example.com"}),
+    CanonicalQuery("GET /blog", "blog_posts", {}, BLOG_SORT),
+    *[CanonicalQuery(f"export_to_wordpress --delta ({collection})", collection,
+                     {"updatedAt": {"$gt": datetime(2025, 1, 1)}}, DELTA_SORT)
+      for collection in ("companies", "blog_posts", "company_tombstones")],
+]
+
+
+def index_label(spec: IndexSpec) -> str:
+    return f"{spec.collection}({', '.join(f'{field}: {order}' for field, order in spec.keys)})"
+
+
+async def apply_indexes(db, specs: Iterable[IndexSpec] = INDEXES):
+    """Create the given indexes (all by default); raises IndexCreationError if any of them failed"""
+    failures = []
+    for spec in specs:
+        try:
+            name = await db[spec.collection].create_index(spec.keys, **spec.options)
+        except OperationFailure as e:
+            # DuplicateKeyError included: the data has to be fixed before the index can exist
+            reason = (e.details or {}).get("errmsg") or str(e)
+            logger.error("Index not created: %s: %s", index_label(spec), reason)
+            failures.append(f"{index_label(spec)}: {reason}")
+            continue
+        logger.info("Index ensured: %s.%s", spec.collection, name)
+    if failures:
+        raise IndexCreationError(failures)
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def explain_query(db, query: CanonicalQuery) -> List[str]:
+    """Return the stages of the winning plan of `query`"""
+    find = {"find": query.collection, "filter": query.filter}
+    if query.sort:
+        find["sort"] = dict(query.sort)
+    result = await db.command({"explain": find, "verbosity": "queryPlanner"})
+    return [stage for stage in _plan_stages(result["queryPlanner"]["winningPlan"]) if stage]
+
+
+async def verify_queries(db) -> List[str]:
+    """
+    Explain every canonical query; returns the names of the queries whose plan
+    contains a COLLSCAN or that cannot be planned at all, e.g. $nearSphere
+    without its 2dsphere index (an empty list means everything is index-backed).
+    """
+    failures = []
+    for query in CANONICAL_QUERIES:
+        try:
+            stages = await explain_query(db, query)
+        except OperationFailure as e:
+            reason = (e.details or {}).get("errmsg") or str(e)
+            logger.error("Cannot explain %s: %s", query.name, reason)
+            failures.append(query.name)
+            continue
+        if "COLLSCAN" in stages:
+            logger.error("COLLSCAN in %s: %s", query.name, " <- ".join(stages))
+            failures.append(query.name)
+    return failures
@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort key values of the last
+item of a page. The next page is fetched by seeking past that key instead of
+skipping over all previous items, so every page costs the same.
+"""
+import base64
+import binascii
+import bisect
+import math
+from typing import List, Optional, Tuple
+
+from bson import json_util
+
+SortSpec = List[Tuple[str, int]]
+
+# Sort specs of the listings; `_id` is always the last key so the order is total
+COMPANY_SORTS = {
+    "recent": [("createdAt", -1), ("_id", -1)],
+    "popular": [("reviewCount", -1), ("rating", -1), ("_id", -1)],
+    "rating": [("rating", -1), ("reviewCount", -1), ("_id", -1)],
+}
+REVIEW_SORT = [("createdAt", -1), ("_id", -1)]
+BLOG_SORT = [("publishedAt", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: list) -> str:
+    """Serialize sort key values into an opaque token"""
+    raw = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: Optional[int] = None) -> list:
+    """Parse a token produced by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def cursor_for(document: dict, sort: SortSpec) -> str:
+    """Build the cursor pointing right after `document`"""
+    return encode_cursor([document.get(field) for field, _ in sort])
+
+
+def seek_filter(sort: SortSpec, values: list) -> dict:
+    """
+    Build the filter selecting documents strictly after `values` in `sort` order:
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with > / < chosen by direction.
+    """
+    clauses = []
+    for position, (field, direction) in enumerate(sort):
+        clause = {prefix_field: values[i] for i, (prefix_field, _) in enumerate(sort[:position])}
+        clause[field] = {"$lt" if direction < 0 else "$gt": values[position]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def apply_cursor(query: dict, sort: SortSpec, cursor: str) -> dict:
+    """Return `query` restricted to the documents after `cursor`"""
+    seek = seek_filter(sort, decode_cursor(cursor, size=len(sort)))
+    if not query:
+        return seek
+    return {"$and": [query, seek]}
+
+
+def decode_ranked_cursor(cursor: str) -> Tuple[float, str]:
+    """Parse a search cursor: the (score, id) of the last result of the previous page"""
+    score, doc_id = decode_cursor(cursor, size=2)
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(doc_id, str):
+        raise InvalidCursor("Invalid cursor")
+    return float(score), doc_id
+
+
+def ranked_start(ranked: List[Tuple[str, float]], last_score: float, last_id: str) -> int:
+    """
+    Position of the first search result after (last_score, last_id) in results
+    ranked by score (descending) then id, as SearchIndex.search returns them.
+    """
+    return bisect.bisect_right(ranked, (-last_score, last_id), key=lambda item: (-item[1], item[0]))
+
+
+def split_page(documents: list, limit: int, sort: SortSpec) -> Tuple[list, Optional[str]]:
+    """
+    Trim a `limit + 1` fetch to one page and compute the next cursor
+    (None when there are no more documents).
+    """
+    if len(documents) <= limit:
+        return documents, None
+    page = documents[:limit]
+    return page, cursor_for(page[-1], sort)
@@ -0,0 +1,109 @@
+"""
+Company rating counters.
+
+Each company keeps `ratingSum` and `reviewCount`; `rating` is derived from them
+inside the same atomic update, so concurrent reviews never race and adding a
+review does not depend on how many reviews the company already has.
+"""
+from datetime import datetime
+from typing import Optional
+
+from pymongo import UpdateOne
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def average_rating(rating_sum: float, review_count: int) -> float:
+    return round(rating_sum / review_count, 1) if review_count else 0.0
+
+
+def derived_rating(company: dict) -> float:
+    """Rating to display for a company document"""
+    if "ratingSum" in company:
+        return average_rating(company["ratingSum"], company.get("reviewCount", 0))
+    return company.get("rating", 0.0)
+
+
+def add_rating_update(rating: int, updated_at: datetime) -> list:
+    """
+    Update pipeline adding one review of `rating` to a company.
+    Companies created before ratingSum existed start from rating * reviewCount.
+    `updatedAt` moves too, since the displayed rating changes.
+    """
+    return [
+        {"$set": {
+            "ratingSum": {"$add": [
+                {"$ifNull": [
+                    "$ratingSum",
+                    {"$multiply": [{"$ifNull": ["$rating", 0]}, {"$ifNull": ["$reviewCount", 0]}]}
+                ]},
+                rating
+            ]},
+            "reviewCount": {"$add": [{"$ifNull": ["$reviewCount", 0]}, 1]},
+            "updatedAt": updated_at
+        }},
+        {"$set": {"rating": {"$round": [{"$divide": ["$ratingSum", "$reviewCount"]}, 1]}}}
+    ]
+
+
+def _counters(rating_sum: float, review_count: int) -> dict:
+    return {
+        "ratingSum": rating_sum,
+        "reviewCount": review_count,
+        "rating": average_rating(rating_sum, review_count)
+    }
+
+
+def _counters_update(company_id, rating_sum: float, review_count: int, updated_at: datetime) -> UpdateOne:
+    """Set the counters of a company, leaving it (and its updatedAt) alone when they already match"""
+    counters = _counters(rating_sum, review_count)
+    drifted = [{field: {"$ne": value}} for field, value in counters.items()]
+    return UpdateOne({"_id": company_id, "$or": drifted}, {"$set": {**counters, "updatedAt": updated_at}})
+
+
+async def reconcile_ratings(db, batch_size: int = RECONCILE_BATCH_SIZE) -> dict:
+    """
+    Recompute ratingSum/reviewCount/rating of every company from its reviews
+    with bulk writes. Returns how many reviewed companies were seen, and how
+    many companies were fixed or reset to zero. Corrected companies get a new
+    `updatedAt`; the caller bumps the companies version when any changed.
+    """
+    report = {"reviewed": 0, "fixed": 0, "reset": 0}
+    updated_at = datetime.utcnow()
+    reviewed_ids = set()
+    ops = []
+
+    async def flush() -> int:
+        if not ops:
+            return 0
+        result = await db.companies.bulk_write(ops, ordered=False)
+        ops.clear()
+        return result.modified_count
+
+    pipeline = [{"$group": {"_id": "$companyId", "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}}]
+    async for row in db.reviews.aggregate(pipeline, allowDiskUse=True):
+        reviewed_ids.add(row["_id"])
+        report["reviewed"] += 1
+        ops.append(_counters_update(row["_id"], row["sum"], row["count"], updated_at))
+        if len(ops) >= batch_size:
+            report["fixed"] += await flush()
+    report["fixed"] += await flush()
+
+    # Companies claiming reviews that do not exist
+    stale = {"$or": [{"reviewCount": {"$gt": 0}}, {"ratingSum": {"$exists": False}}]}
+    async for company in db.companies.find(stale, {"_id": 1}):
+        if company["_id"] in reviewed_ids:
+            continue
+        ops.append(_counters_update(company["_id"], 0, 0, updated_at))
+        if len(ops) >= batch_size:
+            report["reset"] += await flush()
+    report["reset"] += await flush()
+
+    return report
+
+
+def rating_fields(company: Optional[dict]) -> dict:
+    """totalReviews/averageRating summary of a company document"""
+    if not company:
+        return {"totalReviews": 0, "averageRating": 0}
+    return {"totalReviews": company.get("reviewCount", 0), "averageRating": derived_rating(company)}
@@ -0,0 +1,71 @@
+"""
+Read-through cache for public GET responses.
+
+Keys are built from a namespace, the route and the normalized query
+parameters. Each namespace has a generation number that is part of the key:
+invalidating a namespace bumps its generation, so every response cached under
+it stops matching at once and ages out of the backend on its own.
+
+Backends only need get/set/stats; `MemoryBackend` is an in-process LRU with
+TTL, `NullBackend` disables caching.
+"""
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+from utils.ttl_cache import TTLCache
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 2048, ttl: float = 60.0):
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.cache.get(key)
+
+    def set(self, key: str, value: Any):
+        self.cache.set(key, value)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self.cache.stats()}
+
+
+class NullBackend:
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "none"}
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.generations: Dict[str, int] = {}
+
+    def key(self, namespace: str, route: str, params: Optional[dict] = None) -> str:
+        query = urlencode(sorted((k, str(v)) for k, v in (params or {}).items() if v is not None))
+        return f"{namespace}@{self.generations.get(namespace, 0)}:{route}?{query}"
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Any):
+        self.backend.set(key, value)
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+def create_response_cache(backend: str = "memory", max_entries: int = 2048, ttl: float = 60.0) -> ResponseCache:
+    if backend == "memory":
+        return ResponseCache(MemoryBackend(max_entries=max_entries, ttl=ttl))
+    if backend == "none":
+        return ResponseCache(NullBackend())
+    raise ValueError(f"Unknown response cache backend: {backend}")
@@ -0,0 +1,227 @@
+"""
+In-process full-text search over company names and descriptions (UA/RU).
+
+The index is an inverted index term -> {company_id: term frequency} built from
+`name`, `nameRu`, `description` and `descriptionRu`. Queries are normalized and
+stemmed the same way as documents and ranked with BM25, so the cost of a search
+depends on the posting lists of the query terms, not on the catalog size. The
+last query word also matches as a prefix, so results follow the user's typing.
+"""
+import math
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Field weights: a hit in the name counts more than a hit in the description
+SEARCH_FIELDS = {
+    "name": 3.0,
+    "nameRu": 3.0,
+    "description": 1.0,
+    "descriptionRu": 1.0,
+}
+
+# Extra attributes kept per document so filters can be applied without Mongo
+FILTER_FIELDS = ("category", "isNew", "isActive")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MIN_STEM_LENGTH = 3
+
+# Shorter last words only match whole terms (a single letter would match half the vocabulary)
+MIN_PREFIX_LENGTH = 2
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яіїєґё]+")
+
+_CHAR_MAP = str.maketrans({
+    "ё": "е",
+    "є": "е",
+    "ї": "і",
+    "ґ": "г",
+    "й": "и",
+    "'": None,
+    "’": None,
+    "ʼ": None,
+    "`": None,
+})
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and fold UA/RU spelling variants to one alphabet"""
+    return text.lower().translate(_CHAR_MAP)
+
+
+# Common Ukrainian and Russian inflectional endings, longest first
+# (normalized like the tokens they are stripped from, e.g. "ий" -> "ии")
+_SUFFIXES = sorted({normalize(suffix) for suffix in {
+    # adjectives
+    "ого", "ому", "ими", "іми", "ему", "его", "ыми", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ых", "их", "ым", "им", "ою", "ею", "ую", "юю", "ої", "ій",
+    "ий", "ом", "ем",
+    # nouns
+    "ами", "ями", "ах", "ях", "ам", "ям", "ов", "ев", "ей", "ія", "ії", "ію",
+    "ию", "ия", "ии", "ой", "ів", "їв", "ові", "еві", "ью", "ьми",
+    "и", "і", "а", "я", "о", "у", "ю", "е", "ы", "ь",
+    # verbs
+    "ать", "ять", "ить", "ети", "ати", "яти", "ити", "ють", "ут", "ют",
+}}, key=len, reverse=True)
+
+
+def stem(token: str) -> str:
+    """Strip the longest known inflectional ending, keeping a minimal stem"""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= MIN_STEM_LENGTH:
+            return token[:-len(suffix)]
+    return token
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Split text into normalized (unstemmed) words"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into normalized, stemmed terms"""
+    return [stem(token) for token in words(text)]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self.doc_attrs: Dict[str, dict] = {}
+        self.total_length = 0.0
+        # Sorted vocabulary for prefix lookups, rebuilt lazily when terms come or go
+        self._sorted_terms: Optional[List[str]] = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, company: dict):
+        """Index (or re-index) a company document"""
+        doc_id = str(company["_id"])
+        self.remove(doc_id)
+
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in SEARCH_FIELDS.items():
+            for term in tokenize(company.get(field)):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+                length += weight
+
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self._sorted_terms = None
+            self.postings[term][doc_id] = frequency
+
+        self.doc_terms[doc_id] = list(frequencies)
+        self.doc_lengths[doc_id] = length
+        self.doc_attrs[doc_id] = {field: company.get(field) for field in FILTER_FIELDS}
+        self.total_length += length
+
+    def remove(self, doc_id: str):
+        """Drop a company from the index; unknown ids are ignored"""
+        doc_id = str(doc_id)
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+                self._sorted_terms = None
+        self.total_length -= self.doc_lengths.pop(doc_id, 0.0)
+        self.doc_attrs.pop(doc_id, None)
+
+    def rebuild(self, companies: Iterable[dict]):
+        """Replace the whole index content"""
+        self.__init__()
+        for company in companies:
+            self.add(company)
+
+    def _matches_filters(self, doc_id: str, filters: dict) -> bool:
+        attrs = self.doc_attrs.get(doc_id, {})
+        for field, value in filters.items():
+            default = True if field == "isActive" else (False if field == "isNew" else None)
+            if attrs.get(field, default) != value:
+                return False
+        return True
+
+    def _prefix_posting(self, word: str) -> Dict[str, float]:
+        """
+        Posting of the last query word: its stem plus every term starting with
+        the word as typed ("рест" -> "ресторан"), frequencies summed per company.
+        """
+        term = stem(word)
+        if len(word) < MIN_PREFIX_LENGTH:
+            return self.postings.get(term, {})
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        matched = {term} if term in self.postings else set()
+        for i in range(bisect_left(self._sorted_terms, word), len(self._sorted_terms)):
+            if not self._sorted_terms[i].startswith(word):
+                break
+            matched.add(self._sorted_terms[i])
+        if len(matched) == 1:
+            return self.postings[matched.pop()]
+        posting: Dict[str, float] = {}
+        for term in matched:
+            for doc_id, frequency in self.postings[term].items():
+                posting[doc_id] = posting.get(doc_id, 0.0) + frequency
+        return posting
+
+    def search(self, query: str, filters: Optional[dict] = None) -> List[Tuple[str, float]]:
+        """
+        Return (company_id, score) pairs sorted by BM25 relevance.
+        Every query term must match, the last one as a prefix;
+        `filters` are exact matches on FILTER_FIELDS.
+        """
+        query_words = words(query)
+        if not query_words or not self.doc_lengths:
+            return []
+        last = query_words[-1]
+        terms = dict.fromkeys(stem(word) for word in query_words[:-1])
+        terms.pop(stem(last), None)
+
+        postings = [self._prefix_posting(last)]
+        for term in terms:
+            postings.append(self.postings.get(term))
+        if not all(postings):
+            return []
+
+        # Intersect starting from the rarest term
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+
+        if filters:
+            candidates = {doc_id for doc_id in candidates if self._matches_filters(doc_id, filters)}
+
+        total_docs = len(self.doc_lengths)
+        avg_length = self.total_length / total_docs if total_docs else 1.0
+        scores = {}
+        for posting in postings:
+            idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id in candidates:
+                frequency = posting[doc_id]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+# Shared index used by the API
+company_search_index = SearchIndex()
+
+# Projection needed to (re)build the index
+INDEX_PROJECTION = {field: 1 for field in (*SEARCH_FIELDS, *FILTER_FIELDS)}
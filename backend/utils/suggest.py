@@ -0,0 +1,186 @@
+"""
+In-process typeahead over company and category names.
+
+Every word start of `name`/`nameRu` becomes a key ("кафе номер 5", "номер 5",
+"5") in one sorted array of (key, company_id) pairs, so the companies matching a
+prefix are a contiguous range found with bisect. Matches are ranked by
+popularity (review count, then rating).
+
+Short prefixes match most of the catalog, so their top companies ("heads") are
+precomputed at rebuild and kept up to date on writes; a head that loses a
+member is recomputed on its next use. Results for longer prefixes are memoized
+and the memo is dropped on every write, since writes are rare next to keystrokes.
+"""
+import bisect
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from utils.category_counts import CATEGORIES
+from utils.search import words
+
+# Fields returned per company
+SUGGEST_FIELDS = ("name", "nameRu", "category")
+
+# Projection needed to (re)build the index
+SUGGEST_PROJECTION = dict.fromkeys([*SUGGEST_FIELDS, "isActive", "reviewCount", "rating"], 1)
+
+MAX_MEMO_ENTRIES = 4096
+
+# Prefixes up to this length get a precomputed head of HEAD_SIZE companies
+HEAD_PREFIX_LENGTH = 3
+HEAD_SIZE = 20
+
+
+def word_starts(text: Optional[str]) -> List[str]:
+    """Keys for every word start of `text`"""
+    tokens = words(text)
+    return [" ".join(tokens[i:]) for i in range(len(tokens))]
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys: List[Tuple[str, str]] = []
+        self.doc_keys: Dict[str, List[str]] = {}
+        self.docs: Dict[str, dict] = {}
+        self.popularity: Dict[str, Tuple[int, float]] = {}
+        self.categories = [
+            (category, {key for field in ("id", "nameUk", "nameRu") for key in word_starts(category[field])})
+            for category in CATEGORIES
+        ]
+        self.heads: Dict[str, List[str]] = {}
+        self._memo: Dict[Tuple[str, int], List[dict]] = {}
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, company: dict):
+        """Index (or re-index) a company; inactive companies are not suggested"""
+        self.remove(company["_id"])
+        for entry in self._store(company):
+            bisect.insort(self.keys, entry)
+        doc_id = str(company["_id"])
+        for prefix in self._head_prefixes(doc_id):
+            self._offer(prefix, doc_id)
+        self._memo.clear()
+
+    def _store(self, company: dict) -> List[Tuple[str, str]]:
+        """Record a company's document and popularity; returns its key entries"""
+        if not company.get("isActive", True):
+            return []
+        doc_id = str(company["_id"])
+        keys = sorted({key for field in ("name", "nameRu") for key in word_starts(company.get(field))})
+        self.doc_keys[doc_id] = keys
+        self.docs[doc_id] = {"_id": doc_id, **{field: company.get(field) for field in SUGGEST_FIELDS}}
+        self.popularity[doc_id] = (company.get("reviewCount", 0), company.get("rating", 0.0))
+        return [(key, doc_id) for key in keys]
+
+    def _rank(self, doc_id: str):
+        return self.popularity[doc_id], doc_id
+
+    def _head_prefixes(self, doc_id: str) -> set:
+        return {
+            key[:length]
+            for key in self.doc_keys.get(doc_id, ())
+            for length in range(1, min(len(key), HEAD_PREFIX_LENGTH) + 1)
+        }
+
+    def _offer(self, prefix: str, doc_id: str):
+        """Insert a company into an existing head if it ranks high enough"""
+        head = self.heads.get(prefix)
+        if head is None:
+            return
+        rank = self._rank(doc_id)
+        position = 0
+        while position < len(head) and self._rank(head[position]) > rank:
+            position += 1
+        if position < HEAD_SIZE:
+            head.insert(position, doc_id)
+            del head[HEAD_SIZE:]
+
+    def _drop_heads(self, doc_id: str):
+        """Forget the heads containing a company; they are recomputed on use"""
+        for prefix in self._head_prefixes(doc_id):
+            if doc_id in self.heads.get(prefix, ()):
+                del self.heads[prefix]
+
+    def remove(self, doc_id: str):
+        """Drop a company from the index; unknown ids are ignored"""
+        doc_id = str(doc_id)
+        self._drop_heads(doc_id)
+        keys = self.doc_keys.pop(doc_id, None)
+        if keys is None:
+            return
+        for key in keys:
+            position = bisect.bisect_left(self.keys, (key, doc_id))
+            if position < len(self.keys) and self.keys[position] == (key, doc_id):
+                del self.keys[position]
+        self.docs.pop(doc_id, None)
+        self.popularity.pop(doc_id, None)
+        self._memo.clear()
+
+    def set_popularity(self, doc_id: str, review_count: int, rating: float):
+        """Update the ranking of an indexed company (e.g. after a new review)"""
+        doc_id = str(doc_id)
+        if doc_id not in self.popularity:
+            return
+        # The company may have to leave a head, so those are recomputed
+        self._drop_heads(doc_id)
+        self.popularity[doc_id] = (review_count, rating)
+        for prefix in self._head_prefixes(doc_id):
+            self._offer(prefix, doc_id)
+        self._memo.clear()
+
+    def rebuild(self, companies):
+        """Replace the whole index content"""
+        self.__init__()
+        self.keys = sorted(entry for company in companies for entry in self._store(company))
+
+        # Visiting companies from the most popular fills every head in rank order
+        for doc_id in sorted(self.docs, key=self._rank, reverse=True):
+            for prefix in self._head_prefixes(doc_id):
+                head = self.heads.setdefault(prefix, [])
+                if len(head) < HEAD_SIZE:
+                    head.append(doc_id)
+
+    def _matches(self, prefix: str) -> set:
+        matches = set()
+        position = bisect.bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            matches.add(self.keys[position][1])
+            position += 1
+        return matches
+
+    def suggest_companies(self, query: str, limit: int = 10) -> List[dict]:
+        """Most popular companies with a name word starting with `query`"""
+        prefix = " ".join(words(query))
+        if not prefix:
+            return []
+        if len(prefix) <= HEAD_PREFIX_LENGTH and limit <= HEAD_SIZE:
+            head = self.heads.get(prefix)
+            if head is None:
+                head = self.heads[prefix] = heapq.nlargest(HEAD_SIZE, self._matches(prefix), key=self._rank)
+            return [self.docs[doc_id] for doc_id in head[:limit]]
+
+        memo_key = (prefix, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+
+        top = heapq.nlargest(limit, self._matches(prefix), key=self._rank)
+        result = [self.docs[doc_id] for doc_id in top]
+
+        if len(self._memo) >= MAX_MEMO_ENTRIES:
+            self._memo.clear()
+        self._memo[memo_key] = result
+        return result
+
+    def suggest_categories(self, query: str) -> List[dict]:
+        """Categories with an id or name word starting with `query`"""
+        prefix = " ".join(words(query))
+        if not prefix:
+            return []
+        return [category for category, keys in self.categories if any(key.startswith(prefix) for key in keys)]
+
+
+# Shared index used by the API
+company_suggest_index = SuggestIndex()
@@ -0,0 +1,124 @@
+"""
+Write-behind buffer for company view events.
+
+Request handlers push view documents onto a bounded asyncio queue and return
+immediately; a background task drains the queue with insert_many, flushing
+whenever `batch_size` events are collected or `flush_interval` seconds have
+passed since the first event of the batch. When the queue is full the
+"drop" policy discards new events and the "block" policy waits up to
+`put_timeout` seconds for room before discarding. `on_flush` is awaited with
+every batch that was written successfully.
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+VIEW_BUFFER_POLICIES = ("drop", "block")
+
+
+class ViewBuffer:
+    def __init__(self, collection, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, policy: str = "drop", put_timeout: float = 0.05,
+                 on_flush: Optional[Callable[[List[dict]], Awaitable]] = None):
+        if policy not in VIEW_BUFFER_POLICIES:
+            raise ValueError(f"Unknown view buffer policy: {policy}")
+        self.collection = collection
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.on_flush = on_flush
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[asyncio.Future] = None
+        self._batch: List[dict] = []
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def start(self):
+        """Start the background flusher (must be called inside the event loop)"""
+        if self._task is None:
+            self.queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def record(self, event: dict):
+        """Enqueue a view event, applying the overflow policy"""
+        if self.queue is None:
+            # Not started (e.g. scripts): write through
+            await self._write([event])
+            return
+        try:
+            if self.policy == "block":
+                await asyncio.wait_for(self.queue.put(event), self.put_timeout)
+            else:
+                self.queue.put_nowait(event)
+            self.enqueued += 1
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self.dropped += 1
+
+    async def _write(self, batch: List[dict]):
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("Failed to flush %d view events: %s", len(batch), e)
+            return
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(batch)
+            except Exception as e:
+                logger.error("View flush hook failed for %d events: %s", len(batch), e)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self.queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._batch = self._batch, []
+            # Shielded so that stop() never interrupts a write half-way
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    async def stop(self):
+        """Stop the flusher and write every buffered event"""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._writing is not None and not self._writing.done():
+            await self._writing
+
+        pending, self._batch = self._batch, []
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        for start in range(0, len(pending), self.batch_size):
+            await self._write(pending[start:start + self.batch_size])
+        self.queue = None
@@ -0,0 +1,236 @@
+"""
+Per-company view rollups.
+
+Raw events in `company_views` are summarized into:
+- company_view_daily:   one row per (companyId, day) with total and unique views
+- company_view_totals:  one row per company with lifetime total, unique and lastViewedAt
+- company_view_viewers: one marker per (companyId, userId), used to count lifetime uniques
+- company_view_daily_viewers: one marker per (companyId, day, userId), used to count daily uniques;
+  markers expire DAILY_VIEWER_TTL after their day (`dayStart`), once no window reads that day
+
+Rollups are updated per flushed batch of view events (a few bulk writes per
+batch, not per view), and can be rebuilt from the raw events with
+`backfill_view_rollup`. Anonymous views count as a single viewer (userId None),
+as in the original distinct-user aggregation.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+DAY_FORMAT = "%Y-%m-%d"
+
+# Longest dashboard window is 30 days; a few days more covers late flushes
+DAILY_VIEWER_TTL = timedelta(days=35)
+
+
+def day_key(moment: datetime) -> str:
+    return moment.strftime(DAY_FORMAT)
+
+
+def day_start(day: str) -> datetime:
+    return datetime.strptime(day, DAY_FORMAT)
+
+
+def empty_view_stats() -> dict:
+    return {
+        "totalViews": 0,
+        "uniqueViews": 0,
+        "viewsThisWeek": 0,
+        "viewsThisMonth": 0,
+        "lastViewedAt": None
+    }
+
+
+async def apply_view_rollup(db, events: List[dict]):
+    """Fold a batch of raw view events into the rollup collections"""
+    daily = defaultdict(lambda: {"total": 0, "last": None})
+    totals = defaultdict(lambda: {"total": 0, "last": None})
+    viewers = set()
+    daily_viewers = set()
+
+    for event in events:
+        company_id = event["companyId"]
+        viewed_at = event["viewedAt"]
+        user_id = event.get("userId")
+
+        day = day_key(viewed_at)
+        row = daily[(company_id, day)]
+        row["total"] += 1
+        row["last"] = max(row["last"] or viewed_at, viewed_at)
+
+        total = totals[company_id]
+        total["total"] += 1
+        total["last"] = max(total["last"] or viewed_at, viewed_at)
+
+        viewers.add((company_id, user_id))
+        daily_viewers.add((company_id, day, user_id))
+
+    if not events:
+        return
+
+    # Daily uniques: a viewer is new for the day when its marker gets inserted
+    new_daily_viewers: Dict = defaultdict(int)
+    for company_id, day, _ in await insert_markers(
+        db.company_view_daily_viewers, daily_viewers, ("companyId", "day", "userId"),
+        lambda marker: {"dayStart": day_start(marker["day"])}
+    ):
+        new_daily_viewers[(company_id, day)] += 1
+
+    await db.company_view_daily.bulk_write([
+        UpdateOne(
+            {"companyId": company_id, "day": day},
+            {
+                "$inc": {"total": row["total"], "unique": new_daily_viewers.get((company_id, day), 0)},
+                "$max": {"lastViewedAt": row["last"]}
+            },
+            upsert=True
+        )
+        for (company_id, day), row in daily.items()
+    ], ordered=False)
+
+    # Lifetime uniques, the same way with one marker per company and viewer
+    new_viewers: Dict = defaultdict(int)
+    for company_id, _ in await insert_markers(db.company_view_viewers, viewers, ("companyId", "userId")):
+        new_viewers[company_id] += 1
+
+    await db.company_view_totals.bulk_write([
+        UpdateOne(
+            {"_id": company_id},
+            {
+                "$inc": {"total": total["total"], "unique": new_viewers.get(company_id, 0)},
+                "$max": {"lastViewedAt": total["last"]}
+            },
+            upsert=True
+        )
+        for company_id, total in totals.items()
+    ], ordered=False)
+
+
+async def insert_markers(
+    collection, keys: Iterable[tuple], fields: tuple, on_insert: Optional[Callable[[dict], dict]] = None
+) -> List[tuple]:
+    """
+    Upsert one marker per key (its `_id` is the key as a document with `fields`)
+    and return the keys whose marker did not exist yet. `on_insert` gives extra
+    fields of a new marker (e.g. the date its TTL counts from).
+    """
+    markers = [dict(zip(fields, key)) for key in keys]
+    operations = [
+        UpdateOne(
+            {"_id": marker},
+            {"$setOnInsert": {"companyId": marker["companyId"], **(on_insert(marker) if on_insert else {})}},
+            upsert=True
+        )
+        for marker in markers
+    ]
+    if not operations:
+        return []
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        # Concurrent flushes may race on the same marker; keep what was inserted
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+    return [tuple(marker_id[field] for field in fields) for marker_id in upserted.values()]
+
+
+async def get_view_stats(db, company_ids: Iterable, now: datetime = None) -> Dict:
+    """
+    View statistics per company id, read from the rollups: one read of the
+    lifetime totals plus at most 30 daily rows per company.
+    The week and month windows are the last 7 and 30 calendar days (UTC).
+    """
+    company_ids = list(company_ids)
+    now = now or datetime.utcnow()
+    week_start = day_key(now - timedelta(days=6))
+    month_start = day_key(now - timedelta(days=29))
+
+    stats = {company_id: empty_view_stats() for company_id in company_ids}
+    if not company_ids:
+        return stats
+
+    async for row in db.company_view_totals.find({"_id": {"$in": company_ids}}):
+        entry = stats[row["_id"]]
+        entry["totalViews"] = row.get("total", 0)
+        entry["uniqueViews"] = row.get("unique", 0)
+        entry["lastViewedAt"] = row.get("lastViewedAt")
+
+    pipeline = [
+        {"$match": {"companyId": {"$in": company_ids}, "day": {"$gte": month_start}}},
+        {"$group": {
+            "_id": "$companyId",
+            "month": {"$sum": "$total"},
+            "week": {"$sum": {"$cond": [{"$gte": ["$day", week_start]}, "$total", 0]}}
+        }}
+    ]
+    async for row in db.company_view_daily.aggregate(pipeline):
+        stats[row["_id"]]["viewsThisWeek"] = row["week"]
+        stats[row["_id"]]["viewsThisMonth"] = row["month"]
+
+    return stats
+
+
+async def backfill_view_rollup(db):
+    """Rebuild all rollup collections from the raw company_views events"""
+    await db.company_view_daily.delete_many({})
+    await db.company_view_totals.delete_many({})
+    await db.company_view_viewers.delete_many({})
+    await db.company_view_daily_viewers.delete_many({})
+
+    day = {"$dateToString": {"format": DAY_FORMAT, "date": "$viewedAt"}}
+    await db.company_views.aggregate([
+        {"$group": {
+            "_id": {"companyId": "$companyId", "day": day},
+            "total": {"$sum": 1},
+            "lastViewedAt": {"$max": "$viewedAt"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "companyId": "$_id.companyId",
+            "day": "$_id.day",
+            "total": 1,
+            "lastViewedAt": 1
+        }},
+        {"$merge": {"into": "company_view_daily", "on": ["companyId", "day"], "whenMatched": "replace"}}
+    ], allowDiskUse=True).to_list(length=None)
+
+    await db.company_views.aggregate([
+        {"$group": {"_id": {"companyId": "$companyId", "day": day, "userId": "$userId"}}},
+        {"$project": {
+            "companyId": "$_id.companyId",
+            "dayStart": {"$dateFromString": {"dateString": "$_id.day", "format": DAY_FORMAT}}
+        }},
+        {"$merge": {"into": "company_view_daily_viewers", "whenMatched": "keepExisting"}}
+    ], allowDiskUse=True).to_list(length=None)
+
+    await db.company_view_daily_viewers.aggregate([
+        {"$group": {"_id": {"companyId": "$_id.companyId", "day": "$_id.day"}, "unique": {"$sum": 1}}},
+        {"$project": {"_id": 0, "companyId": "$_id.companyId", "day": "$_id.day", "unique": 1}},
+        {"$merge": {
+            "into": "company_view_daily", "on": ["companyId", "day"],
+            "whenMatched": "merge", "whenNotMatched": "discard"
+        }}
+    ], allowDiskUse=True).to_list(length=None)
+
+    await db.company_views.aggregate([
+        {"$group": {"_id": {"companyId": "$companyId", "userId": "$userId"}}},
+        {"$project": {"companyId": "$_id.companyId"}},
+        {"$merge": {"into": "company_view_viewers", "whenMatched": "keepExisting"}}
+    ], allowDiskUse=True).to_list(length=None)
+
+    await db.company_views.aggregate([
+        {"$group": {
+            "_id": "$companyId",
+            "total": {"$sum": 1},
+            "lastViewedAt": {"$max": "$viewedAt"}
+        }},
+        {"$merge": {"into": "company_view_totals", "whenMatched": "replace"}}
+    ], allowDiskUse=True).to_list(length=None)
+
+    await db.company_view_viewers.aggregate([
+        {"$group": {"_id": "$companyId", "unique": {"$sum": 1}}},
+        {"$merge": {"into": "company_view_totals", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ], allowDiskUse=True).to_list(length=None)
@@ -0,0 +1,93 @@
+"""
+Stub WordPress REST API for offline migration runs and benchmarks
+
+Serves /wp-json/wp/v2/posts and /wp-json/wp/v2/listing with generated items
+and WordPress pagination (per_page <= 100, X-WP-Total, X-WP-TotalPages,
+400 past the last page), with optional latency per request and injected
+429/503 failures to exercise retries.
+
+Usage:
+  python wordpress_stub.py [--posts 2000] [--listings 20000] [--latency 0.05] [--fail-rate 0.02] [--port 8090]
+  python migrate_from_wordpress.py --url http://localhost:8090
+"""
+import argparse
+import asyncio
+import math
+import random
+from datetime import datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+
+def make_post(i):
+    return {
+        "id": i,
+        "date": (datetime(2024, 1, 1) + timedelta(hours=i)).isoformat(),
+        "title": {"rendered": f"<strong>Стаття {i}</strong>"},
+        "content": {"rendered": f"<p>Текст статті {i}. " + "Корисна порада. " * 20 + "</p>"},
+        "excerpt": {"rendered": ""},
+        "_embedded": {"wp:featuredmedia": [{"source_url": f"https://hal.in.ua/wp-content/uploads/post-{i}.jpg"}]},
+    }
+
+
+def make_listing(i):
+    return {
+        "id": i,
+        "title": {"rendered": f"Компанія &#8220;{i}&#8221;"},
+        "content": {"rendered": f"<p>Опис компанії {i}. " + "Якісні послуги. " * 20 + "</p>"},
+        "meta": {
+            "city": "Київ",
+            "address": f"вул. Хрещатик, {i}",
+            "phone": f"+38044{i:07d}",
+            "email": f"company{i}@example.com",
+            "website": f"https://company{i}.example.com",
+        },
+    }
+
+
+def create_app(posts=2000, listings=20000, latency=0.0, fail_rate=0.0, seed=0):
+    app = FastAPI(title="WordPress stub")
+    app.state.requests = 0
+    rng = random.Random(seed)
+
+    def collection(total, make_item):
+        async def handler(page: int = Query(1), per_page: int = Query(10)):
+            app.state.requests += 1
+            if latency:
+                await asyncio.sleep(latency)
+            if fail_rate and rng.random() < fail_rate:
+                if rng.random() < 0.5:
+                    return JSONResponse({"code": "too_many_requests"}, status_code=429, headers={"Retry-After": "0"})
+                return JSONResponse({"code": "service_unavailable"}, status_code=503)
+            if not 1 <= per_page <= 100:
+                return JSONResponse({"code": "rest_invalid_param"}, status_code=400)
+            total_pages = max(math.ceil(total / per_page), 1)
+            if page < 1 or page > total_pages:
+                return JSONResponse({"code": "rest_post_invalid_page_number"}, status_code=400)
+            first = (page - 1) * per_page + 1
+            items = [make_item(i) for i in range(first, min(first + per_page, total + 1))]
+            return JSONResponse(items, headers={"X-WP-Total": str(total), "X-WP-TotalPages": str(total_pages)})
+        return handler
+
+    app.get("/wp-json/wp/v2/posts")(collection(posts, make_post))
+    app.get("/wp-json/wp/v2/listing")(collection(listings, make_listing))
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--listings", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 429/503")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    app = create_app(args.posts, args.listings, args.latency, args.fail_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,28 @@
 #!/usr/bin/env python3
 """
 HAL API Backend Testing Suite
-Tests all backend API endpoints for the HAL application
+Tests all backend API endpoints for the HAL application, plus the import
+upserts directly against MongoDB (MONGO_URL/DB_NAME from backend/.env)
 """
 
 import requests
 import json
+import os
 import sys
 from datetime import datetime
+from pathlib import Path
 import uuid
 
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+load_dotenv(BACKEND_DIR / ".env")
+
+from utils.imports import upsert_operation, upsert_report
+
 # Backend URL from frontend .env
 BASE_URL = "https://hal-rebuild.preview.emergentagent.com/api"
 
@@ -427,6 +440,72 @@ class HALAPITester:
         except Exception as e:
             self.log_test("POST /api/contact", False, f"Exception: {str(e)}")
     
+    def test_import_upserts(self):
+        """Test utils.imports.upsert_operation on MongoDB: content hash, on-insert defaults, unset fields"""
+        mongo_url = os.environ.get("MONGO_URL")
+        if not mongo_url:
+            print("⏭  SKIP Import upserts: MONGO_URL is not set")
+            print()
+            return
+        
+        client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
+        try:
+            client.admin.command("ping")
+        except PyMongoError as e:
+            self.log_test("Import upsert", False, f"MongoDB not reachable: {str(e)[:200]}")
+            client.close()
+            return
+        collection = client[os.environ.get("DB_NAME", "hal")][f"test_import_upserts_{uuid.uuid4().hex[:8]}"]
+        key = "csv:test-company"
+        point = {"type": "Point", "coordinates": [30.52, 50.45]}
+        on_insert = {"createdAt": datetime(2025, 1, 1), "rating": 0.0}
+        
+        def upsert(fields, updated_at, unset=()):
+            result = collection.bulk_write([upsert_operation(key, fields, on_insert, updated_at, unset=unset)])
+            return upsert_report(result.bulk_api_result), collection.find_one({"importKey": key})
+        
+        try:
+            # First import inserts the document with its defaults
+            report, doc = upsert({"name": "Кафе", "geo": point}, datetime(2025, 1, 1))
+            success = (
+                report == {"inserted": 1, "updated": 0, "unchanged": 0}
+                and doc["name"] == "Кафе" and doc["geo"] == point
+                and doc["createdAt"] == datetime(2025, 1, 1) and doc["rating"] == 0.0
+                and doc["updatedAt"] == datetime(2025, 1, 1) and doc.get("importHash")
+            )
+            self.log_test("Import upsert - insert", bool(success), f"Report: {report}", doc)
+            
+            # Fields written by the API must survive later imports
+            collection.update_one({"importKey": key}, {"$set": {"rating": 4.5}})
+            
+            # Same content again: nothing changes, not even updatedAt
+            report, doc = upsert({"name": "Кафе", "geo": point}, datetime(2025, 2, 1))
+            success = (
+                report == {"inserted": 0, "updated": 0, "unchanged": 1}
+                and doc["updatedAt"] == datetime(2025, 1, 1) and doc["rating"] == 4.5
+            )
+            self.log_test("Import upsert - unchanged content", success, f"Report: {report}", doc)
+            
+            # Changed content without coordinates: updated, derived point unset, defaults not reapplied
+            report, doc = upsert({"name": "Кафе Нове"}, datetime(2025, 3, 1), unset=("geo",))
+            success = (
+                report == {"inserted": 0, "updated": 1, "unchanged": 0}
+                and doc["name"] == "Кафе Нове" and "geo" not in doc
+                and doc["updatedAt"] == datetime(2025, 3, 1)
+                and doc["createdAt"] == datetime(2025, 1, 1) and doc["rating"] == 4.5
+            )
+            self.log_test("Import upsert - changed content and unset", success, f"Report: {report}", doc)
+            
+            # Re-running the same changed row is a no-op again
+            report, _ = upsert({"name": "Кафе Нове"}, datetime(2025, 4, 1), unset=("geo",))
+            success = report == {"inserted": 0, "updated": 0, "unchanged": 1}
+            self.log_test("Import upsert - re-run is idempotent", success, f"Report: {report}")
+        except Exception as e:
+            self.log_test("Import upsert", False, f"Exception: {str(e)}")
+        finally:
+            collection.drop()
+            client.close()
+    
     def run_all_tests(self):
         """Run all API tests"""
         print("=" * 60)
@@ -467,6 +546,9 @@ class HALAPITester:
         # Test contact
         self.test_contact_message()
         
+        # Test import upserts directly against MongoDB
+        self.test_import_upserts()
+        
         # Summary
         self.print_summary()
     
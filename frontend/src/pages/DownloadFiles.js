@@ -1,10 +1,11 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { useLanguage } from '../context/LanguageContext';
 import { Download, FileText, FileJson, Code } from 'lucide-react';
 
 const DownloadFiles = () => {
   const { language } = useLanguage();
   const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+  const [preparing, setPreparing] = useState(null);
 
   const files = [
     {
@@ -44,8 +45,23 @@ const DownloadFiles = () => {
     }
   ];
 
-  const handleDownload = (filename) => {
-    window.open(`${BACKEND_URL}/api/download/${filename}`, '_blank');
+  const handleDownload = async (filename) => {
+    const url = `${BACKEND_URL}/api/download/${filename}`;
+    setPreparing(filename);
+    try {
+      // Files are generated from the current data; 202 means the export is still running
+      let response = await fetch(url, { method: 'HEAD' });
+      while (response.status === 202) {
+        const seconds = Number(response.headers.get('Retry-After')) || 5;
+        await new Promise((resolve) => setTimeout(resolve, seconds * 1000));
+        response = await fetch(url, { method: 'HEAD' });
+      }
+    } catch (error) {
+      console.error('Failed to prepare download:', error);
+    } finally {
+      setPreparing(null);
+    }
+    window.location.href = url;
   };
 
   return (
@@ -112,10 +128,15 @@ const DownloadFiles = () => {
                   </div>
                   <button
                     onClick={() => handleDownload(file.name)}
+                    disabled={preparing === file.name}
                     className="bg-gradient-to-r from-pink-500 to-red-500 text-white px-6 py-2.5 rounded-lg hover:from-pink-600 hover:to-red-600 transition-all font-semibold flex items-center space-x-2 shadow-md hover:shadow-lg ml-4"
                   >
                     <Download size={18} />
-                    <span>{language === 'uk' ? 'Завантажити' : 'Скачать'}</span>
+                    <span>
+                      {preparing === file.name
+                        ? (language === 'uk' ? 'Готуємо файл...' : 'Готовим файл...')
+                        : (language === 'uk' ? 'Завантажити' : 'Скачать')}
+                    </span>
                   </button>
                 </div>
               </div>
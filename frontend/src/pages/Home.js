@@ -29,7 +29,7 @@ const Home = () => {
   const loadData = async () => {
     try {
       // Load companies
-      const companiesResponse = await companiesAPI.getAll({ limit: 8, sort: 'recent' });
+      const companiesResponse = await companiesAPI.getAll({ limit: 8, sort: 'recent', fields: 'card' });
       setCompanies(companiesResponse.data.companies);
 
       // Load categories
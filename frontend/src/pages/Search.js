@@ -39,7 +39,8 @@ const Search = () => {
     try {
       const params = {
         limit: 100,
-        sort: sortBy === 'relevant' ? 'recent' : sortBy
+        sort: sortBy === 'relevant' ? 'recent' : sortBy,
+        fields: 'card'
       };
       
       if (searchTerm) {
@@ -27,6 +27,8 @@ api.interceptors.request.use(
 // Companies API
 export const companiesAPI = {
   getAll: (params) => api.get('/companies', { params }),
+  suggest: (q, params) => api.get('/companies/suggest', { params: { q, ...params } }),
+  nearby: (params) => api.get('/companies/nearby', { params }),
   getById: (id) => api.get(`/companies/${id}`),
   create: (data) => api.post('/companies', data),
   update: (id, data) => api.put(`/companies/${id}`, data),
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules are imported the way the API imports them (`from utils...`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# Scripts read their connection settings at import; the offline tests never connect
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "hal_test")
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+from utils import auth
+from utils.auth import (
+    PASSWORD_HASH_CONCURRENCY, _run_password_work, create_access_token, decode_token,
+    get_password_hash_async, password_hash_stats, verify_password_async,
+)
+
+
+def test_hash_and_verify_off_the_event_loop():
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        hashed = await get_password_hash_async("Secret123!")
+        ok = await verify_password_async("Secret123!", hashed)
+        wrong = await verify_password_async("secret123!", hashed)
+        task.cancel()
+        return hashed, ok, wrong, ticks
+
+    hashed, ok, wrong, ticks = asyncio.run(run())
+    assert hashed.startswith("$2b$")
+    assert ok and not wrong
+    # The loop kept running while bcrypt worked in the pool
+    assert ticks > 0
+
+
+def test_concurrency_is_bounded_by_the_pool():
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def work(seconds):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(seconds)
+        with lock:
+            running -= 1
+        return threading.current_thread().name
+
+    async def run():
+        return await asyncio.gather(*(_run_password_work(work, 0.02) for _ in range(PASSWORD_HASH_CONCURRENCY * 3)))
+
+    completed = auth.password_hash_metrics["completed"]
+    threads = asyncio.run(run())
+    assert peak == PASSWORD_HASH_CONCURRENCY
+    assert all(name.startswith("password-hash") for name in threads)
+
+    stats = password_hash_stats()
+    assert stats["completed"] == completed + PASSWORD_HASH_CONCURRENCY * 3
+    assert stats["inFlight"] == 0
+    # Later submissions waited for a free worker
+    assert stats["maxQueueTime"] >= 0.02
+
+
+def test_tokens_round_trip():
+    token = create_access_token({"sub": "user-1"})
+    assert decode_token(token)["sub"] == "user-1"
+    assert decode_token(token + "x") is None
@@ -0,0 +1,46 @@
+import pytest
+
+from utils.category_counts import ACTIVE_FILTER, category_delta
+
+
+def company(category="cafe", **fields):
+    return {"category": category, **fields}
+
+
+def rebuild_counts(companies):
+    """What rebuild_category_counts' $match + $group computes"""
+    counts = {}
+    for doc in companies:
+        if all(doc.get(field) == value for field, value in ACTIVE_FILTER.items()):
+            counts[doc["category"]] = counts.get(doc["category"], 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize("before, after, expected", [
+    (None, company(isActive=True), {"cafe": 1}),
+    (company(isActive=True), None, {"cafe": -1}),
+    (company(isActive=True), company("sport", isActive=True), {"cafe": -1, "sport": 1}),
+    (company(isActive=True), company(isActive=False), {"cafe": -1}),
+    (company(isActive=True), company(isActive=True, name="x"), {}),
+    (None, company("unknown", isActive=True), {}),
+    (None, company(), {}),
+    (company(), company(isActive=True), {"cafe": 1}),
+])
+def test_category_delta(before, after, expected):
+    assert category_delta(before, after) == expected
+
+
+def test_deltas_add_up_to_a_rebuild():
+    writes = [
+        (None, company(isActive=True)),
+        (None, company()),
+        (None, company("sport", isActive=True)),
+        (company("sport", isActive=True), company("sport", isActive=False)),
+        (company(), company(isActive=True)),
+    ]
+    counts = {}
+    for before, after in writes:
+        for category, value in category_delta(before, after).items():
+            counts[category] = counts.get(category, 0) + value
+    final = [company(isActive=True), company("sport", isActive=False), company(isActive=True)]
+    assert {k: v for k, v in counts.items() if v} == rebuild_counts(final)
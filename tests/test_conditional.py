@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from utils.conditional import document_etag, list_etag, not_modified
+
+ETAG = '"0123456789abcdef0123456789abcdef"'
+MODIFIED = datetime(2025, 3, 1, 12, 0, 0, 500000)
+
+
+def test_if_none_match():
+    assert not_modified({"if-none-match": ETAG}, ETAG)
+    assert not_modified({"if-none-match": f'"other", {ETAG}'}, ETAG)
+    assert not_modified({"if-none-match": f"W/{ETAG}"}, ETAG)
+    assert not_modified({"if-none-match": "*"}, ETAG)
+    assert not not_modified({"if-none-match": '"other"'}, ETAG)
+    assert not not_modified({}, ETAG)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    headers = {"if-none-match": '"other"', "if-modified-since": "Sat, 01 Mar 2025 13:00:00 GMT"}
+    assert not not_modified(headers, ETAG, MODIFIED)
+
+
+def test_if_modified_since():
+    assert not_modified({"if-modified-since": "Sat, 01 Mar 2025 12:00:00 GMT"}, ETAG, MODIFIED)
+    assert not_modified({"if-modified-since": "Sat, 01 Mar 2025 13:00:00 GMT"}, ETAG, MODIFIED)
+    assert not not_modified({"if-modified-since": "Sat, 01 Mar 2025 11:59:59 GMT"}, ETAG, MODIFIED)
+    assert not_modified(
+        {"if-modified-since": "Sat, 01 Mar 2025 12:00:00 GMT"}, ETAG, MODIFIED.replace(tzinfo=timezone.utc)
+    )
+
+
+def test_if_modified_since_needs_a_valid_date():
+    assert not not_modified({"if-modified-since": "yesterday"}, ETAG, MODIFIED)
+    assert not not_modified({"if-modified-since": "Sat, 01 Mar 2025 12:00:00 GMT"}, ETAG, None)
+
+
+def test_etags():
+    doc = {"_id": ObjectId("65f000000000000000000001"), "updatedAt": MODIFIED}
+    assert document_etag(doc) == document_etag(dict(doc))
+    assert document_etag(doc) != document_etag({**doc, "updatedAt": datetime(2025, 3, 2)})
+    assert list_etag(3, {"page": 1, "search": None}) == list_etag(3, {"page": 1})
+    assert list_etag(3, {"page": 1}) != list_etag(4, {"page": 1})
+    assert list_etag(3, {"page": 1}) != list_etag(3, {"page": 2})
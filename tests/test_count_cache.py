@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from utils import count_cache as count_cache_module
+from utils.count_cache import CountCache, filter_key
+
+
+class Collection:
+    """Counts like a Motor collection and records how often it was asked"""
+
+    name = "companies"
+
+    def __init__(self, total=100, matching=10):
+        self.total, self.matching = total, matching
+        self.counts = 0
+        self.estimates = 0
+
+    async def count_documents(self, query):
+        self.counts += 1
+        return self.matching if query else self.total
+
+    async def estimated_document_count(self):
+        self.estimates += 1
+        return self.total
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(count_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def count(cache, collection, query, mode):
+    return asyncio.run(cache.count(collection, query, mode))
+
+
+def test_filter_key_ignores_field_order():
+    assert filter_key({"isActive": True, "category": "cafe"}) == filter_key({"category": "cafe", "isActive": True})
+    assert filter_key({"isNew": True}) != filter_key({"isNew": "True"})
+
+
+def test_exact_counts_are_cached_until_ttl(clock):
+    cache, collection = CountCache(ttl=60), Collection()
+    assert count(cache, collection, {"isActive": True}, "exact") == 10
+    assert count(cache, collection, {"isActive": True}, "exact") == 10
+    assert collection.counts == 1
+    clock[0] += 61
+    assert count(cache, collection, {"isActive": True}, "exact") == 10
+    assert collection.counts == 2
+
+
+def test_invalidate_forces_an_exact_recount_but_keeps_estimates(clock):
+    cache, collection = CountCache(), Collection()
+    count(cache, collection, {"isActive": True}, "exact")
+    cache.invalidate("companies")
+    collection.matching = 11
+    assert count(cache, collection, {"isActive": True}, "estimate") == 10
+    assert count(cache, collection, {"isActive": True}, "exact") == 11
+    assert collection.counts == 2
+
+
+def test_estimates_expire_after_their_max_age(clock):
+    cache, collection = CountCache(ttl=60, estimate_max_age=600), Collection()
+    count(cache, collection, {"isActive": True}, "exact")
+    clock[0] += 300
+    assert count(cache, collection, {"isActive": True}, "estimate") == 10
+    assert collection.counts == 1
+    clock[0] += 301
+    count(cache, collection, {"isActive": True}, "estimate")
+    assert collection.counts == 2
+
+
+def test_unfiltered_estimate_reads_collection_metadata(clock):
+    cache, collection = CountCache(), Collection()
+    assert count(cache, collection, {}, "estimate") == 100
+    assert (collection.counts, collection.estimates) == (0, 1)
+
+
+def test_none_mode_counts_nothing():
+    cache, collection = CountCache(), Collection()
+    assert count(cache, collection, {"isActive": True}, "none") is None
+    assert collection.counts == 0
+
+
+def test_full_cache_starts_over(clock):
+    cache, collection = CountCache(max_entries=2), Collection()
+    for category in ("a", "b", "c"):
+        count(cache, collection, {"category": category}, "exact")
+    assert len(cache.entries) == 1
+    assert cache.get("companies", {"category": "c"}) == 10
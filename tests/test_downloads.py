@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from utils.downloads import RangeNotSatisfiable, data_version, if_range_matches, negotiate_encoding, parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("GZIP;Q=0.8", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.3, gzip;q=0.2", "br"),
+    ("*, br;q=0", "gzip"),
+    ("gzip;q=0.0.1", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+    (" bytes=10-20 ", (10, 20)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "bytes=-", "bytes=5-2", "bytes=0-1,5-9", "items=0-9", "bytes=a-b",
+])
+def test_parse_range_ignores_what_it_does_not_handle(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-2000", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),
+    ("bytes=0-", 0),
+])
+def test_parse_range_not_satisfiable(header, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, size)
+
+
+def test_if_range_matches():
+    modified = datetime(2025, 3, 1, 12, 0, 0)
+    assert if_range_matches(None, '"v1-br"', modified)
+    assert if_range_matches('"v1-br"', '"v1-br"', modified)
+    assert not if_range_matches('"v0-br"', '"v1-br"', modified)
+    assert not if_range_matches('W/"v1-br"', '"v1-br"', modified)
+    assert if_range_matches("Sat, 01 Mar 2025 12:00:00 GMT", '"v1-br"', modified)
+    assert not if_range_matches("Sat, 01 Mar 2025 11:00:00 GMT", '"v1-br"', modified)
+
+
+class VersionsDB:
+    """collection_versions only: data_version must not need anything else"""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.reads = 0
+
+    def __getattr__(self, name):
+        raise AssertionError(f"data_version read {name}")
+
+    @property
+    def collection_versions(self):
+        db = self
+
+        class Versions:
+            def find(self, query):
+                db.reads += 1
+
+                async def documents():
+                    for collection in query["_id"]["$in"]:
+                        if collection in db.versions:
+                            yield {"_id": collection, "version": db.versions[collection]}
+                return documents()
+        return Versions()
+
+
+def test_data_version_is_one_read_of_the_collection_versions():
+    db = VersionsDB({"companies": 3})
+    version = asyncio.run(data_version(db))
+    assert db.reads == 1
+    assert version == asyncio.run(data_version(VersionsDB({"companies": 3, "blog_posts": 0})))
+    assert version != asyncio.run(data_version(VersionsDB({"companies": 4})))
+    assert version != asyncio.run(data_version(VersionsDB({"companies": 3, "blog_posts": 1})))
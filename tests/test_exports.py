@@ -0,0 +1,248 @@
+import asyncio
+import csv
+import io
+import json
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from utils.exports import (
+    BLOG_POST_CSV_FIELDS, BLOG_POSTS_CSV, COMPANIES_CSV, COMPANY_CSV_FIELDS, WXR_FILE, CsvWriter, JsonArrayWriter,
+    NdjsonWriter, WxrWriter, blog_post_csv_row, company_csv_row, fan_out, iter_batches, json_writer, write_export,
+    wxr_company_item, wxr_post_item,
+)
+
+
+def company(i, **fields):
+    return {
+        "_id": ObjectId(f"{i:024x}"), "name": f"Кафе {i} & <Co>", "nameRu": f"Кафе {i}", "description": "Опис, \"лапки\"",
+        "category": "cafe", "contacts": {"phone": f"+38044{i:07d}", "email": f"c{i}@example.com"},
+        "location": {"city": "Київ", "address": f"вул. Хрещатик, {i}"}, "image": f"https://img/{i}.jpg",
+        "rating": 4.5, "reviewCount": i, "isActive": True, "updatedAt": datetime(2025, 3, 1, 12, 0, i % 60),
+        **fields,
+    }
+
+
+def post(i):
+    return {
+        "_id": ObjectId(f"{1000 + i:024x}"), "titleUk": f"Стаття {i}", "titleRu": f"Статья {i}",
+        "contentUk": "Текст", "contentRu": "Текст", "excerptUk": "Коротко", "excerptRu": "Кратко",
+        "publishedAt": datetime(2025, 2, 1, 9, 30), "author": "HAL Team", "image": "https://img/post.jpg",
+    }
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+        self.sorted_by = self.batch = None
+
+    def sort(self, keys):
+        self.sorted_by = keys
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def __aiter__(self):
+        async def documents():
+            for document in self.documents:
+                await asyncio.sleep(0)
+                yield document
+        return documents()
+
+
+class Collection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.cursors = []
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        self.cursors.append(Cursor(self.documents))
+        return self.cursors[-1]
+
+
+def test_iter_batches_follows_cursor_batches():
+    async def run(collection):
+        return [[doc["_id"] for doc in batch] async for batch in iter_batches(collection, batch_size=4)]
+
+    collection = Collection([{"_id": i} for i in range(10)])
+    assert asyncio.run(run(collection)) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    (cursor,) = collection.cursors
+    assert (cursor.sorted_by, cursor.batch) == ([("_id", 1)], 4)
+    assert asyncio.run(run(Collection([]))) == []
+
+
+def test_company_csv():
+    file = io.StringIO()
+    writer = CsvWriter(file, COMPANY_CSV_FIELDS, company_csv_row)
+    for i in (1, 2):
+        writer.write(company(i))
+    writer.write(company(3, isActive=False, contacts=None, location=None))
+    writer.close()
+
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+    assert writer.count == 3 and len(rows) == 3
+    assert list(rows[0]) == COMPANY_CSV_FIELDS
+    assert rows[0]["post_title"] == "Кафе 1 & <Co>"
+    assert rows[0]["post_content"] == 'Опис, "лапки"'
+    assert (rows[0]["post_status"], rows[0]["post_type"], rows[0]["phone"]) == ("publish", "listing", "+380440000001")
+    assert (rows[2]["post_status"], rows[2]["phone"], rows[2]["city"]) == ("draft", "", "")
+
+
+def test_blog_post_csv():
+    file = io.StringIO()
+    writer = CsvWriter(file, BLOG_POST_CSV_FIELDS, blog_post_csv_row)
+    writer.write(post(1))
+    (row,) = csv.DictReader(io.StringIO(file.getvalue()))
+    assert (row["post_title"], row["post_date"], row["post_type"]) == ("Стаття 1", "2025-02-01 09:30:00", "post")
+
+
+def test_deleted_companies_go_to_the_trash():
+    tombstone = {"_id": ObjectId(f"{9:024x}"), "name": "Закрито", "deleted": True}
+    assert company_csv_row(tombstone)["post_status"] == "trash"
+    assert "<wp:status><![CDATA[trash]]></wp:status>" in wxr_company_item(tombstone)
+
+
+def test_wxr_is_well_formed_and_keeps_markup_in_cdata():
+    file = io.StringIO()
+    writer = WxrWriter(file, wxr_post_item)
+    writer.write(post(1))
+    writer.to_item = wxr_company_item
+    writer.write(company(1))
+    writer.close()
+
+    channel = ElementTree.fromstring(file.getvalue()).find("channel")
+    items = channel.findall("item")
+    wp = "{http://wordpress.org/export/1.2/}"
+    assert [item.find("title").text for item in items] == ["Стаття 1", "Кафе 1 & <Co>"]
+    assert [item.find(f"{wp}post_type").text for item in items] == ["post", "listing"]
+    assert items[0].find("pubDate").text == "Sat, 01 Feb 2025 09:30:00 +0000"
+    meta = {m.find(f"{wp}meta_key").text: m.find(f"{wp}meta_value").text for m in items[1].findall(f"{wp}postmeta")}
+    assert meta == {"_listing_phone": "+380440000001", "_listing_email": "c1@example.com", "_listing_category": "cafe"}
+
+
+@pytest.mark.parametrize("count", [0, 1, 3])
+def test_json_array(count):
+    file = io.BytesIO()
+    writer = json_writer(file, "array")
+    assert isinstance(writer, JsonArrayWriter)
+    for i in range(count):
+        writer.write(company(i))
+    writer.close()
+    documents = json.loads(file.getvalue())
+    assert [doc["_id"] for doc in documents] == [f"{i:024x}" for i in range(count)]
+    if count:
+        assert documents[0]["updatedAt"] == "2025-03-01T12:00:00"
+
+
+def test_ndjson():
+    file = io.BytesIO()
+    writer = json_writer(file, "ndjson")
+    assert isinstance(writer, NdjsonWriter)
+    for i in range(3):
+        writer.write(company(i))
+    writer.close()
+    lines = file.getvalue().decode("utf-8").splitlines()
+    assert [json.loads(line)["name"] for line in lines] == [f"Кафе {i} & <Co>" for i in range(3)]
+
+
+def test_unknown_json_format():
+    with pytest.raises(ValueError):
+        json_writer(io.BytesIO(), "yaml")
+
+
+class Sink:
+    def __init__(self):
+        self.documents = []
+        self.closed = False
+
+    def write(self, document):
+        self.documents.append(document)
+
+    def close(self):
+        self.closed = True
+
+
+def test_fan_out_feeds_every_sink_from_one_scan():
+    collection = Collection([company(i) for i in range(7)])
+    sinks = {"csv": Sink(), "xml": Sink(), "json": Sink()}
+    timings = {}
+    count = asyncio.run(fan_out(collection, sinks, timings, batch_size=3))
+
+    assert count == 7
+    assert len(collection.cursors) == 1
+    for sink in sinks.values():
+        assert sink.documents == collection.documents
+        assert not sink.closed
+    assert set(timings) == {"scan", "csv", "xml", "json"}
+    assert all(seconds >= 0 for seconds in timings.values())
+
+
+def test_fan_out_without_documents():
+    sinks = {"csv": Sink()}
+    assert asyncio.run(fan_out(Collection([]), sinks, {})) == 0
+    assert sinks["csv"].documents == []
+
+
+def test_fan_out_stops_on_a_failing_writer():
+    class Broken(Sink):
+        def write(self, document):
+            raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        asyncio.run(fan_out(Collection([company(i) for i in range(5)]), {"csv": Broken()}, {}, batch_size=2))
+
+
+def export_db(tombstones=()):
+    return SimpleNamespace(
+        companies=Collection([company(1), company(2, isActive=False)]),
+        blog_posts=Collection([post(1)]),
+        company_tombstones=Collection(list(tombstones)),
+    )
+
+
+@pytest.mark.parametrize("json_format, extension", [("array", "json"), ("ndjson", "ndjson")])
+def test_write_export_all_formats(tmp_path, json_format, extension):
+    db = export_db()
+    counts, timings = asyncio.run(write_export(db, tmp_path, formats=("csv", "xml", "json"), json_format=json_format))
+
+    assert counts == {"blog_posts": 1, "companies": 2}
+    assert set(timings) == {"csv", "xml", "json", "scan"}
+    # One scan per collection whatever the number of formats
+    assert (len(db.companies.cursors), len(db.blog_posts.cursors), len(db.company_tombstones.cursors)) == (1, 1, 0)
+
+    rows = list(csv.DictReader(open(tmp_path / COMPANIES_CSV, encoding="utf-8", newline="")))
+    assert [row["post_status"] for row in rows] == ["publish", "draft"]
+    items = ElementTree.parse(tmp_path / WXR_FILE).getroot().find("channel").findall("item")
+    assert [item.find("title").text for item in items] == ["Стаття 1", "Кафе 1 & <Co>", "Кафе 2 & <Co>"]
+    text = (tmp_path / f"companies.{extension}").read_text(encoding="utf-8")
+    documents = json.loads(text) if json_format == "array" else [json.loads(line) for line in text.splitlines()]
+    assert [doc["name"] for doc in documents] == ["Кафе 1 & <Co>", "Кафе 2 & <Co>"]
+
+
+def test_write_export_only_requested_formats(tmp_path):
+    counts, timings = asyncio.run(write_export(export_db(), tmp_path, formats=("csv",)))
+    assert counts == {"blog_posts": 1, "companies": 2}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([BLOG_POSTS_CSV, COMPANIES_CSV])
+    assert set(timings) == {"csv", "scan"}
+
+
+def test_delta_export_appends_tombstones(tmp_path):
+    tombstone = {"_id": ObjectId(f"{9:024x}"), "name": "Закрито", "isActive": False, "deleted": True,
+                 "updatedAt": datetime(2025, 3, 2)}
+    db = export_db([tombstone])
+    since, until = datetime(2025, 3, 1), datetime(2025, 3, 3)
+    counts, _ = asyncio.run(write_export(db, tmp_path, formats=("csv",), since=since, until=until))
+
+    assert counts == {"blog_posts": 1, "companies": 2, "company_tombstones": 1}
+    changed = {"updatedAt": {"$gt": since, "$lte": until}}
+    assert db.companies.queries == db.blog_posts.queries == db.company_tombstones.queries == [changed]
+    assert db.company_tombstones.cursors[0].sorted_by == [("updatedAt", 1)]
+    rows = list(csv.DictReader(open(tmp_path / COMPANIES_CSV, encoding="utf-8", newline="")))
+    assert [(row["post_title"], row["post_status"]) for row in rows][-1] == ("Закрито", "trash")
@@ -0,0 +1,70 @@
+import pytest
+
+from utils.facets import FACET_LIMIT, InvalidFacet, facet_pipeline, parse_facets, read_facet_result
+
+SORT = [("createdAt", -1), ("_id", -1)]
+
+
+def test_parse_facets():
+    assert parse_facets(None) == ()
+    assert parse_facets(" isNew ,category,category") == ("category", "isNew")
+    with pytest.raises(InvalidFacet, match="price"):
+        parse_facets("category,price")
+
+
+def test_filter_and_sort_come_before_facet():
+    pipeline = facet_pipeline({"isActive": True}, ("category",), {"name": 1}, sort=SORT, limit=20)
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$sort", "$project", "$facet"]
+    assert pipeline[0] == {"$match": {"isActive": True}}
+    assert pipeline[1] == {"$sort": {"createdAt": -1, "_id": -1}}
+
+
+def test_branches():
+    pipeline = facet_pipeline(
+        {"isActive": True}, ("category", "city"), {"name": 1}, sort=SORT, seek={"createdAt": {"$lt": 5}}, skip=40, limit=20
+    )
+    branches = pipeline[-1]["$facet"]
+    assert set(branches) == {"page", "total", "category", "city"}
+    assert branches["page"] == [{"$match": {"createdAt": {"$lt": 5}}}, {"$skip": 40}, {"$limit": 21}, {"$project": {"name": 1}}]
+    assert branches["total"] == [{"$count": "count"}]
+    assert branches["city"] == [
+        {"$group": {"_id": "$location.city", "count": {"$sum": 1}}},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": FACET_LIMIT},
+    ]
+
+
+def test_facets_only_and_no_total():
+    pipeline = facet_pipeline({}, ("isNew",), {"name": 1}, with_total=False)
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$project", "$facet"]
+    assert set(pipeline[-1]["$facet"]) == {"isNew"}
+
+
+def test_projection_carries_facet_inputs_once():
+    pipeline = facet_pipeline({}, ("city",), {"name": 1, "location": 1}, sort=SORT, limit=5)
+    carried = pipeline[2]["$project"]
+    assert carried == {"name": 1, "location": 1, "category": 1, "isNew": 1}
+    carried = facet_pipeline({}, ("city",), {"name": 1}, sort=SORT, limit=5)[2]["$project"]
+    assert carried == {"name": 1, "category": 1, "location.city": 1, "isNew": 1}
+
+
+def test_read_facet_result():
+    result = {
+        "page": [{"_id": 1}],
+        "total": [{"count": 42}],
+        "category": [{"_id": "cafe", "count": 30}, {"_id": "sport", "count": 12}],
+        "isNew": [{"_id": False, "count": 40}, {"_id": True, "count": 2}],
+    }
+    page, total, counts = read_facet_result(result, ("category", "isNew"))
+    assert page == [{"_id": 1}]
+    assert total == 42
+    assert counts == {
+        "category": [{"value": "cafe", "count": 30}, {"value": "sport", "count": 12}],
+        "isNew": [{"value": False, "count": 40}, {"value": True, "count": 2}],
+    }
+
+
+def test_read_empty_facet_result():
+    assert read_facet_result({"page": [], "total": [], "city": []}, ("city",)) == ([], 0, {"city": []})
+    assert read_facet_result({"city": []}, ("city",)) == ([], None, {"city": []})
@@ -0,0 +1,39 @@
+import pytest
+
+from utils.fieldsets import InvalidFieldset, fields_param, parse_fields, projection_for
+
+ALLOWED = ("name", "nameRu", "description", "category", "rating", "image", "location")
+PRESETS = {
+    "card": ("name", "nameRu", "category", "rating", "image"),
+    "full": ALLOWED,
+}
+
+
+@pytest.mark.parametrize("fields, expected", [
+    (None, tuple(sorted(ALLOWED))),
+    ("", tuple(sorted(ALLOWED))),
+    (" , ", tuple(sorted(ALLOWED))),
+    ("card", ("category", "image", "name", "nameRu", "rating")),
+    ("card,description", ("category", "description", "image", "name", "nameRu", "rating")),
+    ("rating, name ,name", ("name", "rating")),
+    ("_id,name", ("name",)),
+])
+def test_parse_fields(fields, expected):
+    assert parse_fields(fields, PRESETS, ALLOWED) == expected
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(InvalidFieldset, match="passwordHash"):
+        parse_fields("name,passwordHash", PRESETS, ALLOWED)
+
+
+def test_default_preset():
+    assert parse_fields(None, PRESETS, ALLOWED, default="card") == parse_fields("card", PRESETS, ALLOWED)
+
+
+def test_projection_and_canonical_form():
+    selected = parse_fields("rating,name", PRESETS, ALLOWED)
+    assert projection_for(selected) == {"name": 1, "rating": 1}
+    assert projection_for(selected, extra=["reviewCount", "rating"]) == {"name": 1, "rating": 1, "reviewCount": 1}
+    # Equivalent selections share cache keys and ETags
+    assert fields_param(selected) == fields_param(parse_fields("name, rating,name", PRESETS, ALLOWED)) == "name,rating"
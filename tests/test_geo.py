@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from utils.geo import backfill_geo, geo_point, geo_update, nearby_pipeline
+
+KYIV = {"type": "Point", "coordinates": [30.52, 50.45]}
+
+
+@pytest.mark.parametrize("location, expected", [
+    ({"coordinates": {"lat": 50.45, "lng": 30.52}}, KYIV),
+    ({"coordinates": {"lat": "50.45", "lng": "30.52"}}, KYIV),
+    ({"coordinates": {"lat": -90, "lng": 180}}, {"type": "Point", "coordinates": [180.0, -90.0]}),
+    ({"coordinates": {"lat": 91, "lng": 30}}, None),
+    ({"coordinates": {"lat": 50, "lng": -181}}, None),
+    ({"coordinates": {"lat": "north", "lng": 30}}, None),
+    ({"coordinates": {"lat": None, "lng": 30}}, None),
+    ({"coordinates": {"lat": 50}}, None),
+    ({"coordinates": None}, None),
+    ({"city": "Київ"}, None),
+    (None, None),
+])
+def test_geo_point(location, expected):
+    assert geo_point(location) == expected
+
+
+def test_geo_update():
+    assert geo_update({"coordinates": {"lat": 50.45, "lng": 30.52}}) == {"$set": {"geo": KYIV}}
+    assert geo_update({"city": "Київ"}) == {"$unset": {"geo": ""}}
+
+
+def test_nearby_pipeline():
+    pipeline = nearby_pipeline(50.45, 30.52, 2000, {"isActive": True}, 20, {"name": 1})
+    near = pipeline[0]["$geoNear"]
+    assert near["near"] == KYIV
+    assert (near["key"], near["maxDistance"], near["query"], near["spherical"]) == ("geo", 2000, {"isActive": True}, True)
+    assert pipeline[1:] == [{"$limit": 20}, {"$project": {"name": 1, "distance": 1}}]
+
+
+class Companies:
+    def __init__(self, documents):
+        self.documents = documents
+        self.batches = []
+
+    def find(self, query, projection):
+        async def documents():
+            for doc in self.documents:
+                yield doc
+        return documents()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.batches.append([(operation._filter["_id"], operation._doc) for operation in operations])
+
+
+class DB:
+    def __init__(self, documents):
+        self.companies = Companies(documents)
+
+
+def test_backfill_geo_sets_clears_and_skips():
+    db = DB([
+        {"_id": 1, "location": {"coordinates": {"lat": 50.45, "lng": 30.52}}},
+        {"_id": 2, "location": {"coordinates": {"lat": 50.45, "lng": 30.52}}, "geo": KYIV},
+        {"_id": 3, "location": {"city": "Київ"}, "geo": KYIV},
+        {"_id": 4, "location": {"city": "Київ"}},
+        {"_id": 5, "location": {"coordinates": {"lat": 46.48, "lng": 30.72}}, "geo": KYIV},
+    ])
+    report = asyncio.run(backfill_geo(db, batch_size=2))
+    assert report == {"located": 2, "cleared": 1, "skipped": 2}
+    assert [len(batch) for batch in db.companies.batches] == [2, 1]
+    updates = dict(write for batch in db.companies.batches for write in batch)
+    assert updates == {
+        1: {"$set": {"geo": KYIV}},
+        3: {"$unset": {"geo": ""}},
+        5: {"$set": {"geo": {"type": "Point", "coordinates": [30.72, 46.48]}}},
+    }
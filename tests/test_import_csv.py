@@ -0,0 +1,138 @@
+import asyncio
+import csv
+
+import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from import_from_csv import (
+    DEFAULT_IMAGE, RejectWriter, RowRejected, company_write, compile_category_matcher, legacy_keys, row_to_company,
+    write_batches,
+)
+from utils.imports import company_key
+
+NOW = "2025-03-01T12:00:00"
+
+
+def row(**cells):
+    return {"name": "Кафе Merry", "phone": "+380441234567", "email": "merry@example.com", "category": "Кафе", **cells}
+
+
+@pytest.mark.parametrize("category, expected", [
+    ("Кафе", "cafe"),
+    (" РЕСТОРАН ", "cafe"),
+    ("Салон краси", "beauty"),
+    ("Авто ремонт", "auto"),
+    ("Ремонт авто", "auto"),
+    ("Ремонт квартир", "construction"),
+    ("Щось інше", "other"),
+    ("", "other"),
+])
+def test_category_matcher_keeps_mapping_priority(category, expected):
+    assert compile_category_matcher()(category) == expected
+
+
+def test_row_to_company_fills_defaults():
+    company = row_to_company(row(), compile_category_matcher())
+    assert company["nameRu"] == "Кафе Merry"
+    assert company["category"] == "cafe"
+    assert company["location"] == {"city": "Kyiv", "address": "", "coordinates": None}
+    assert company["contacts"] == {"phone": "+380441234567", "email": "merry@example.com", "website": None}
+    assert company["image"] == DEFAULT_IMAGE
+    assert "geo" not in company
+    assert "isActive" not in company
+
+
+def test_row_to_company_keeps_valid_coordinates():
+    company = row_to_company(row(lat="50.45", lng="30.52"), compile_category_matcher())
+    assert company["geo"] == {"type": "Point", "coordinates": [30.52, 50.45]}
+    assert company["location"]["coordinates"] == {"lat": 50.45, "lng": 30.52}
+    assert "geo" not in row_to_company(row(lat="500", lng="30.52"), compile_category_matcher())
+
+
+@pytest.mark.parametrize("cells", [{"name": ""}, {"phone": "  "}, {"name": None}])
+def test_rows_without_name_or_phone_are_rejected(cells):
+    with pytest.raises(RowRejected):
+        row_to_company(row(**cells), compile_category_matcher())
+
+
+def test_company_write_modes():
+    match = compile_category_matcher()
+    key = company_key("Кафе Merry", "+380441234567")
+    document = company_write(row(), match, NOW, upsert=False)
+    assert document["importKey"] == key
+    assert document["isActive"] is True and document["createdAt"] == NOW
+    operation = company_write(row(), match, NOW, upsert=True)
+    assert isinstance(operation, UpdateOne)
+    assert operation._filter == {"importKey": key}
+
+
+def test_legacy_keys():
+    batch = [(2, row(), None), (3, row(name=" Салон ", phone="1"), None)]
+    assert legacy_keys(batch) == {
+        company_key("Кафе Merry", "+380441234567"): ("Кафе Merry", "+380441234567"),
+        company_key("Салон", "1"): ("Салон", "1"),
+    }
+
+
+class Collection:
+    """insert_many that fails on documents marked as duplicates, like the unique importKey index"""
+
+    def __init__(self):
+        self.inserted = []
+        self.running = self.peak = 0
+
+    async def distinct(self, field, query):
+        return []
+
+    def find(self, query, projection):
+        async def documents():
+            return
+            yield
+        return documents()
+
+    async def insert_many(self, documents, ordered=True):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        errors = [{"index": i, "code": 11000} for i, doc in enumerate(documents) if doc.get("duplicate")]
+        self.inserted += [doc for doc in documents if not doc.get("duplicate")]
+        if errors:
+            raise BulkWriteError({"nInserted": len(documents) - len(errors), "writeErrors": errors})
+        return type("Result", (), {"inserted_ids": [doc["n"] for doc in documents]})()
+
+
+class Rejects:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, line, reason, row):
+        self.rows.append((line, reason))
+
+
+def test_write_batches_runs_batches_concurrently_and_reports_duplicates():
+    async def batches():
+        for start in range(0, 12, 3):
+            yield [(start + i + 2, {}, {"n": start + i, "duplicate": start + i in (4, 10)}) for i in range(3)]
+
+    collection, rejects = Collection(), Rejects()
+    counts = asyncio.run(write_batches(collection, batches(), rejects, concurrency=2))
+    assert counts == {"inserted": 10, "updated": 0, "unchanged": 0}
+    assert sorted(doc["n"] for doc in collection.inserted) == [n for n in range(12) if n not in (4, 10)]
+    assert collection.peak == 2
+    assert sorted(rejects.rows) == [(6, "дубликат (уже импортирована)"), (12, "дубликат (уже импортирована)")]
+
+
+def test_reject_writer(tmp_path):
+    path = tmp_path / "rejects.csv"
+    writer = RejectWriter(path, ["name", "phone"])
+    writer.close()
+    assert not path.exists()
+
+    writer = RejectWriter(path, ["name", "phone"])
+    writer.write(7, "нет имени или телефона", {"name": "Кафе", "phone": None})
+    writer.close()
+    with open(path, encoding="utf-8", newline="") as file:
+        assert list(csv.DictReader(file)) == [{"line": "7", "reason": "нет имени или телефона", "name": "Кафе", "phone": ""}]
+    assert writer.count == 1
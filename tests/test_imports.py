@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from utils.imports import (
+    COMPANY_NATURAL_FIELDS, adopt_legacy_documents, company_key, content_hash, insert_document, natural_values,
+    upsert_operation, upsert_report, wordpress_key,
+)
+
+NOW = datetime(2025, 3, 1, 12, 0)
+LATER = NOW + timedelta(days=1)
+FIELDS = {"name": "Кафе Merry", "contacts": {"phone": "+380 44 123-45-67"}}
+DEFAULTS = {"rating": 0.0, "isActive": True, "createdAt": NOW}
+
+REMOVE = object()
+
+
+def evaluate(expression, document):
+    """The few aggregation expressions upsert_operation uses"""
+    if isinstance(expression, str) and expression == "$$REMOVE":
+        return REMOVE
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:], REMOVE)
+    if isinstance(expression, dict) and len(expression) == 1:
+        (operator, args), = expression.items()
+        if operator == "$literal":
+            return args
+        if operator == "$eq":
+            return evaluate(args[0], document) == evaluate(args[1], document)
+        if operator == "$cond":
+            return evaluate(args[1] if evaluate(args[0], document) else args[2], document)
+        if operator == "$ifNull":
+            value = evaluate(args[0], document)
+            return evaluate(args[1], document) if value in (None, REMOVE) else value
+    return expression
+
+
+def apply_upsert(operation, document=None):
+    """Result of an upsert_operation on `document` (None: no document has the key yet)"""
+    document = dict(document or operation._filter)
+    (stage,) = operation._doc
+    values = {field: evaluate(expression, document) for field, expression in stage["$set"].items()}
+    for field, value in values.items():
+        if value is REMOVE:
+            document.pop(field, None)
+        else:
+            document[field] = value
+    return document
+
+
+def test_upsert_inserts_with_defaults():
+    operation = upsert_operation("company:кафе merry|380441234567", FIELDS, DEFAULTS, NOW)
+    assert operation._filter == {"importKey": "company:кафе merry|380441234567"}
+    assert operation._upsert
+    document = apply_upsert(operation)
+    assert document == {
+        "importKey": "company:кафе merry|380441234567", **FIELDS, **DEFAULTS,
+        "importHash": content_hash(FIELDS), "updatedAt": NOW,
+    }
+
+
+def test_unchanged_document_is_left_as_is():
+    document = apply_upsert(upsert_operation("k", FIELDS, DEFAULTS, NOW))
+    document.update(rating=4.5, isActive=False)
+    assert apply_upsert(upsert_operation("k", dict(FIELDS), {**DEFAULTS, "createdAt": LATER}, LATER), document) == document
+
+
+def test_changed_content_is_rewritten_but_api_fields_are_kept():
+    document = apply_upsert(upsert_operation("k", {**FIELDS, "geo": {"type": "Point"}}, DEFAULTS, NOW))
+    document["rating"] = 4.5
+    changed = {**FIELDS, "name": "Кафе Merry Plus"}
+    updated = apply_upsert(upsert_operation("k", changed, {**DEFAULTS, "createdAt": LATER}, LATER, unset=("geo",)), document)
+    assert updated["name"] == "Кафе Merry Plus"
+    assert updated["rating"] == 4.5
+    assert updated["createdAt"] == NOW
+    assert updated["updatedAt"] == LATER
+    assert updated["importHash"] == content_hash(changed)
+    assert "geo" not in updated
+
+
+def test_insert_document_is_recognized_by_later_upserts():
+    document = insert_document("k", FIELDS, DEFAULTS)
+    assert apply_upsert(upsert_operation("k", FIELDS, DEFAULTS, LATER), document) == document
+
+
+def test_upsert_report():
+    assert upsert_report({"nUpserted": 2, "nMatched": 5, "nModified": 3}) == {"inserted": 2, "updated": 3, "unchanged": 2}
+    assert upsert_report({}) == {"inserted": 0, "updated": 0, "unchanged": 0}
+
+
+def test_natural_keys():
+    assert company_key(" Кафе  Merry! ", "+380 (44) 123-45-67") == "company:кафе merry|380441234567"
+    assert company_key("Кафе", None) == "company:кафе|"
+    assert wordpress_key("post", 12) == "wp:post:12"
+    published = datetime(2025, 3, 1, 14, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert natural_values({"titleUk": "A", "publishedAt": published}, ("titleUk", "publishedAt")) == ("A", NOW)
+    assert natural_values(FIELDS, COMPANY_NATURAL_FIELDS) == ("Кафе Merry", "+380 44 123-45-67")
+    assert natural_values({"name": "x"}, COMPANY_NATURAL_FIELDS) == ("x", None)
+
+
+class LegacyCollection:
+    """Answers adopt_legacy_documents' queries from in-memory documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.writes = []
+
+    async def distinct(self, field, query):
+        return [doc[field] for doc in self.documents if doc.get(field) in query[field]["$in"]]
+
+    def find(self, query, projection):
+        async def documents():
+            for doc in self.documents:
+                if "importKey" in doc or "userId" in doc:
+                    continue
+                if any(all(natural_values(doc, (path,))[0] == value for path, value in clause.items())
+                       for clause in query["$or"]):
+                    yield doc
+        return documents()
+
+    async def bulk_write(self, operations, ordered=True):
+        self.writes.extend((operation._filter["_id"], operation._doc["$set"]["importKey"]) for operation in operations)
+
+        class Result:
+            modified_count = len(operations)
+        return Result()
+
+
+def test_legacy_documents_adopt_the_key_of_their_item():
+    collection = LegacyCollection([
+        {"_id": 1, "name": "Кафе Merry", "contacts": {"phone": "+380 44 123-45-67"}},
+        {"_id": 2, "name": "Кафе Merry", "contacts": {"phone": "+380 44 123-45-67"}},
+        {"_id": 3, "name": "Салон", "contacts": {"phone": "1"}, "userId": "owner"},
+        {"_id": 4, "name": "Авто", "contacts": {"phone": "2"}, "importKey": "known"},
+    ])
+    natural_keys = {
+        "new": ("Кафе Merry", "+380 44 123-45-67"),
+        "owned": ("Салон", "1"),
+        "known": ("Авто", "2"),
+        "blank": ("", "3"),
+    }
+    assert asyncio.run(adopt_legacy_documents(collection, natural_keys, COMPANY_NATURAL_FIELDS)) == 1
+    assert collection.writes == [(1, "new")]
+
+
+def test_nothing_to_adopt_costs_one_query():
+    collection = LegacyCollection([{"_id": 1, "importKey": "known", "name": "Авто"}])
+    assert asyncio.run(adopt_legacy_documents(collection, {"known": ("Авто", "2")}, COMPANY_NATURAL_FIELDS)) == 0
+    assert collection.writes == []
@@ -0,0 +1,28 @@
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+from utils.indexes import (
+    CANONICAL_QUERIES, DELTA_INDEXES, GEO_INDEXES, IMPORT_KEY_INDEXES, INDEXES, VIEW_ROLLUP_INDEXES, verify_queries,
+)
+
+
+class ExplainDB:
+    """Answers explain commands with an IXSCAN plan, except $nearSphere without its 2dsphere index"""
+
+    async def command(self, command):
+        if "$nearSphere" in str(command["explain"]["filter"]):
+            raise OperationFailure("unable to find index for $geoNear query", code=291,
+                                   details={"errmsg": "unable to find index for $geoNear query"})
+        return {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}
+
+
+def test_unexplainable_query_is_a_failure_not_a_crash():
+    failures = asyncio.run(verify_queries(ExplainDB()))
+    assert failures == [query.name for query in CANONICAL_QUERIES if "nearby" in query.name]
+
+
+def test_groups_are_registered():
+    for spec in [*GEO_INDEXES, *VIEW_ROLLUP_INDEXES, *DELTA_INDEXES, *IMPORT_KEY_INDEXES.values()]:
+        assert spec in INDEXES
+    assert len(set(map(repr, INDEXES))) == len(INDEXES)
@@ -0,0 +1,133 @@
+from datetime import datetime
+from itertools import product
+
+import pytest
+from bson import ObjectId
+
+from utils.pagination import (
+    COMPANY_SORTS, InvalidCursor, apply_cursor, cursor_for, decode_cursor, decode_ranked_cursor, encode_cursor,
+    ranked_start, seek_filter, split_page
+)
+
+
+def matches(doc, query):
+    """Evaluate the subset of query operators seek_filter produces"""
+    if "$or" in query:
+        return any(matches(doc, clause) for clause in query["$or"])
+    if "$and" in query:
+        return all(matches(doc, clause) for clause in query["$and"])
+    for field, condition in query.items():
+        if isinstance(condition, dict) and "$lt" in condition:
+            if not doc[field] < condition["$lt"]:
+                return False
+        elif isinstance(condition, dict) and "$gt" in condition:
+            if not doc[field] > condition["$gt"]:
+                return False
+        elif doc[field] != condition:
+            return False
+    return True
+
+
+def sort_key(sort):
+    # Every value used below is numeric, so descending keys can be negated
+    return lambda doc: tuple(doc[field] if direction > 0 else -doc[field] for field, direction in sort)
+
+
+def test_seek_filter_single_key():
+    assert seek_filter([("createdAt", -1)], [5]) == {"createdAt": {"$lt": 5}}
+    assert seek_filter([("publishedAt", 1)], [5]) == {"publishedAt": {"$gt": 5}}
+
+
+def test_seek_filter_compound_key():
+    assert seek_filter([("reviewCount", -1), ("rating", 1), ("_id", -1)], [3, 4.5, 7]) == {"$or": [
+        {"reviewCount": {"$lt": 3}},
+        {"reviewCount": 3, "rating": {"$gt": 4.5}},
+        {"reviewCount": 3, "rating": 4.5, "_id": {"$lt": 7}},
+    ]}
+
+
+@pytest.mark.parametrize("sort", [
+    [("a", -1), ("b", -1), ("_id", -1)],
+    [("a", 1), ("b", -1), ("_id", 1)],
+    [("a", -1), ("_id", 1)],
+])
+def test_seek_filter_selects_exactly_the_documents_after_the_cursor(sort):
+    docs = [{"a": a, "b": b, "_id": i} for i, (a, b) in enumerate(product(range(3), range(3)))]
+    ordered = sorted(docs, key=sort_key(sort))
+    for position, last in enumerate(ordered):
+        query = seek_filter(sort, [last[field] for field, _ in sort])
+        assert [doc for doc in ordered if matches(doc, query)] == ordered[position + 1:]
+
+
+def test_cursor_round_trip_keeps_bson_types():
+    values = [datetime(2025, 3, 1, 12, 30), 4.5, ObjectId("65f000000000000000000001"), None]
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == values
+    assert decode_cursor(cursor, size=4) == values
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor!", encode_cursor({"a": 1})[:-2], encode_cursor({"a": 1})])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_decode_cursor_checks_size():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor([1, 2]), size=3)
+
+
+def test_apply_cursor_combines_with_query():
+    sort = COMPANY_SORTS["recent"]
+    doc = {"createdAt": datetime(2025, 1, 1), "_id": ObjectId("65f000000000000000000001")}
+    cursor = cursor_for(doc, sort)
+    seek = seek_filter(sort, [doc["createdAt"], doc["_id"]])
+    assert apply_cursor({}, sort, cursor) == seek
+    assert apply_cursor({"isActive": True}, sort, cursor) == {"$and": [{"isActive": True}, seek]}
+
+
+def test_split_page():
+    sort = [("n", -1), ("_id", -1)]
+    docs = [{"n": 10 - i, "_id": i} for i in range(4)]
+    assert split_page(docs[:3], 3, sort) == (docs[:3], None)
+    page, cursor = split_page(docs, 3, sort)
+    assert page == docs[:3]
+    assert decode_cursor(cursor) == [8, 2]
+
+
+def test_ranked_start_pages_through_ties():
+    ranked = [("a", 3.0), ("b", 2.0), ("c", 2.0), ("d", 2.0), ("e", 1.0)]
+    pages, start = [], 0
+    while start < len(ranked):
+        page = ranked[start:start + 2]
+        pages.append([doc_id for doc_id, _ in page])
+        last_id, last_score = page[-1]
+        start = ranked_start(ranked, last_score, last_id)
+    assert pages == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_ranked_start_after_the_cursor_item_left_the_results():
+    ranked = [("a", 3.0), ("b", 2.0), ("d", 2.0), ("e", 1.0)]
+    assert ranked_start(ranked, 2.0, "c") == 2
+    assert ranked_start(ranked, 2.5, "z") == 1
+    assert ranked_start(ranked, 0.5, "a") == 4
+
+
+def test_ranked_cursor_round_trip():
+    assert decode_ranked_cursor(encode_cursor([2.5, "65f000000000000000000001"])) == (2.5, "65f000000000000000000001")
+    assert decode_ranked_cursor(encode_cursor([3, "a"])) == (3.0, "a")
+
+
+@pytest.mark.parametrize("values", [
+    ["a", "65f000000000000000000001"],
+    [True, "a"],
+    [None, "a"],
+    [1.5, 7],
+    [1.5, ["a"]],
+    [float("inf"), "a"],
+    [1.5],
+])
+def test_ranked_cursor_rejects_wrong_types(values):
+    with pytest.raises(InvalidCursor):
+        decode_ranked_cursor(encode_cursor(values))
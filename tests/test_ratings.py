@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+
+from utils.ratings import _counters_update, add_rating_update, average_rating, derived_rating, rating_fields
+
+NOW = datetime(2025, 3, 1, 12, 0)
+
+
+def evaluate(expression, document):
+    """The aggregation expressions add_rating_update uses"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document.get(expression[1:])
+    if isinstance(expression, dict) and len(expression) == 1:
+        (operator, args), = expression.items()
+        values = [evaluate(arg, document) for arg in args]
+        if operator == "$add":
+            return sum(values)
+        if operator == "$multiply":
+            return values[0] * values[1]
+        if operator == "$divide":
+            return values[0] / values[1]
+        if operator == "$round":
+            return round(values[0], values[1])
+        if operator == "$ifNull":
+            return values[1] if values[0] is None else values[0]
+    return expression
+
+
+def apply_pipeline(pipeline, document):
+    document = dict(document)
+    for stage in pipeline:
+        document.update({field: evaluate(expression, document) for field, expression in stage["$set"].items()})
+    return document
+
+
+def test_first_review():
+    company = apply_pipeline(add_rating_update(4, NOW), {"_id": 1})
+    assert company == {"_id": 1, "ratingSum": 4, "reviewCount": 1, "rating": 4.0, "updatedAt": NOW}
+
+
+def test_reviews_accumulate():
+    company = {"_id": 1}
+    for rating in (5, 4, 4):
+        company = apply_pipeline(add_rating_update(rating, NOW), company)
+    assert (company["ratingSum"], company["reviewCount"], company["rating"]) == (13, 3, 4.3)
+
+
+def test_company_from_before_rating_sum_starts_from_its_rating():
+    company = apply_pipeline(add_rating_update(5, NOW), {"_id": 1, "rating": 4.0, "reviewCount": 2})
+    assert (company["ratingSum"], company["reviewCount"], company["rating"]) == (13.0, 3, 4.3)
+
+
+def test_update_is_a_single_atomic_pipeline():
+    pipeline = add_rating_update(3, NOW)
+    assert isinstance(pipeline, list) and all(set(stage) == {"$set"} for stage in pipeline)
+
+
+@pytest.mark.parametrize("company, expected", [
+    ({"ratingSum": 9, "reviewCount": 2, "rating": 1.0}, 4.5),
+    ({"ratingSum": 0, "reviewCount": 0}, 0.0),
+    ({"rating": 3.5, "reviewCount": 4}, 3.5),
+    ({}, 0.0),
+])
+def test_derived_rating(company, expected):
+    assert derived_rating(company) == expected
+
+
+def test_average_rating_and_summary():
+    assert average_rating(14, 3) == 4.7
+    assert average_rating(0, 0) == 0.0
+    assert rating_fields(None) == {"totalReviews": 0, "averageRating": 0}
+    assert rating_fields({"ratingSum": 9, "reviewCount": 2}) == {"totalReviews": 2, "averageRating": 4.5}
+
+
+def test_reconcile_only_touches_drifted_counters():
+    operation = _counters_update(1, 9, 2, NOW)
+    assert operation._filter == {"_id": 1, "$or": [
+        {"ratingSum": {"$ne": 9}}, {"reviewCount": {"$ne": 2}}, {"rating": {"$ne": 4.5}},
+    ]}
+    assert operation._doc == {"$set": {"ratingSum": 9, "reviewCount": 2, "rating": 4.5, "updatedAt": NOW}}
@@ -0,0 +1,96 @@
+import pytest
+
+from utils.search import SearchIndex, normalize, stem, tokenize
+
+
+def company(i, name, description="", **fields):
+    return {"_id": f"{i:024x}", "name": name, "description": description, "isActive": True, **fields}
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.rebuild([
+        company(1, "Ресторан Київ", "Українська кухня"),
+        company(2, "Кафе Львів", "Найкращі ресторани міста", category="cafe"),
+        company(3, "Автосервіс", "Ремонт авто", isActive=False),
+        company(4, "Великий ресторан", "Банкети"),
+    ])
+    return index
+
+
+def found(index, query, filters=None):
+    return {doc_id for doc_id, _ in index.search(query, filters)}
+
+
+def ids(*numbers):
+    return {f"{i:024x}" for i in numbers}
+
+
+def test_normalize_folds_spelling_variants():
+    assert normalize("Їжак Ґанок Ёлка М'ясо Зʼїзд") == "іжак ганок елка мясо зізд"
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("ресторанів", "ресторан"),
+    ("ресторани", "ресторан"),
+    ("ресторанами", "ресторан"),
+    ("ресторанах", "ресторан"),
+    ("ресторанов", "ресторан"),
+    ("великий", "велик"),
+    ("синій", "син"),
+    ("батькові", "батьк"),
+    ("кафе", "каф"),
+    ("дім", "дім"),
+])
+def test_stem(word, expected):
+    assert stem(normalize(word)) == expected
+
+
+def test_tokenize():
+    assert tokenize("Великий Ресторан, 24/7!") == ["велик", "ресторан", "24", "7"]
+    assert tokenize(None) == []
+    assert tokenize("") == []
+
+
+def test_inflected_forms_match(index):
+    assert found(index, "ресторанів") == ids(1, 2, 4)
+    assert found(index, "ресторан") == ids(1, 2, 4)
+
+
+def test_last_word_matches_as_prefix(index):
+    assert found(index, "рест") == ids(1, 2, 4)
+    assert found(index, "львів рест") == ids(2)
+    assert found(index, "авто") == ids(3)
+
+
+def test_only_the_last_word_is_a_prefix(index):
+    assert found(index, "рест кафе") == set()
+    assert found(index, "рест львів") == set()
+    assert found(index, "р") == set()
+
+
+def test_every_term_must_match(index):
+    assert found(index, "ресторан київ") == ids(1)
+    assert found(index, "ресторан одеса") == set()
+    assert found(index, "") == set()
+
+
+def test_name_hits_rank_above_description_hits(index):
+    ranked = [doc_id for doc_id, _ in index.search("ресторан")]
+    assert ranked[-1] == f"{2:024x}"
+
+
+def test_filters(index):
+    assert found(index, "ресторан", {"category": "cafe"}) == ids(2)
+    assert found(index, "авто", {"isActive": True}) == set()
+    assert found(index, "кухня", {"isActive": True}) == ids(1)
+
+
+def test_add_and_remove_keep_prefixes_current(index):
+    index.add(company(5, "Рестобар"))
+    assert found(index, "рест") == ids(1, 2, 4, 5)
+    index.remove(f"{5:024x}")
+    index.remove(f"{4:024x}")
+    assert found(index, "рест") == ids(1, 2)
+    assert "рестобар" not in index.postings
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from utils.serialization import FastJSONResponse, dumps
+
+COMPANY = {
+    "id": ObjectId("65f000000000000000000001"),
+    "name": "Кафе «Merry»",
+    "rating": 4.5,
+    "reviewCount": 12,
+    "isActive": True,
+    "image": None,
+    "images": ["a.jpg", "b.jpg"],
+    "location": {"city": "Київ", "coordinates": {"lat": 50.45, "lng": 30.52}},
+    "createdAt": datetime(2025, 3, 1, 12, 0, 0, 123456),
+    "updatedAt": datetime(2025, 3, 2, 8, 30),
+}
+
+
+def test_matches_the_default_fastapi_encoding():
+    expected = jsonable_encoder(COMPANY, custom_encoder={ObjectId: str})
+    assert json.loads(dumps(COMPANY)) == expected
+    assert json.loads(dumps([COMPANY, COMPANY])) == [expected, expected]
+
+
+def test_native_types():
+    assert dumps({"at": datetime(2025, 3, 1, 12, 0)}) == b'{"at":"2025-03-01T12:00:00"}'
+    assert dumps(ObjectId("65f000000000000000000001")) == b'"65f000000000000000000001"'
+    assert dumps({"name": "Київ"}) == '{"name":"Київ"}'.encode("utf-8")
+
+
+def test_unknown_types_fail_loudly():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_response_renders_documents_and_passes_bytes_through():
+    response = FastJSONResponse(COMPANY, headers={"ETag": '"v1"'})
+    assert response.body == dumps(COMPANY)
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"] == '"v1"'
+    assert FastJSONResponse(b'{"cached":true}').body == b'{"cached":true}'
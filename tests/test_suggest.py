@@ -0,0 +1,99 @@
+import random
+
+from utils.suggest import HEAD_SIZE, SuggestIndex, word_starts
+
+NAMES = ["Кафе", "Кава", "Кальян", "Каток", "Спорт", "Сауна", "Салон", "Авто", "Ательє"]
+
+
+def company(i, name, review_count=0, rating=0.0, is_active=True):
+    return {
+        "_id": f"{i:024x}", "name": f"{name} {i}", "nameRu": f"{name} {i}", "category": "other",
+        "reviewCount": review_count, "rating": rating, "isActive": is_active,
+    }
+
+
+def expected(companies, prefix, limit):
+    """Brute force: active companies with a word starting with `prefix`, most popular first"""
+    matching = [
+        doc for doc in companies.values()
+        if doc["isActive"] and any(key.startswith(prefix) for key in word_starts(doc["name"]))
+    ]
+    matching.sort(key=lambda doc: ((doc["reviewCount"], doc["rating"]), doc["_id"]), reverse=True)
+    return [doc["_id"] for doc in matching[:limit]]
+
+
+def suggested(index, prefix, limit=HEAD_SIZE):
+    return [doc["_id"] for doc in index.suggest_companies(prefix, limit)]
+
+
+def test_heads_are_precomputed_at_rebuild():
+    companies = {doc["_id"]: doc for doc in (company(i, NAMES[i % 3], review_count=i) for i in range(60))}
+    index = SuggestIndex()
+    index.rebuild(companies.values())
+    assert {"к", "ка", "каф", "кав"} <= set(index.heads)
+    assert index.heads["ка"] == expected(companies, "ка", HEAD_SIZE)
+    assert suggested(index, "ка", 5) == expected(companies, "ка", 5)
+
+
+def test_new_popular_company_enters_head():
+    companies = {doc["_id"]: doc for doc in (company(i, "Кафе", review_count=i) for i in range(30))}
+    index = SuggestIndex()
+    index.rebuild(companies.values())
+    star = company(100, "Кафе", review_count=1000)
+    index.add(star)
+    assert suggested(index, "ка")[0] == star["_id"]
+    assert len(index.heads["ка"]) == HEAD_SIZE
+
+
+def test_removed_or_demoted_company_leaves_head():
+    companies = {doc["_id"]: doc for doc in (company(i, "Кафе", review_count=i) for i in range(30))}
+    index = SuggestIndex()
+    index.rebuild(companies.values())
+    top = expected(companies, "ка", 1)[0]
+
+    index.set_popularity(top, 0, 0.0)
+    companies[top]["reviewCount"] = 0
+    assert suggested(index, "ка") == expected(companies, "ка", HEAD_SIZE)
+
+    index.remove(top)
+    del companies[top]
+    assert top not in suggested(index, "ка")
+    assert suggested(index, "ка") == expected(companies, "ка", HEAD_SIZE)
+
+
+def test_inactive_companies_are_not_suggested():
+    index = SuggestIndex()
+    index.rebuild([company(1, "Кафе", review_count=5), company(2, "Кафе", review_count=9, is_active=False)])
+    assert suggested(index, "ка") == [company(1, "Кафе")["_id"]]
+    index.add(company(1, "Кафе", is_active=False))
+    assert suggested(index, "ка") == []
+
+
+def test_heads_and_memo_match_brute_force_after_random_writes():
+    rng = random.Random(7)
+    companies = {}
+    for i in range(80):
+        doc = company(i, rng.choice(NAMES), rng.randrange(50), rng.choice([3.0, 4.0, 5.0]), rng.random() > 0.1)
+        companies[doc["_id"]] = doc
+    index = SuggestIndex()
+    index.rebuild(companies.values())
+    prefixes = ["к", "ка", "кав", "кафе", "с", "са", "а", "ат", "спорт 1"]
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.3:
+            doc = company(1000 + step, rng.choice(NAMES), rng.randrange(50), 4.0)
+            companies[doc["_id"]] = doc
+            index.add(doc)
+        elif action < 0.5 and companies:
+            doc_id = rng.choice(sorted(companies))
+            del companies[doc_id]
+            index.remove(doc_id)
+        elif companies:
+            doc = companies[rng.choice(sorted(companies))]
+            doc["reviewCount"], doc["rating"] = rng.randrange(50), rng.choice([3.0, 4.0, 5.0])
+            index.set_popularity(doc["_id"], doc["reviewCount"], doc["rating"])
+
+        prefix = rng.choice(prefixes)
+        limit = rng.choice([1, 5, HEAD_SIZE])
+        assert suggested(index, prefix, limit) == expected(companies, prefix, limit), (step, prefix, limit)
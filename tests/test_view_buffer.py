@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from utils.view_buffer import ViewBuffer
+
+
+class Collection:
+    def __init__(self, fail=False, delay=0.0):
+        self.batches = []
+        self.fail = fail
+        self.delay = delay
+
+    async def insert_many(self, documents, ordered=True):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.batches.append(list(documents))
+
+
+def views(count, start=0):
+    return [{"companyId": "c", "n": i} for i in range(start, start + count)]
+
+
+def flushed(collection):
+    return [event["n"] for batch in collection.batches for event in batch]
+
+
+def test_full_batches_are_flushed_without_waiting_for_the_interval():
+    async def run():
+        collection = Collection()
+        buffer = ViewBuffer(collection, batch_size=3, flush_interval=60)
+        buffer.start()
+        for event in views(6):
+            await buffer.record(event)
+        await asyncio.sleep(0.05)
+        written = [len(batch) for batch in collection.batches]
+        await buffer.stop()
+        return written
+
+    assert asyncio.run(run()) == [3, 3]
+
+
+def test_partial_batch_is_flushed_after_the_interval():
+    async def run():
+        collection = Collection()
+        buffer = ViewBuffer(collection, batch_size=100, flush_interval=0.05)
+        buffer.start()
+        for event in views(2):
+            await buffer.record(event)
+        await asyncio.sleep(0.01)
+        before = len(collection.batches)
+        await asyncio.sleep(0.1)
+        after = flushed(collection)
+        await buffer.stop()
+        return before, after
+
+    assert asyncio.run(run()) == (0, [0, 1])
+
+
+def test_stop_writes_the_batch_being_collected_and_the_queue():
+    async def run():
+        collection = Collection(delay=0.02)
+        buffer = ViewBuffer(collection, batch_size=4, flush_interval=60)
+        buffer.start()
+        for event in views(10):
+            await buffer.record(event)
+        await asyncio.sleep(0.01)
+        await buffer.stop()
+        return collection, buffer
+
+    collection, buffer = asyncio.run(run())
+    assert sorted(flushed(collection)) == list(range(10))
+    assert all(len(batch) <= 4 for batch in collection.batches)
+    assert buffer.stats() == {"queued": 0, "enqueued": 10, "flushed": 10, "dropped": 0, "failed": 0}
+
+
+@pytest.mark.parametrize("policy", ["drop", "block"])
+def test_full_queue_drops_events(policy):
+    async def run():
+        buffer = ViewBuffer(Collection(), max_size=3, policy=policy, put_timeout=0.01)
+        buffer.start()
+        # The flusher cannot run between these puts, so the queue fills up
+        buffer._task.cancel()
+        for event in views(5):
+            await buffer.record(event)
+        return buffer.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["enqueued"], stats["dropped"]) == (3, 2)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ViewBuffer(Collection(), policy="spill")
+
+
+def test_not_started_writes_through():
+    collection = Collection()
+    asyncio.run(ViewBuffer(collection).record({"n": 7}))
+    assert flushed(collection) == [7]
+
+
+def test_failed_writes_are_counted_and_skip_the_hook():
+    hooked = []
+
+    async def on_flush(batch):
+        hooked.append(len(batch))
+
+    async def run(collection):
+        buffer = ViewBuffer(collection, batch_size=2, flush_interval=60, on_flush=on_flush)
+        buffer.start()
+        for event in views(4):
+            await buffer.record(event)
+        await buffer.stop()
+        return buffer.stats()
+
+    assert asyncio.run(run(Collection(fail=True)))["failed"] == 4
+    assert hooked == []
+    assert asyncio.run(run(Collection()))["flushed"] == 4
+    assert hooked == [2, 2]
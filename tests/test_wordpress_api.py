@@ -0,0 +1,60 @@
+import asyncio
+from collections import Counter
+from contextlib import aclosing
+
+import httpx
+import pytest
+
+from utils.wordpress_api import WordPressClient, WordPressError
+from wordpress_stub import create_app
+
+
+def client(app, **options):
+    options = {"concurrency": 4, "retries": 10, "backoff": 0, **options}
+    return WordPressClient("http://wordpress.test", transport=httpx.ASGITransport(app), **options)
+
+
+async def collect(app, path, per_page=10, **options):
+    async with client(app, **options) as wp:
+        ids = Counter()
+        async for items in wp.pages(path, per_page=per_page):
+            ids.update(item["id"] for item in items)
+        return ids, wp.stats
+
+
+@pytest.mark.parametrize("path, total", [("/posts", 95), ("/listing", 230)])
+def test_every_item_arrives_exactly_once_despite_retries(path, total):
+    app = create_app(posts=95, listings=230, fail_rate=0.3, seed=1)
+    ids, stats = asyncio.run(collect(app, path))
+    assert ids == Counter(range(1, total + 1))
+    assert stats["retries"] > 0
+    assert stats["pages"] == -(-total // 10)
+
+
+def test_single_page_collection():
+    ids, stats = asyncio.run(collect(create_app(posts=3), "/posts"))
+    assert ids == Counter({1: 1, 2: 1, 3: 1})
+    assert stats == {"requests": 1, "retries": 0, "pages": 1}
+
+
+def test_exhausted_retries_raise():
+    async def run():
+        async with client(create_app(posts=50, fail_rate=1.0), retries=2) as wp:
+            async for _ in wp.pages("/posts"):
+                pass
+
+    with pytest.raises(WordPressError) as error:
+        asyncio.run(run())
+    assert error.value.status_code in (429, 503)
+
+
+def test_stopping_early_leaves_no_request_running():
+    async def run():
+        async with client(create_app(listings=500, latency=0.01)) as wp:
+            async with aclosing(wp.pages("/listing", per_page=10)) as pages:
+                # Past the first page, so further pages are being prefetched
+                await anext(pages)
+                await anext(pages)
+            return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []